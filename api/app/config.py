@@ -17,25 +17,65 @@ class Settings(BaseSettings):
     s3_endpoint: str = "http://minio:9000"
     s3_region: str = "us-east-1"
     s3_bucket: str = "shopdesk-attachments"
+    s3_max_pool_connections: int = 20
+    s3_multipart_part_mb: int = 8
+    ingest_upload_concurrency: int = 4
+    attachment_cache_dir: str = "/tmp/shopdesk-attachment-cache"
+    attachment_cache_max_mb: int = 2048
 
     jwt_secret: str = "devsecret"
     ml_mode: str = "stub"
+    zeroshot_batch_size: int = 16
+    zeroshot_batch_wait_ms: int = 20
 
     gmail_user: str | None = None
     gmail_service_account_file: str | None = None
     gmail_query: str = ""
     gmail_max_results: int = 20
     gmail_batch_size: int = 20
+    gmail_process_concurrency: int = 8
+    gmail_mailbox_lock_seconds: int = 300
     gmail_label_ids: list[str] | str | None = None
     gmail_history_start: str | None = None
 
+    http_timeout_s: float = 10.0
+    http_connect_timeout_s: float = 3.0
+    http_max_connections: int = 50
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry_s: float = 30.0
+
+    enrich_cache_max_entries: int = 2048
+    enrich_cache_ttl_s: float = 600.0
+    enrich_cache_negative_ttl_s: float = 60.0
+    enrich_cache_redis: bool = True
+
+    enrich_deadline_s: float = 3.0
+    enrich_shopify_timeout_s: float = 1.5
+    enrich_stripe_timeout_s: float = 1.5
+    enrich_s3_timeout_s: float = 1.0
+    breaker_failure_threshold: int = 5
+    breaker_reset_s: float = 30.0
+
+    ratelimit_enabled: bool = True
+    ratelimit_max_wait_s: float = 10.0
+    ratelimit_shopify_rps: float = 2.0
+    ratelimit_shopify_burst: float = 40.0
+    ratelimit_stripe_rps: float = 25.0
+    ratelimit_stripe_burst: float = 25.0
+    ratelimit_zendesk_rps: float = 3.0
+    ratelimit_zendesk_burst: float = 20.0
+
     shopify_api_key: str | None = None
     shopify_password: str | None = None
     shopify_shop_domain: str | None = None
     shopify_sandbox: bool = True
+    shopify_sync_backfill_days: int = 90
+    shopify_sync_overlap_s: int = 300
 
     stripe_api_key: str | None = None
     stripe_sandbox: bool = True
+    stripe_sync_backfill_days: int = 90
+    stripe_sync_overlap_s: int = 3600
 
     zendesk_subdomain: str | None = None
     zendesk_email: str | None = None
@@ -45,6 +85,12 @@ class Settings(BaseSettings):
     zendesk_field_amount: str | None = None
     zendesk_field_route: str | None = None
     zendesk_field_priority: str | None = None
+    zendesk_outbox_batch_size: int = 100
+    zendesk_outbox_max_batches: int = 10
+    zendesk_outbox_max_attempts: int = 8
+    zendesk_outbox_backoff_s: float = 30.0
+    zendesk_outbox_stale_s: int = 300
+    zendesk_attachment_url_ttl_s: int = 86400
 
     @field_validator("gmail_label_ids", mode="before")
     @classmethod
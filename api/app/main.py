@@ -2,7 +2,8 @@ from fastapi import FastAPI
 from contextlib import asynccontextmanager
 
 from api.app.config import settings
-from common.storage.s3 import ensure_bucket
+from common.clients import http
+from common.storage.s3 import close_client, ensure_bucket, open_client
 from api.app.routers.ingest import router as ingest_router
 from api.app.routers.attachments import router as attachments_router
 from api.app.routers.debug_ml import router as debugml_router
@@ -10,8 +11,14 @@ from api.app.routers.tickets import router as tickets_router
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    await open_client()
+    await http.open_clients()
     await ensure_bucket()
-    yield
+    try:
+        yield
+    finally:
+        await http.close_clients()
+        await close_client()
 
 app = FastAPI(lifespan=lifespan, title="ShopDesk Router API", version="0.0.1")
 
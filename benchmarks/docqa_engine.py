@@ -0,0 +1,50 @@
+"""DocQA wall time per attachment: per-question pipeline vs DocQAEngine.
+
+Needs the layoutlm model and a working tesseract install. The legacy path
+calls the pipeline once per question (OCR + forward pass each time); the
+engine OCRs once and answers all questions in one batched pass.
+
+    python -m benchmarks.docqa_engine invoice.png --repeat 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import time
+from pathlib import Path
+
+
+def main(path: Path, repeat: int) -> None:
+    os.environ.setdefault("ML_MODE", "real")
+    from common.ml.docqa import QUESTIONS, DocQAEngine, _get_pipeline, _load_pages
+
+    mime = "application/pdf" if path.suffix.lower() == ".pdf" else "image/png"
+    page = _load_pages(path.read_bytes(), mime)[0]
+    qa = _get_pipeline()
+
+    def legacy() -> None:
+        for q in QUESTIONS.values():
+            qa(question=q, image=page)
+
+    def engine() -> None:
+        # fresh engine each run so the word-box cache does not hide OCR cost
+        DocQAEngine(qa=qa).answer(page)
+
+    for name, fn in (("per-question", legacy), ("engine", engine)):
+        fn()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        print(f"{name:<13} median={statistics.median(timings):.3f}s min={min(timings):.3f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("document", type=Path)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.document, args.repeat)
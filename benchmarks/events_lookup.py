@@ -0,0 +1,115 @@
+"""Stage lookup latency on events: JSONB payload scan vs indexed message_id.
+
+Builds a temporary copy of the events layout with N rows (default 1M, 6 event
+types per message), then times ``get_last_event``-style queries against both
+the old ``payload->>'message_id'`` filter and the ``message_id`` column with
+the ``(message_id, type, ts desc)`` index. Nothing is written to real tables.
+
+    python -m benchmarks.events_lookup --rows 1000000 --lookups 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from sqlalchemy import text
+
+from api.app.db import SessionLocal
+
+TYPES = ["INGESTED", "DOCQA_DONE", "ASR_DONE", "CLASSIFY_DONE", "NORMALIZE_DONE", "TICKET_CREATED"]
+
+JSONB_LOOKUP = text(
+    """
+    select payload from bench_events
+    where type = :type and payload->>'message_id' = :mid
+    order by ts desc limit 1
+    """
+)
+COLUMN_LOOKUP = text(
+    """
+    select payload from bench_events
+    where message_id = :mid and type = :type
+    order by ts desc limit 1
+    """
+)
+
+
+async def _setup(session, rows: int) -> list[str]:
+    messages = max(1, rows // len(TYPES))
+    await session.execute(
+        text(
+            """
+            create temp table bench_events (
+                id uuid primary key default gen_random_uuid(),
+                ticket_id uuid,
+                message_id uuid,
+                type text not null,
+                payload jsonb,
+                ts timestamptz not null default now()
+            ) on commit preserve rows
+            """
+        )
+    )
+    await session.execute(
+        text(
+            """
+            insert into bench_events(message_id, type, payload, ts)
+            select m.id,
+                   t.type,
+                   jsonb_build_object('message_id', m.id::text, 'text', repeat('x', 200)),
+                   now() - (m.n || ' seconds')::interval
+            from (select gen_random_uuid() as id, n from generate_series(1, :messages) n) m
+            cross join unnest(cast(:types as text[])) as t(type)
+            """
+        ),
+        {"messages": messages, "types": TYPES},
+    )
+    await session.execute(text("create index on bench_events (ticket_id, ts)"))
+    await session.execute(text("create index on bench_events (message_id, type, ts desc)"))
+    await session.execute(text("analyze bench_events"))
+    sample = await session.execute(
+        text("select message_id::text from bench_events tablesample system (1) limit 5000")
+    )
+    return [r[0] for r in sample.all()]
+
+
+async def _time(session, stmt, ids: list[str], lookups: int) -> list[float]:
+    timings = []
+    for _ in range(lookups):
+        params = {"mid": random.choice(ids), "type": random.choice(TYPES)}
+        start = time.perf_counter()
+        (await session.execute(stmt, params)).first()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def _report(name: str, timings: list[float]) -> None:
+    ordered = sorted(timings)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(
+        f"{name:<14} p50={statistics.median(ordered):8.2f}ms "
+        f"p99={p99:8.2f}ms mean={statistics.mean(ordered):8.2f}ms"
+    )
+
+
+async def main(rows: int, lookups: int) -> None:
+    async with SessionLocal() as session:
+        start = time.perf_counter()
+        ids = await _setup(session, rows)
+        print(f"loaded {rows} events in {time.perf_counter() - start:.1f}s")
+        # JSONB filter first with few lookups: it is a sequential scan per call.
+        _report("payload jsonb", await _time(session, JSONB_LOOKUP, ids, max(1, lookups // 10)))
+        _report("message_id col", await _time(session, COLUMN_LOOKUP, ids, lookups))
+        await session.rollback()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.lookups))
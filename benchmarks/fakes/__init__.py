@@ -0,0 +1,282 @@
+"""Local stand-ins for the Shopify, Stripe and Zendesk endpoints we call.
+
+One ASGI app serves all three under their real path prefixes, so pointing
+``SHOPIFY_BASE_URL``, ``STRIPE_API_BASE`` and ``ZENDESK_BASE_URL`` at it sends
+the clients in ``common/clients`` through their normal HTTP code path
+(pooling, timeouts, rate limiting, 429 handling). Each API has its own
+``Faults``: latency distribution, error rate, random 429s and a server-side
+token bucket, adjustable at runtime through ``PUT /_faults/{api}``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+import math
+import random
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+APIS = ("shopify", "stripe", "zendesk")
+
+
+@dataclass
+class Faults:
+    latency_ms: float = 0.0  # median added latency
+    sigma: float = 0.0  # lognormal shape; 0 gives a fixed latency
+    error_rate: float = 0.0  # fraction answered with 503
+    throttle_rate: float = 0.0  # fraction answered with 429 regardless of load
+    rps: float = 0.0  # server-side token bucket, 0 = unlimited
+    burst: float = 1.0
+    retry_after_s: float = 1.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "Faults":
+        """``"latency_ms=80,sigma=0.5,error_rate=0.01,rps=2,burst=40"``"""
+        known = {f.name for f in fields(cls)}
+        values: Dict[str, float] = {}
+        for item in filter(None, (p.strip() for p in spec.split(","))):
+            key, _, value = item.partition("=")
+            if key not in known:
+                raise ValueError(f"unknown fault setting {key!r}")
+            values[key] = float(value)
+        return cls(**values)
+
+
+class _Bucket:
+    def __init__(self, rps: float, burst: float) -> None:
+        self.rps = rps
+        self.burst = burst
+        self.tokens = burst
+        self.ts = time.monotonic()
+
+    def take(self) -> float:
+        """0 when a token was taken, else seconds until the next one."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.ts) * self.rps)
+        self.ts = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rps
+
+
+class FakeUpstreams:
+    def __init__(self, *, orders: int = 500, seed: int = 7, job_delay_ms: float = 200) -> None:
+        self.rng = random.Random(seed)
+        self.faults: Dict[str, Faults] = {api: Faults() for api in APIS}
+        self.buckets: Dict[str, Optional[_Bucket]] = {api: None for api in APIS}
+        self.stats: Counter = Counter()
+        self.job_delay_s = job_delay_ms / 1000
+        self.orders = self._make_orders(orders)
+        self.charges = self._make_charges(self.orders)
+        self.tickets: Dict[int, Dict[str, Any]] = {}
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+
+    def set_faults(self, api: str, faults: Faults) -> None:
+        self.faults[api] = faults
+        self.buckets[api] = _Bucket(faults.rps, faults.burst) if faults.rps > 0 else None
+
+    def _make_orders(self, n: int) -> List[Dict[str, Any]]:
+        start = datetime.now(timezone.utc) - timedelta(days=30)
+        orders = []
+        for i in range(n):
+            created = start + timedelta(minutes=self.rng.randint(0, 30 * 24 * 60))
+            sku = f"SKU-{self.rng.randint(1, 50):03d}"
+            price = round(self.rng.uniform(5, 300), 2)
+            orders.append(
+                {
+                    "id": 5_000_000 + i,
+                    "name": f"#{1001 + i}",
+                    "order_number": 1001 + i,
+                    "email": f"customer{i % (n // 3 or 1)}@example.com",
+                    "total_price": f"{price:.2f}",
+                    "currency": "USD",
+                    "financial_status": "paid",
+                    "fulfillment_status": self.rng.choice([None, "fulfilled", "partial"]),
+                    "line_items": [{"title": f"Item {sku}", "quantity": 1, "sku": sku}],
+                    "fulfillments": [],
+                    "created_at": created.isoformat(),
+                    "updated_at": (created + timedelta(hours=self.rng.randint(0, 48))).isoformat(),
+                }
+            )
+        orders.sort(key=lambda o: o["updated_at"])
+        return orders
+
+    def _make_charges(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        charges = [
+            {
+                "id": f"ch_fake{o['id']}",
+                "object": "charge",
+                "created": int(datetime.fromisoformat(o["created_at"]).timestamp()),
+                "amount": round(float(o["total_price"]) * 100),
+                "currency": "usd",
+                "status": "succeeded",
+                "billing_details": {"email": o["email"]},
+                "metadata": {"order_id": o["name"]},
+                "receipt_url": f"https://pay.example/receipts/{o['id']}",
+                "payment_method_details": {"card": {"brand": "visa"}},
+                "outcome": {"risk_score": self.rng.randint(0, 60)},
+            }
+            for o in orders
+        ]
+        charges.sort(key=lambda c: c["created"], reverse=True)
+        return charges
+
+    async def inject(self, api: str) -> Optional[Response]:
+        faults = self.faults[api]
+        if faults.latency_ms > 0:
+            delay = faults.latency_ms / 1000
+            if faults.sigma > 0:
+                delay = self.rng.lognormvariate(math.log(delay), faults.sigma)
+            await asyncio.sleep(delay)
+        bucket = self.buckets[api]
+        wait = bucket.take() if bucket else 0.0
+        if wait or self.rng.random() < faults.throttle_rate:
+            retry_after = max(wait, faults.retry_after_s)
+            return JSONResponse(
+                {"errors": "Too Many Requests"},
+                status_code=429,
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+        if self.rng.random() < faults.error_rate:
+            return JSONResponse({"errors": "Service Unavailable"}, status_code=503)
+        return None
+
+    def job_status(self, job_id: str) -> Dict[str, Any]:
+        job = self.jobs[job_id]
+        if time.monotonic() < job["ready_at"]:
+            return {"id": job_id, "status": "working", "results": None}
+        return {"id": job_id, "status": "completed", "results": job["results"]}
+
+    def create_ticket(self, ticket: Dict[str, Any]) -> Dict[str, Any]:
+        ticket_id = len(self.tickets) + 1
+        self.tickets[ticket_id] = {**ticket, "id": ticket_id}
+        return self.tickets[ticket_id]
+
+
+def _page_info(payload: Dict[str, Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def build_app(fakes: Optional[FakeUpstreams] = None) -> FastAPI:
+    fakes = fakes or FakeUpstreams()
+    app = FastAPI()
+    app.state.fakes = fakes
+
+    @app.middleware("http")
+    async def _faults(request: Request, call_next):
+        path = request.url.path
+        api = (
+            "shopify" if path.startswith("/admin/api/")
+            else "stripe" if path.startswith("/v1/")
+            else "zendesk" if path.startswith("/api/v2/")
+            else None
+        )
+        response = (await fakes.inject(api)) if api else None
+        if response is None:
+            response = await call_next(request)
+        if api:
+            fakes.stats[f"{api}:{response.status_code}"] += 1
+        return response
+
+    @app.get("/admin/api/{version}/orders.json")
+    async def shopify_orders(request: Request):
+        q = request.query_params
+        if "page_info" in q:
+            cursor = json.loads(base64.urlsafe_b64decode(q["page_info"]))
+        else:
+            cursor = {"offset": 0, "updated_at_min": q.get("updated_at_min"), "name": q.get("name")}
+        limit = min(int(q.get("limit", 50)), 250)
+        orders = fakes.orders
+        if cursor.get("name"):
+            name = cursor["name"].lstrip("#")
+            orders = [o for o in orders if o["name"].lstrip("#") == name]
+        if cursor.get("updated_at_min"):
+            since = datetime.fromisoformat(cursor["updated_at_min"])
+            orders = [o for o in orders if datetime.fromisoformat(o["updated_at"]) >= since]
+        page = orders[cursor["offset"] : cursor["offset"] + limit]
+        headers = {}
+        if cursor["offset"] + limit < len(orders):
+            nxt = _page_info({**cursor, "offset": cursor["offset"] + limit})
+            url = request.url.replace_query_params(limit=limit, page_info=nxt)
+            headers["Link"] = f'<{url}>; rel="next"'
+        return JSONResponse({"orders": page}, headers=headers)
+
+    @app.get("/v1/charges")
+    async def stripe_charges(request: Request):
+        q = request.query_params
+        charges = fakes.charges
+        if "created[gte]" in q:
+            charges = [c for c in charges if c["created"] >= int(q["created[gte]"])]
+        if "starting_after" in q:
+            ids = [c["id"] for c in charges]
+            start = ids.index(q["starting_after"]) + 1 if q["starting_after"] in ids else len(ids)
+            charges = charges[start:]
+        limit = min(int(q.get("limit", 10)), 100)
+        return {"object": "list", "data": charges[:limit], "has_more": len(charges) > limit}
+
+    @app.post("/api/v2/tickets.json", status_code=201)
+    async def zendesk_create(request: Request):
+        body = await request.json()
+        return {"ticket": fakes.create_ticket(body["ticket"])}
+
+    @app.get("/api/v2/tickets.json")
+    async def zendesk_tickets(external_id: Optional[str] = None):
+        tickets = [
+            t for t in fakes.tickets.values()
+            if external_id is None or t.get("external_id") == external_id
+        ]
+        return {"tickets": tickets}
+
+    @app.put("/api/v2/tickets/{ticket_id}.json")
+    async def zendesk_update(ticket_id: int, request: Request):
+        if ticket_id not in fakes.tickets:
+            return JSONResponse({"error": "RecordNotFound"}, status_code=404)
+        body = await request.json()
+        fakes.tickets[ticket_id].setdefault("comments", []).append(body["ticket"].get("comment"))
+        return {"ticket": fakes.tickets[ticket_id]}
+
+    @app.post("/api/v2/tickets/create_many.json")
+    async def zendesk_create_many(request: Request):
+        tickets = (await request.json())["tickets"]
+        if len(tickets) > 100:
+            return JSONResponse({"error": "TooManyValues"}, status_code=400)
+        job_id = f"job{len(fakes.jobs) + 1}"
+        results = []
+        for index, ticket in enumerate(tickets):
+            if not ticket.get("comment"):
+                results.append({"index": index, "error": "InvalidValue", "details": "comment"})
+            else:
+                results.append({"index": index, "id": fakes.create_ticket(ticket)["id"]})
+        fakes.jobs[job_id] = {"ready_at": time.monotonic() + fakes.job_delay_s, "results": results}
+        return {"job_status": {"id": job_id, "status": "queued"}}
+
+    @app.get("/api/v2/job_statuses/show_many.json")
+    async def zendesk_job_statuses(ids: str = ""):
+        found = [i for i in ids.split(",") if i in fakes.jobs]
+        return {"job_statuses": [fakes.job_status(i) for i in found]}
+
+    @app.get("/_faults")
+    async def get_faults():
+        return {api: asdict(f) for api, f in fakes.faults.items()}
+
+    @app.put("/_faults/{api}")
+    async def put_faults(api: str, request: Request):
+        if api not in APIS:
+            return JSONResponse({"error": f"unknown api {api}"}, status_code=404)
+        fakes.set_faults(api, Faults(**await request.json()))
+        return asdict(fakes.faults[api])
+
+    @app.get("/_stats")
+    async def get_stats():
+        return dict(fakes.stats)
+
+    return app
@@ -0,0 +1,42 @@
+"""Run the fake upstreams, e.g. for a load test against the worker:
+
+    python -m benchmarks.fakes --port 8900 \
+        --shopify latency_ms=120,sigma=0.6,rps=2,burst=40 \
+        --stripe latency_ms=250,sigma=0.4,error_rate=0.01 \
+        --zendesk latency_ms=300,throttle_rate=0.02
+
+and start the worker with
+
+    SHOPIFY_SANDBOX=0 SHOPIFY_BASE_URL=http://127.0.0.1:8900 SHOPIFY_DOMAIN=fake \
+    SHOPIFY_API_KEY=k SHOPIFY_PASSWORD=p \
+    STRIPE_SANDBOX=0 STRIPE_API_BASE=http://127.0.0.1:8900/v1 STRIPE_API_KEY=sk_fake \
+    ZENDESK_SANDBOX=0 ZENDESK_BASE_URL=http://127.0.0.1:8900/api/v2 \
+    ZENDESK_EMAIL=bot@example.com ZENDESK_API_TOKEN=t
+
+Faults can be changed while running: ``curl -X PUT :8900/_faults/stripe -d
+'{"latency_ms": 2000}'``; ``GET /_stats`` counts responses by api and status.
+"""
+
+from __future__ import annotations
+
+import argparse
+
+import uvicorn
+
+from benchmarks.fakes import APIS, Faults, FakeUpstreams, build_app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--job-delay-ms", type=float, default=200)
+    for api in APIS:
+        parser.add_argument(f"--{api}", type=Faults.parse, default=Faults(), metavar="SPEC")
+    args = parser.parse_args()
+
+    fakes = FakeUpstreams(orders=args.orders, seed=args.seed, job_delay_ms=args.job_delay_ms)
+    for api in APIS:
+        fakes.set_faults(api, getattr(args, api))
+    uvicorn.run(build_app(fakes), host=args.host, port=args.port, log_level="warning")
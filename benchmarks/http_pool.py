@@ -0,0 +1,91 @@
+"""Requests/s against a local stand-in upstream: client per call vs pooled client.
+
+Starts a minimal JSON server on 127.0.0.1 (uvicorn in a background thread)
+that answers like Zendesk's ``POST /tickets.json``, then issues the same
+requests the way the old code did (new ``httpx.AsyncClient`` per call) and
+through the shared client from ``common.clients.http``. Plain HTTP on
+loopback understates the gain: real upstreams also pay DNS and TLS per
+connection.
+
+    python -m benchmarks.http_pool --requests 2000 --concurrency 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import socket
+import threading
+import time
+
+import httpx
+import uvicorn
+
+from common.clients import http
+
+
+async def _app(scope, receive, send):
+    if scope["type"] != "http":
+        return
+    while (await receive()).get("more_body"):
+        pass
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 201,
+            "headers": [(b"content-type", b"application/json")],
+        }
+    )
+    await send({"type": "http.response.body", "body": b'{"ticket": {"id": 1}}'})
+
+
+def _start_server() -> str:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(
+        uvicorn.Config(_app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/api/v2/tickets.json"
+
+
+async def _bench(url: str, requests: int, concurrency: int, pooled: bool) -> float:
+    sem = asyncio.Semaphore(concurrency)
+    body = {"ticket": {"subject": "bench"}}
+
+    async def one() -> None:
+        async with sem:
+            if pooled:
+                async with http.client("zendesk") as c:
+                    (await c.post(url, json=body)).raise_for_status()
+            else:
+                async with httpx.AsyncClient() as c:
+                    (await c.post(url, json=body)).raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return requests / (time.perf_counter() - start)
+
+
+async def _main(args: argparse.Namespace) -> None:
+    url = _start_server()
+    await http.open_clients()
+    try:
+        await _bench(url, args.concurrency, args.concurrency, pooled=True)  # warm-up
+        per_call = await _bench(url, args.requests, args.concurrency, pooled=False)
+        pooled = await _bench(url, args.requests, args.concurrency, pooled=True)
+    finally:
+        await http.close_clients()
+    print(f"requests={args.requests} concurrency={args.concurrency} http2={http.HTTP2}")
+    print(f"client per call {per_call:9.1f} req/s")
+    print(f"pooled client   {pooled:9.1f} req/s  x{pooled / per_call:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    asyncio.run(_main(parser.parse_args()))
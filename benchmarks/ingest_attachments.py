@@ -0,0 +1,112 @@
+"""Upload-ingest latency for messages with 1, 5 and 20 attachments.
+
+Drives ``IngestUploadService`` with an S3 stand-in and a DB session stand-in
+that add fixed per-call latency (defaults approximate MinIO/Postgres across a
+docker network), and compares it with the previous serial flow: one upload
+and one attachments INSERT per file.
+
+    python -m benchmarks.ingest_attachments --s3-ms 25 --db-ms 2 --concurrency 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+from types import SimpleNamespace
+
+from common.ingest.upload_service import IngestUploadService
+
+
+class _Storage:
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+
+    async def put_stream(self, read, mime, filename):
+        await asyncio.sleep(self.latency)
+        return {"key": f"bench/{filename}", "size": 1024, "sha256": filename}
+
+
+class _Result:
+    def scalar_one(self):
+        return "bench-message"
+
+    def fetchall(self):
+        return []
+
+
+class _Session:
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.round_trips = 0
+
+    async def execute(self, *_args, **_kwargs):
+        self.round_trips += 1
+        await asyncio.sleep(self.latency)
+        return _Result()
+
+    async def commit(self):
+        await self.execute()
+
+
+class _Repo:
+    def __init__(self, session: _Session) -> None:
+        self.session = session
+
+    async def insert_attachments(self, message_id, atts):
+        await self.session.execute()
+        return [str(i) for i in range(len(atts))]
+
+
+async def _serial(storage: _Storage, session: _Session, files) -> None:
+    await session.execute()  # messages insert
+    for f in files:
+        await storage.put_stream(None, f.content_type, f.filename)
+        await session.execute()  # attachments insert
+    await session.execute()  # INGESTED event
+    await session.commit()
+
+
+async def _run(args: argparse.Namespace) -> None:
+    import common.ingest.upload_service as upload_service
+
+    upload_service.MessageRepository = _Repo
+    storage = _Storage(args.s3_ms / 1000)
+    service = IngestUploadService(storage=storage, upload_concurrency=args.concurrency)
+
+    print(f"s3={args.s3_ms}ms db={args.db_ms}ms concurrency={args.concurrency}")
+    print(f"{'attachments':<12}{'serial ms':>11}{'concurrent ms':>15}{'round trips':>14}")
+    for n in (1, 5, 20):
+        files = [
+            SimpleNamespace(read=None, content_type="image/jpeg", filename=f"{i}.jpg")
+            for i in range(n)
+        ]
+        timings: dict[str, list[float]] = {"serial": [], "concurrent": []}
+        trips: dict[str, int] = {}
+        for _ in range(args.repeat):
+            session = _Session(args.db_ms / 1000)
+            start = time.perf_counter()
+            await _serial(storage, session, files)
+            timings["serial"].append((time.perf_counter() - start) * 1000)
+            trips["serial"] = session.round_trips
+
+            session = _Session(args.db_ms / 1000)
+            start = time.perf_counter()
+            await service(body="bench", files=files, session=session)
+            timings["concurrent"].append((time.perf_counter() - start) * 1000)
+            trips["concurrent"] = session.round_trips
+        print(
+            f"{n:<12}{statistics.median(timings['serial']):>11.1f}"
+            f"{statistics.median(timings['concurrent']):>15.1f}"
+            f"{trips['serial']:>8} -> {trips['concurrent']}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--s3-ms", type=float, default=25.0)
+    parser.add_argument("--db-ms", type=float, default=2.0)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=5)
+    asyncio.run(_run(parser.parse_args()))
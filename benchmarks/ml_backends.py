@@ -0,0 +1,229 @@
+"""Latency and accuracy of each ML backend, stage by stage, on a fixture set.
+
+For every stage and backend, loads the model the way the worker would (via
+``ML_BACKEND_<STAGE>``), runs each fixture once as warm-up and once timed,
+and prints load time, per-item latency and two scores: ``accuracy`` against
+the expected answer and ``agree`` against the first backend's output (keep
+``torch`` first). zeroshot and summarize use ``benchmarks/data/ml_accuracy.json``
+(summaries have no reference, only ``agree``, as ROUGE-1 F1); the other
+stages need a directory of your own samples:
+
+    --images DIR   DIR/damaged/*.jpg, DIR/intact/*.jpg
+    --audio DIR    DIR/<name>.wav with the reference transcript in <name>.txt
+    --docs DIR     DIR/<name>.pdf|png with the expected fields in <name>.json
+
+    python -m benchmarks.ml_backends --stages zeroshot,summarize \
+        --backends torch,torch-int8,onnx,onnx-int8
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import importlib
+import json
+import mimetypes
+import os
+import re
+import statistics
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+FIXTURES = Path(__file__).parent / "data" / "ml_accuracy.json"
+
+# stage -> (module, globals holding the loaded pipeline)
+_MODULES: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "zeroshot": ("common.ml.zeroshot", ("_zs_pipeline",)),
+    "summarize": ("common.ml.summarize", ("_sum_pipeline",)),
+    "vqa": ("common.ml.vqa", ("_vqa",)),
+    "asr": ("common.ml.asr", ("_asr_pipeline",)),
+    "docqa": ("common.ml.docqa", ("_qa_pipeline", "_engine")),
+}
+
+
+def words(text: str) -> List[str]:
+    return re.findall(r"\w+", text.lower())
+
+
+def wer(reference: str, hypothesis: str) -> float:
+    ref, hyp = words(reference), words(hypothesis)
+    if not ref:
+        return float(bool(hyp))
+    row = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        prev, row[0] = row[0], i
+        for j, h in enumerate(hyp, 1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (r != h))
+    return row[-1] / len(ref)
+
+
+def rouge1(reference: str, candidate: str) -> float:
+    ref, cand = Counter(words(reference)), Counter(words(candidate))
+    overlap = sum((ref & cand).values())
+    if not overlap:
+        return 0.0
+    precision = overlap / sum(cand.values())
+    recall = overlap / sum(ref.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+def field_match(expected: Dict[str, Any], got: Dict[str, Any]) -> float:
+    if not expected:
+        return 1.0
+    hits = sum(str(got.get(k) or "").lower() == str(v or "").lower() for k, v in expected.items())
+    return hits / len(expected)
+
+
+class Stage(NamedTuple):
+    cases: List[Tuple[Any, Any]]  # (input, expected or None)
+    run: Callable[[Any, Any], Any]  # (module, input) -> comparable output
+    score: Callable[[Any, Any], float]  # (expected or baseline, output) -> 0..1
+
+
+def _pairs(directory: Path, answer_suffix: str) -> List[Tuple[Path, Path]]:
+    return [
+        (path, path.with_suffix(answer_suffix))
+        for path in sorted(directory.iterdir())
+        if path.suffix != answer_suffix and path.with_suffix(answer_suffix).exists()
+    ]
+
+
+def _mime(path: Path) -> str:
+    return mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+
+
+def stages(args: argparse.Namespace) -> Dict[str, Stage]:
+    fixtures = json.loads(FIXTURES.read_text())
+    found = {
+        "zeroshot": Stage(
+            [(c["text"], c["label"]) for c in fixtures["zeroshot"]],
+            lambda m, text: m.classify_sync(text).label,
+            lambda want, got: float(want == got),
+        ),
+        "summarize": Stage(
+            [(text, None) for text in fixtures["summarize"]],
+            lambda m, text: m.summarize_sync(text).text,
+            rouge1,
+        ),
+    }
+    if args.images:
+        found["vqa"] = Stage(
+            [
+                (path, label == "damaged")
+                for label in ("damaged", "intact")
+                for path in sorted((args.images / label).glob("*"))
+            ],
+            lambda m, path: m.is_damaged_sync(path),
+            lambda want, got: float(want == got),
+        )
+    if args.audio:
+        found["asr"] = Stage(
+            [(path, ref.read_text().strip()) for path, ref in _pairs(args.audio, ".txt")],
+            lambda m, path: m.transcribe_sync(path, _mime(path)).text,
+            lambda want, got: max(0.0, 1 - wer(want, got)),
+        )
+    if args.docs:
+        found["docqa"] = Stage(
+            [(path, json.loads(ref.read_text())) for path, ref in _pairs(args.docs, ".json")],
+            lambda m, path: m.extract_document_sync(path, _mime(path)).fields.model_dump(
+                mode="json", exclude={"confidence"}
+            ),
+            field_match,
+        )
+    return found
+
+
+def _use_backend(stage: str, backend: str) -> Any:
+    name, cached = _MODULES[stage]
+    os.environ[f"ML_BACKEND_{stage.upper()}"] = backend
+    module = importlib.import_module(name)
+    for attr in cached:
+        setattr(module, attr, None)
+    gc.collect()
+    return module
+
+
+def measure(stage: str, spec: Stage, backend: str) -> Dict[str, Any]:
+    from common.ml import preload
+
+    module = _use_backend(stage, backend)
+    start = time.perf_counter()
+    preload.loader(stage)()
+    load_s = time.perf_counter() - start
+
+    outputs, latencies = [], []
+    for item, _ in spec.cases:
+        # warm-up; docqa's OCR cache is then warm for every backend alike
+        spec.run(module, item)
+        start = time.perf_counter()
+        outputs.append(spec.run(module, item))
+        latencies.append(time.perf_counter() - start)
+    return {"load_s": load_s, "latencies": latencies, "outputs": outputs}
+
+
+def _mean(values: List[Optional[float]]) -> Optional[float]:
+    values = [v for v in values if v is not None]
+    return statistics.fmean(values) if values else None
+
+
+def _fmt(value: Optional[float]) -> str:
+    return f"{value:>9.3f}" if value is not None else f"{'-':>9}"
+
+
+def report(
+    stage: str, backend: str, spec: Stage, result: Dict[str, Any], baseline: List[Any]
+) -> None:
+    ms = sorted(t * 1000 for t in result["latencies"])
+    p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+    accuracy = _mean(
+        [spec.score(want, got) if want is not None else None
+         for (_, want), got in zip(spec.cases, result["outputs"])]
+    )
+    agree = _mean([spec.score(base, got) for base, got in zip(baseline, result["outputs"])])
+    print(
+        f"{stage:<10}{backend:<12}{result['load_s']:>8.1f}{statistics.median(ms):>10.1f}"
+        f"{p95:>10.1f}{_fmt(accuracy)}{_fmt(agree)}"
+    )
+
+
+def main(args: argparse.Namespace) -> None:
+    os.environ.setdefault("ML_MODE", "real")
+    import torch
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    available = stages(args)
+    wanted = [s.strip() for s in args.stages.split(",") if s.strip()]
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    print(f"torch_threads={torch.get_num_threads()}")
+    print(
+        f"{'stage':<10}{'backend':<12}{'load s':>8}{'p50 ms':>10}{'p95 ms':>10}"
+        f"{'accuracy':>9}{'agree':>9}"
+    )
+    for stage in wanted:
+        if stage not in available:
+            print(f"{stage:<10}skipped, no samples given")
+            continue
+        spec = available[stage]
+        baseline: List[Any] = []
+        for backend in backends:
+            try:
+                result = measure(stage, spec, backend)
+            except (RuntimeError, ValueError) as exc:
+                print(f"{stage:<10}{backend:<12}unavailable: {exc}")
+                continue
+            baseline = baseline or result["outputs"]
+            report(stage, backend, spec, result, baseline)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stages", default="zeroshot,summarize,vqa,asr,docqa")
+    parser.add_argument("--backends", default="torch,torch-int8,onnx,onnx-int8")
+    parser.add_argument("--images", type=Path)
+    parser.add_argument("--audio", type=Path)
+    parser.add_argument("--docs", type=Path)
+    parser.add_argument("--threads", type=int, default=None)
+    main(parser.parse_args())
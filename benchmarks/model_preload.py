@@ -0,0 +1,97 @@
+"""Per-child memory and first-task latency with and without model preloading.
+
+Forks ``--children`` processes the way the Celery prefork pool does. Each one
+runs its first task, i.e. fetches every model through the same getter the
+tasks use, and reports how long that took and its memory from
+``/proc/self/smaps_rollup``. ``private`` is what the child does not share
+with anyone; preloaded weights should show up in ``pss`` split across the
+children instead. Linux only; needs the real models (ML_MODE=real).
+
+    python -m benchmarks.model_preload --models zeroshot,vqa --children 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import multiprocessing as mp
+import os
+import time
+
+from common.ml import preload as ml_preload
+
+
+def _memory_mb() -> dict[str, float]:
+    values: dict[str, int] = {}
+    with open("/proc/self/smaps_rollup") as fh:
+        for line in fh:
+            key, _, rest = line.partition(":")
+            parts = rest.split()
+            if parts and parts[-1] == "kB":
+                values[key] = int(parts[0])
+    return {
+        "rss_mb": values["Rss"] / 1024,
+        "pss_mb": values["Pss"] / 1024,
+        "private_mb": (values["Private_Clean"] + values["Private_Dirty"]) / 1024,
+    }
+
+
+def _child(names: list[str], conn) -> None:
+    start = time.perf_counter()
+    for name in names:
+        ml_preload.loader(name)()
+    first_task_s = time.perf_counter() - start
+    # let the other children finish loading so PSS reflects the steady state
+    conn.recv()
+    conn.send({"first_task_s": first_task_s, **_memory_mb()})
+    conn.close()
+
+
+def measure(names: list[str], children: int, preload: bool) -> list[dict]:
+    """Fork ``children`` workers after (optionally) preloading ``names``."""
+    if preload:
+        ml_preload.preload(names)
+    ctx = mp.get_context("fork")
+    conns, procs = [], []
+    for _ in range(children):
+        parent_conn, child_conn = ctx.Pipe()
+        proc = ctx.Process(target=_child, args=(names, child_conn))
+        proc.start()
+        conns.append(parent_conn)
+        procs.append(proc)
+    for conn in conns:
+        conn.send("report")
+    results = [conn.recv() for conn in conns]
+    for proc in procs:
+        proc.join()
+    if preload:
+        gc.unfreeze()
+    return results
+
+
+def report(mode: str, results: list[dict]) -> None:
+    for i, r in enumerate(results):
+        print(
+            f"{mode:<10}{i:>6}{r['first_task_s'] * 1000:>16.1f}"
+            f"{r['rss_mb']:>10.1f}{r['pss_mb']:>10.1f}{r['private_mb']:>12.1f}"
+        )
+
+
+def main(args: argparse.Namespace) -> None:
+    os.environ.setdefault("ML_MODE", "real")
+    names = [n.strip() for n in args.models.split(",") if n.strip()]
+    print(f"models={','.join(names)} children={args.children}")
+    print(
+        f"{'mode':<10}{'child':>6}{'first task ms':>16}"
+        f"{'rss MB':>10}{'pss MB':>10}{'private MB':>12}"
+    )
+    # lazy first: once the parent has loaded a model it cannot be unloaded
+    report("lazy", measure(names, args.children, preload=False))
+    report("preloaded", measure(names, args.children, preload=True))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--models", default="zeroshot")
+    parser.add_argument("--children", type=int, default=4)
+    main(parser.parse_args())
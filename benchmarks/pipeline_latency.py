@@ -0,0 +1,117 @@
+"""Ingest-to-ticket latency of the Celery pipeline.
+
+Needs the compose stack (postgres, redis, worker) with ML_MODE=stub on the
+worker. Inserts N synthetic messages, starts ``pipeline.run`` for each and
+reports p50/p99 of TICKET_CREATED.ts - INGESTED.ts (both database clock).
+
+    python -m benchmarks.pipeline_latency --messages 200 --rate 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+from api.app.db import SessionLocal
+from common.db.dao import MessageRepository
+from worker.celery_app import app
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[idx]
+
+
+async def _ingest(n: int, body: str) -> list[str]:
+    ids: list[str] = []
+    async with SessionLocal() as session:
+        repo = MessageRepository(session)
+        for _ in range(n):
+            mid = await repo.upsert_message(
+                source="bench",
+                external_id=uuid.uuid4().hex,
+                subject="bench",
+                from_addr="bench@example.com",
+                ts=datetime.now(timezone.utc),
+                body_text=body,
+            )
+            ids.append(mid)
+        await session.commit()
+    return ids
+
+
+async def _mark_ingested(session, message_id: str) -> None:
+    await MessageRepository(session).insert_event(
+        ticket_id=None,
+        message_id=message_id,
+        type_="INGESTED",
+        payload={"source": "bench", "message_id": message_id},
+    )
+    await session.commit()
+
+
+async def _latencies(ids: list[str]) -> dict[str, float]:
+    async with SessionLocal() as session:
+        rows = (
+            await session.execute(
+                text(
+                    """
+                    select i.message_id::text as mid,
+                           extract(epoch from min(t.ts) - min(i.ts)) as latency
+                    from events i
+                    join events t
+                      on t.message_id = i.message_id
+                     and t.type = 'TICKET_CREATED'
+                    where i.type = 'INGESTED'
+                      and i.message_id = any(cast(:ids as uuid[]))
+                    group by i.message_id
+                    """
+                ),
+                {"ids": ids},
+            )
+        ).all()
+    return {r.mid: float(r.latency) for r in rows}
+
+
+async def main(messages: int, rate: float, timeout: float, body: str) -> None:
+    ids = await _ingest(messages, body)
+    interval = 1.0 / rate if rate > 0 else 0.0
+    async with SessionLocal() as session:
+        for mid in ids:
+            await _mark_ingested(session, mid)
+            app.send_task("pipeline.run", args=[mid])
+            if interval:
+                await asyncio.sleep(interval)
+
+    deadline = time.monotonic() + timeout
+    done: dict[str, float] = {}
+    while time.monotonic() < deadline:
+        done = await _latencies(ids)
+        if len(done) == len(ids):
+            break
+        await asyncio.sleep(1.0)
+
+    values = list(done.values())
+    print(f"messages={messages} completed={len(values)} rate={rate}/s")
+    if not values:
+        return
+    print(f"p50={_percentile(values, 50):.3f}s")
+    print(f"p99={_percentile(values, 99):.3f}s")
+    print(f"mean={statistics.mean(values):.3f}s max={max(values):.3f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=10.0, help="messages per second, 0 = burst")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--body", default="Hi, I need a refund for order #A10023, it was $59.99.")
+    args = parser.parse_args()
+    asyncio.run(main(args.messages, args.rate, args.timeout, args.body))
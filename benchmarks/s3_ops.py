@@ -0,0 +1,87 @@
+"""S3 put/get/presign throughput: client per call vs one pooled client.
+
+Runs against the configured S3 endpoint (MinIO in docker-compose). The
+"ephemeral" mode reproduces the old behaviour -- a fresh aioboto3 client for
+every call and a HEAD bucket before every put -- while "pooled" opens the
+process-wide client once and remembers the bucket.
+
+    python -m benchmarks.s3_ops --ops 500 --concurrency 8 --size 32768
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import time
+import uuid
+
+from common.storage import s3
+
+
+async def _run_op(storage: s3.AttachmentStorage, op: str, keys: list[str], payload: bytes, i: int):
+    if op == "put":
+        return await storage.put(
+            payload, "application/octet-stream", f"bench-{uuid.uuid4().hex}.bin"
+        )
+    if op == "get":
+        return await storage.get(keys[i % len(keys)])
+    return await storage.presign(keys[i % len(keys)])
+
+
+async def _bench_op(
+    storage, op: str, keys, payload: bytes, ops: int, concurrency: int, pooled: bool
+):
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        if not pooled:
+            # old code path: bucket existence was re-checked on every put
+            s3._known_buckets.clear()
+        async with sem:
+            await _run_op(storage, op, keys, payload, i)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(ops)))
+    return ops / (time.perf_counter() - started)
+
+
+async def _main(args: argparse.Namespace) -> None:
+    storage = s3.AttachmentStorage()
+    payload = os.urandom(args.size)
+    await storage.ensure_bucket()
+    keys = [
+        await storage.put(payload, "application/octet-stream", f"bench-seed-{i}.bin")
+        for i in range(16)
+    ]
+
+    results: dict[str, dict[str, float]] = {}
+    for mode in ("ephemeral", "pooled"):
+        pooled = mode == "pooled"
+        if pooled:
+            await s3.open_client()
+        try:
+            results[mode] = {
+                op: await _bench_op(storage, op, keys, payload, args.ops, args.concurrency, pooled)
+                for op in ("put", "get", "presign")
+            }
+        finally:
+            if pooled:
+                await s3.close_client()
+
+    print(f"{'op':<10}{'ephemeral/s':>14}{'pooled/s':>12}{'speedup':>10}")
+    for op in ("put", "get", "presign"):
+        before, after = results["ephemeral"][op], results["pooled"][op]
+        print(f"{op:<10}{before:>14.1f}{after:>12.1f}{after / before:>9.1f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ops", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--size", type=int, default=32 * 1024, help="object size in bytes")
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
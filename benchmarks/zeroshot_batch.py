@@ -0,0 +1,58 @@
+"""Zero-shot classification throughput on CPU by batch size.
+
+Runs ``classify_batch_sync`` with the real bart-large-mnli model (ML_MODE must
+not be ``stub``) over the same set of messages at batch sizes 1, 8 and 32.
+
+    python -m benchmarks.zeroshot_batch --messages 64 --threads 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+
+SAMPLES = [
+    "Hi, I need a refund for order #A10023, the item arrived broken.",
+    "My package never arrived, tracking has not moved for two weeks.",
+    "The blender stopped working after a month, is it covered by warranty?",
+    "Please ship my order to 12 High Street instead of my old address.",
+    "How do I reset the device to factory settings?",
+    "Thanks for the quick reply yesterday, all sorted now.",
+    "I was charged twice for the same order, please refund one payment.",
+    "Where is my order? It was supposed to arrive on Monday.",
+]
+
+
+def main(messages: int, batch_sizes: list[int], threads: int | None) -> None:
+    os.environ.setdefault("ML_MODE", "real")
+    import torch
+
+    from common.ml.zeroshot import _get_zs, classify_batch_sync
+
+    if threads:
+        torch.set_num_threads(threads)
+    texts = [SAMPLES[i % len(SAMPLES)] for i in range(messages)]
+
+    _get_zs()
+    classify_batch_sync(texts[:2])  # warm-up
+
+    print(f"messages={messages} torch_threads={torch.get_num_threads()}")
+    baseline = None
+    for bs in batch_sizes:
+        start = time.perf_counter()
+        for i in range(0, len(texts), bs):
+            classify_batch_sync(texts[i : i + bs])
+        elapsed = time.perf_counter() - start
+        rate = messages / elapsed
+        baseline = baseline or rate
+        print(f"batch={bs:<3} {rate:7.2f} msg/s  {elapsed:7.2f}s  x{rate / baseline:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=64)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+    main(args.messages, args.batch_sizes, args.threads)
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import redis.asyncio as aioredis
+from cachetools import LRUCache
+
+from api.app.config import settings
+from common.metrics import counter
+
+LOG = logging.getLogger(__name__)
+
+CACHE_LOOKUPS = counter(
+    "shopdesk_enrich_cache_lookups_total",
+    "Enrichment cache lookups by cache and outcome (local_hit, redis_hit, miss, coalesced)",
+    ["cache", "result"],
+)
+
+# After a Redis error the shared tier is skipped for this long instead of
+# paying a connect timeout on every lookup.
+_REDIS_RETRY_AFTER_S = 30.0
+
+
+class TwoTierCache:
+    """Bounded in-process LRU in front of a shared Redis tier.
+
+    ``None`` results are cached too, with their own (shorter) TTL, so an order
+    that does not exist is not looked up again on every ticket. Concurrent
+    misses for the same key in one process share a single loader call.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        max_entries: int,
+        ttl_s: float,
+        negative_ttl_s: float,
+        redis_url: Optional[str] = None,
+    ) -> None:
+        self.name = name
+        self.ttl_s = ttl_s
+        self.negative_ttl_s = negative_ttl_s
+        self.redis_url = redis_url
+        self._local: LRUCache = LRUCache(maxsize=max_entries)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._redis: Optional[aioredis.Redis] = None
+        self._redis_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._redis_down_until = 0.0
+
+    def _ttl(self, value: Any) -> float:
+        return self.ttl_s if value is not None else self.negative_ttl_s
+
+    def _redis_key(self, key: str) -> str:
+        return f"enrich:{self.name}:{key}"
+
+    def _get_redis(self) -> Optional[aioredis.Redis]:
+        if not self.redis_url or time.monotonic() < self._redis_down_until:
+            return None
+        loop = asyncio.get_running_loop()
+        if self._redis is None or self._redis_loop is not loop:
+            self._redis = aioredis.from_url(
+                self.redis_url, socket_connect_timeout=0.5, socket_timeout=0.5
+            )
+            self._redis_loop = loop
+        return self._redis
+
+    def _redis_failed(self, exc: Exception) -> None:
+        LOG.warning("enrichment cache %s: redis unavailable (%s)", self.name, exc)
+        self._redis_down_until = time.monotonic() + _REDIS_RETRY_AFTER_S
+
+    def _get_local(self, key: str) -> Tuple[bool, Any]:
+        entry = self._local.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._local.pop(key, None)
+            return False, None
+        return True, value
+
+    def _set_local(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self._local[key] = (time.monotonic() + (ttl or self._ttl(value)), value)
+
+    async def _get_shared(self, key: str) -> Tuple[bool, Any, float]:
+        redis = self._get_redis()
+        if redis is None:
+            return False, None, 0.0
+        try:
+            pipe = redis.pipeline()
+            pipe.get(self._redis_key(key))
+            pipe.pttl(self._redis_key(key))
+            raw, pttl = await pipe.execute()
+        except Exception as exc:
+            self._redis_failed(exc)
+            return False, None, 0.0
+        if raw is None:
+            return False, None, 0.0
+        return True, json.loads(raw), max(pttl, 0) / 1000.0
+
+    async def _set_shared(self, key: str, value: Any) -> None:
+        redis = self._get_redis()
+        if redis is None:
+            return
+        try:
+            await redis.set(
+                self._redis_key(key),
+                json.dumps(value, default=str),
+                px=int(self._ttl(value) * 1000),
+            )
+        except Exception as exc:
+            self._redis_failed(exc)
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        found, value = self._get_local(key)
+        if found:
+            CACHE_LOOKUPS.labels(cache=self.name, result="local_hit").inc()
+            return value
+
+        pending = self._inflight.get(key)
+        if pending is not None and pending.get_loop() is asyncio.get_running_loop():
+            CACHE_LOOKUPS.labels(cache=self.name, result="coalesced").inc()
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                # The leading caller was cancelled (its own timeout, say),
+                # not this one: load it ourselves.
+                return await self.get_or_load(key, loader)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            found, value, remaining = await self._get_shared(key)
+            if found:
+                CACHE_LOOKUPS.labels(cache=self.name, result="redis_hit").inc()
+                # don't outlive the shared entry
+                self._set_local(key, value, ttl=remaining or None)
+            else:
+                CACHE_LOOKUPS.labels(cache=self.name, result="miss").inc()
+                value = await loader()
+                self._set_local(key, value)
+                await self._set_shared(key, value)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # waiters get the exception; mark it retrieved so an unawaited
+            # future doesn't log "exception was never retrieved"
+            future.exception()
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+
+def enrichment_cache(name: str) -> TwoTierCache:
+    return TwoTierCache(
+        name,
+        max_entries=settings.enrich_cache_max_entries,
+        ttl_s=settings.enrich_cache_ttl_s,
+        negative_ttl_s=settings.enrich_cache_negative_ttl_s,
+        redis_url=settings.redis_url if settings.enrich_cache_redis else None,
+    )
@@ -1,8 +1,9 @@
 from __future__ import annotations
 import base64
-from typing import Dict
+from typing import Dict, Optional
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 
 
 class GmailClient:
@@ -19,12 +20,74 @@ class GmailClient:
         )
         return [m["id"] for m in resp.get("messages", [])]
 
+    def get_history_id(self) -> str:
+        resp = self.svc.users().getProfile(userId=self.user_id).execute()
+        return str(resp["historyId"])
+
+    def list_history(
+        self, start_history_id: str, label_id: Optional[str] = None, max_results: int = 500
+    ) -> tuple[list[str], str]:
+        # Returns ids of messages added since start_history_id plus the
+        # mailbox historyId to resume from. Raises HttpError 404 when the
+        # checkpoint is older than Gmail's history retention.
+        ids: list[str] = []
+        seen: set[str] = set()
+        history_id = start_history_id
+        page_token = None
+        while True:
+            params = {
+                "userId": self.user_id,
+                "startHistoryId": start_history_id,
+                "historyTypes": ["messageAdded"],
+                "maxResults": max_results,
+            }
+            if label_id:
+                params["labelId"] = label_id
+            if page_token:
+                params["pageToken"] = page_token
+            resp = self.svc.users().history().list(**params).execute()
+            for record in resp.get("history", []):
+                for added in record.get("messagesAdded", []):
+                    mid = added["message"]["id"]
+                    if mid not in seen:
+                        seen.add(mid)
+                        ids.append(mid)
+            history_id = str(resp.get("historyId", history_id))
+            page_token = resp.get("nextPageToken")
+            if not page_token:
+                return ids, history_id
+
     def get_raw_message(self, msg_id: str) -> bytes:
         resp = (
             self.svc.users().messages().get(userId=self.user_id, id=msg_id, format="raw").execute()
         )
         return base64.urlsafe_b64decode(resp["raw"])
 
+    def get_raw_messages(self, msg_ids: list[str], batch_size: int = 50) -> Dict[str, bytes]:
+        # One HTTP round trip per batch_size messages (Gmail caps batches at
+        # 100 and recommends <= 50). Messages deleted since listing (404) are
+        # skipped; any other failure is raised after the batch completes.
+        raws: Dict[str, bytes] = {}
+        errors: list[Exception] = []
+
+        def on_response(request_id: str, response: dict, exception: Optional[Exception]) -> None:
+            if exception is None:
+                raws[request_id] = base64.urlsafe_b64decode(response["raw"])
+            elif not (isinstance(exception, HttpError) and exception.resp.status == 404):
+                errors.append(exception)
+
+        for i in range(0, len(msg_ids), batch_size):
+            batch = self.svc.new_batch_http_request(callback=on_response)
+            for msg_id in msg_ids[i : i + batch_size]:
+                batch.add(
+                    self.svc.users().messages().get(userId=self.user_id, id=msg_id, format="raw"),
+                    request_id=msg_id,
+                )
+            batch.execute()
+            if errors:
+                raise errors[0]
+        return raws
+
     def get_headers(self, msg_id: str) -> Dict[str, str]:
         resp = (
             self.svc.users()
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from api.app.config import settings
+from common.clients import ratelimit
+from common.metrics import gauge, histogram
+
+LOG = logging.getLogger(__name__)
+
+DEPENDENCY_LATENCY = histogram(
+    "shopdesk_dependency_latency_seconds",
+    "External call latency by dependency and outcome (ok, error, timeout, throttled, open)",
+    ["dependency", "outcome"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+BREAKER_OPEN = gauge(
+    "shopdesk_circuit_open",
+    "1 while the dependency's circuit breaker rejects calls",
+    ["dependency"],
+)
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker, one per dependency per process.
+
+    After ``failure_threshold`` failures in a row calls are rejected for
+    ``reset_after_s``; then a single trial call is let through and its
+    outcome closes the breaker or opens it again.
+    """
+
+    def __init__(self, name: str, *, failure_threshold: int, reset_after_s: float) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_after_s = reset_after_s
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        if self._opened_at is None:
+            return True
+        if self._trial or time.monotonic() - self._opened_at < self.reset_after_s:
+            return False
+        self._trial = True
+        return True
+
+    def record_success(self) -> None:
+        if self._opened_at is not None:
+            LOG.info("circuit %s closed", self.name)
+            BREAKER_OPEN.labels(dependency=self.name).set(0)
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+
+    def release_trial(self) -> None:
+        self._trial = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._trial or self._failures >= self.failure_threshold:
+            if self._opened_at is None:
+                LOG.warning("circuit %s opened after %s failures", self.name, self._failures)
+                BREAKER_OPEN.labels(dependency=self.name).set(1)
+            self._opened_at = time.monotonic()
+            self._trial = False
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def breaker(name: str) -> CircuitBreaker:
+    if name not in _breakers:
+        _breakers[name] = CircuitBreaker(
+            name,
+            failure_threshold=settings.breaker_failure_threshold,
+            reset_after_s=settings.breaker_reset_s,
+        )
+    return _breakers[name]
+
+
+async def guarded(
+    name: str, call: Callable[[], Awaitable[Any]], timeout_s: float
+) -> Tuple[str, Any, Optional[str]]:
+    """Run ``call`` under a timeout and the dependency's breaker.
+
+    Returns ``(outcome, value, error)`` where outcome is ``ok``, ``error``,
+    ``timeout``, ``throttled`` or ``open``; it never raises except on
+    cancellation. ``throttled`` means our own rate limiter held the call
+    back, which says nothing about the dependency's health.
+    """
+    cb = breaker(name)
+    if not cb.allow():
+        DEPENDENCY_LATENCY.labels(dependency=name, outcome="open").observe(0)
+        return "open", None, "circuit open"
+
+    start = time.perf_counter()
+    try:
+        value = await asyncio.wait_for(call(), timeout=max(timeout_s, 0))
+    except asyncio.TimeoutError:
+        outcome, value, error = "timeout", None, f"timed out after {timeout_s:.2f}s"
+    except asyncio.CancelledError:
+        # Cancelled by the caller, not a verdict on the dependency.
+        cb.release_trial()
+        raise
+    except ratelimit.Throttled as exc:
+        outcome, value, error = "throttled", None, str(exc)
+    except Exception as exc:
+        outcome, value, error = "error", None, str(exc) or type(exc).__name__
+    else:
+        outcome, error = "ok", None
+    DEPENDENCY_LATENCY.labels(dependency=name, outcome=outcome).observe(time.perf_counter() - start)
+
+    if outcome == "ok":
+        cb.record_success()
+    elif outcome == "throttled":
+        cb.release_trial()
+    else:
+        cb.record_failure()
+    return outcome, value, error
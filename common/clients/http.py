@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+from api.app.config import settings
+
+try:
+    import h2  # noqa: F401
+
+    HTTP2 = True
+except Exception:
+    HTTP2 = False
+
+# One pooled client per upstream, so connection limits apply per host.
+UPSTREAMS = ("shopify", "stripe", "zendesk")
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _new_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=HTTP2,
+        timeout=httpx.Timeout(settings.http_timeout_s, connect=settings.http_connect_timeout_s),
+        limits=httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry_s,
+        ),
+    )
+
+
+async def open_clients() -> None:
+    global _loop
+    if _clients:
+        return
+    for name in UPSTREAMS:
+        _clients[name] = _new_client()
+    _loop = asyncio.get_running_loop()
+
+
+async def close_clients() -> None:
+    global _loop
+    clients = list(_clients.values())
+    _clients.clear()
+    _loop = None
+    for c in clients:
+        await c.aclose()
+
+
+@asynccontextmanager
+async def client(name: str) -> AsyncIterator[httpx.AsyncClient]:
+    # Like common.storage.s3._s3: the shared pool is bound to the loop that
+    # opened it, anything else (scripts, tests) gets a throwaway client.
+    shared = _clients.get(name)
+    if shared is not None and _loop is asyncio.get_running_loop():
+        yield shared
+        return
+    async with _new_client() as c:
+        yield c
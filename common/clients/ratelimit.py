@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Optional, Tuple
+
+import redis.asyncio as aioredis
+
+from api.app.config import settings
+from common.metrics import histogram
+
+LOG = logging.getLogger(__name__)
+
+THROTTLE_WAIT = histogram(
+    "shopdesk_ratelimit_wait_seconds",
+    "Time spent waiting for a rate-limit token before an external call",
+    ["api"],
+    buckets=(0, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+# Token bucket with reservation. Tokens may go negative: a caller that has to
+# wait takes its token now and is told how long to sleep, so waiters queue up
+# in arrival order instead of polling. A caller whose wait would exceed
+# max_wait reserves nothing and gets a negative reply.
+#
+# KEYS[1] bucket key; ARGV: rate (tokens/s), burst, max_wait_ms
+# Returns the wait in ms (>= 0) or -(wait in ms) when it exceeds max_wait_ms.
+_TOKEN_BUCKET = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local max_wait = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = t[1] * 1000 + math.floor(t[2] / 1000)
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate / 1000)
+
+local wait = 0
+if tokens < 1 then
+  wait = math.ceil((1 - tokens) * 1000 / rate)
+  if wait > max_wait then
+    return -wait
+  end
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens - 1, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst * 1000 / rate) + wait + 1000)
+return wait
+"""
+
+# After a Redis error calls go out unthrottled for this long instead of paying
+# a connect timeout each time.
+_REDIS_RETRY_AFTER_S = 30.0
+
+
+class Throttled(Exception):
+    def __init__(self, api: str, retry_after: float) -> None:
+        super().__init__(f"{api} rate limit: next token in {retry_after:.2f}s")
+        self.api = api
+        self.retry_after = retry_after
+
+
+_redis: Optional[aioredis.Redis] = None
+_redis_loop: Optional[asyncio.AbstractEventLoop] = None
+_script = None
+_redis_down_until = 0.0
+
+
+def _limits(api: str) -> Tuple[float, float]:
+    return (
+        getattr(settings, f"ratelimit_{api}_rps"),
+        getattr(settings, f"ratelimit_{api}_burst"),
+    )
+
+
+def _bucket_key(api: str, credential: str) -> str:
+    # credentials never end up in Redis keys
+    digest = hashlib.sha256(credential.encode("utf-8")).hexdigest()[:16]
+    return f"ratelimit:{api}:{digest}"
+
+
+def _get_script():
+    global _redis, _redis_loop, _script
+    if not settings.ratelimit_enabled or time.monotonic() < _redis_down_until:
+        return None
+    loop = asyncio.get_running_loop()
+    if _redis is None or _redis_loop is not loop:
+        _redis = aioredis.from_url(
+            settings.redis_url, socket_connect_timeout=0.5, socket_timeout=0.5
+        )
+        _redis_loop = loop
+        _script = _redis.register_script(_TOKEN_BUCKET)
+    return _script
+
+
+async def _reserve(api: str, credential: str, max_wait_s: float) -> float:
+    global _redis_down_until
+    script = _get_script()
+    if script is None:
+        return 0.0
+    rate, burst = _limits(api)
+    try:
+        wait_ms = await script(
+            keys=[_bucket_key(api, credential)], args=[rate, burst, int(max_wait_s * 1000)]
+        )
+    except Exception as exc:
+        # Fail open: the upstream's own 429 handling still applies.
+        LOG.warning("rate limiter unavailable, not throttling %s (%s)", api, exc)
+        _redis_down_until = time.monotonic() + _REDIS_RETRY_AFTER_S
+        return 0.0
+    return int(wait_ms) / 1000.0
+
+
+async def acquire(api: str, credential: str, max_wait_s: Optional[float] = None) -> None:
+    """Take one token from the shared ``api``/``credential`` bucket.
+
+    Sleeps until the token is due. Raises ``Throttled`` without taking a
+    token if that would be longer than ``max_wait_s`` (default
+    ``ratelimit_max_wait_s``).
+    """
+    if max_wait_s is None:
+        max_wait_s = settings.ratelimit_max_wait_s
+    wait = await _reserve(api, credential, max_wait_s)
+    if wait < 0:
+        raise Throttled(api, -wait)
+    THROTTLE_WAIT.labels(api=api).observe(wait)
+    if wait > 0:
+        await asyncio.sleep(wait)
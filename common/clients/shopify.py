@@ -1,80 +1,196 @@
+import logging
 import os
 import time
-import httpx
-from typing import Any, Dict, Optional, Tuple
+from datetime import datetime
+from email.utils import parseaddr
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-_CACHE_TTL_SECONDS = 600
-_cache: dict[str, Tuple[float, Optional[Dict[str, Any]]]] = {}
+from api.app.db import SessionLocal
+from common.cache import enrichment_cache
+from common.clients import http, ratelimit
+from common.db.dao import MessageRepository
 
+LOG = logging.getLogger(__name__)
 
-def _now() -> float:
-    return time.time()
+_API_VERSION = "2023-10"
+SYNC_CURSOR = "shopify_orders"
 
+_cache = enrichment_cache("shopify_order")
+
+
+def _sandbox_enabled() -> bool:
+    return os.getenv("SHOPIFY_SANDBOX", "1").lower() in ("1", "true", "yes", "y")
 
-async def _fetch_order(order_id: str) -> Optional[Dict[str, Any]]:
-    sandbox_env = os.getenv("SHOPIFY_SANDBOX", "1").lower()
-    if sandbox_env in ("1", "true", "yes", "y"):
-        return {
-            "order_id": order_id,
-            "line_items": [{"title": "Sandbox Widget", "quantity": 1}],
-            "ship_status": "in_transit",
-            "payment_status": "paid",
-            "source": "sandbox",
-        }
 
+def _credentials() -> Optional[Tuple[str, str, str]]:
     api_key = os.getenv("SHOPIFY_API_KEY")
     password = os.getenv("SHOPIFY_PASSWORD")
     domain = os.getenv("SHOPIFY_DOMAIN")
-
     if not (api_key and password and domain):
         return None
+    return api_key, password, domain
 
-    clean_id = order_id.replace("#", "").strip()
-    url = f"https://{api_key}:{password}@{domain}/admin/api/2023-10/orders.json"
 
-    try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(url, params={"name": clean_id, "status": "any"})
+def _orders_url(domain: str) -> str:
+    # SHOPIFY_BASE_URL points the client at a stand-in (benchmarks.fakes)
+    base = os.getenv("SHOPIFY_BASE_URL") or f"https://{domain}"
+    return f"{base.rstrip('/')}/admin/api/{_API_VERSION}/orders.json"
+
+
+def _clean_id(order_id: str) -> str:
+    return order_id.replace("#", "").strip()
+
+
+def _parse_ts(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def order_row(order: Dict[str, Any]) -> Dict[str, Any]:
+    line_items = [
+        {"title": item.get("title"), "quantity": item.get("quantity"), "sku": item.get("sku")}
+        for item in order.get("line_items", [])
+    ]
+    email = order.get("email")
+    return {
+        "id": order["id"],
+        "name": _clean_id(order.get("name") or str(order.get("order_number") or order["id"])),
+        "order_number": order.get("order_number"),
+        "email": email.lower() if email else None,
+        "total_price": order.get("total_price"),
+        "currency": order.get("currency"),
+        "financial_status": order.get("financial_status"),
+        "fulfillment_status": order.get("fulfillment_status") or "unfulfilled",
+        "skus": sorted({item["sku"] for item in line_items if item["sku"]}),
+        "line_items": line_items,
+        "tracking_urls": [
+            f.get("tracking_url") for f in order.get("fulfillments", []) if f.get("tracking_url")
+        ],
+        "created_at": _parse_ts(order.get("created_at")),
+        "updated_at": _parse_ts(order.get("updated_at")),
+    }
+
+
+def _to_result(row: Dict[str, Any]) -> Dict[str, Any]:
+    total = row.get("total_price")
+    return {
+        "id": row["id"],
+        "order_number": row.get("order_number"),
+        "email": row.get("email"),
+        "total_price": str(total) if total is not None else None,
+        "currency": row.get("currency"),
+        "financial_status": row.get("financial_status"),
+        "fulfillment_status": row.get("fulfillment_status"),
+        "line_items": row.get("line_items") or [],
+        "tracking_urls": list(row.get("tracking_urls") or []),
+    }
+
+
+async def list_orders(
+    updated_at_min: str, page_size: int = 250
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    creds = _credentials()
+    if _sandbox_enabled() or not creds:
+        return
+    api_key, password, domain = creds
+    url: Optional[str] = _orders_url(domain)
+    params: Optional[Dict[str, Any]] = {
+        "status": "any",
+        "updated_at_min": updated_at_min,
+        "order": "updated_at asc",
+        "limit": page_size,
+    }
+    async with http.client("shopify") as client:
+        while url:
+            await ratelimit.acquire("shopify", domain)
+            resp = await client.get(url, params=params, auth=(api_key, password))
             resp.raise_for_status()
+            orders = resp.json().get("orders", [])
+            if orders:
+                yield orders
+            # Cursor pagination: the next link carries page_info and must be
+            # requested without the original filters.
+            url = resp.links.get("next", {}).get("url")
+            params = None
 
-            data = resp.json()
-            orders = data.get("orders", [])
-            if not orders:
-                return None
-
-            order = orders[0]
-            return {
-                "id": order.get("id"),
-                "order_number": order.get("order_number"),
-                "email": order.get("email"),
-                "total_price": order.get("total_price"),
-                "currency": order.get("currency"),
-                "financial_status": order.get("financial_status"),
-                "fulfillment_status": order.get("fulfillment_status") or "unfulfilled",
-                "line_items": [
-                    {
-                        "title": item.get("title"),
-                        "quantity": item.get("quantity"),
-                        "sku": item.get("sku"),
-                    }
-                    for item in order.get("line_items", [])
-                ],
-                "tracking_urls": [
-                    f.get("tracking_url")
-                    for f in order.get("fulfillments", [])
-                    if f.get("tracking_url")
-                ],
-            }
-    except Exception:
+
+async def _fetch_order(
+    order_id: str, max_wait_s: Optional[float] = None
+) -> Optional[Dict[str, Any]]:
+    creds = _credentials()
+    if not creds:
+        return None
+    api_key, password, domain = creds
+    url = _orders_url(domain)
+
+    # Throttling, transport and HTTP errors propagate: the cache must only
+    # remember "no order" when Shopify actually said so.
+    await ratelimit.acquire("shopify", domain, max_wait_s)
+    async with http.client("shopify") as client:
+        resp = await client.get(
+            url, params={"name": _clean_id(order_id), "status": "any"}, auth=(api_key, password)
+        )
+        resp.raise_for_status()
+        orders = resp.json().get("orders", [])
+    if not orders:
         return None
 
+    row = order_row(orders[0])
+    # Write through so the next lookup for this order stays local even if
+    # the sync job has not reached it yet.
+    try:
+        async with SessionLocal() as session:
+            await MessageRepository(session).upsert_shopify_orders([row])
+            await session.commit()
+    except Exception:
+        LOG.warning("shopify: could not mirror order %s", row["name"], exc_info=True)
+    return _to_result(row)
+
+
+async def _lookup(
+    order_id: Optional[str],
+    email: Optional[str],
+    sku: Optional[str],
+    max_wait_s: Optional[float] = None,
+) -> Optional[Dict[str, Any]]:
+    if _sandbox_enabled():
+        return {
+            "order_id": order_id,
+            "line_items": [{"title": "Sandbox Widget", "quantity": 1, "sku": sku}],
+            "ship_status": "in_transit",
+            "payment_status": "paid",
+            "source": "sandbox",
+        }
+
+    clean_id = _clean_id(order_id) if order_id else None
+    address = parseaddr(email)[1].lower() if email else None
+
+    # Served from the shopify_orders mirror kept current by
+    # worker.jobs.shopify_sync; only an order id miss goes to the API.
+    started = time.monotonic()
+    async with SessionLocal() as session:
+        row = await MessageRepository(session).find_shopify_order(
+            order_id=clean_id, email=address or None, sku=sku
+        )
+    if row:
+        return _to_result(row)
+    if clean_id:
+        if max_wait_s is not None:
+            max_wait_s = max(0.0, max_wait_s - (time.monotonic() - started))
+        return await _fetch_order(clean_id, max_wait_s)
+    return None
+
+
+async def get_order(order_id: str, max_wait_s: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    return await _cache.get_or_load(order_id, lambda: _lookup(order_id, None, None, max_wait_s))
 
-async def get_order(order_id: str) -> Optional[Dict[str, Any]]:
-    now = _now()
-    cached = _cache.get(order_id)
-    if cached and now - cached[0] < _CACHE_TTL_SECONDS:
-        return cached[1]
 
-    res = await _fetch_order(order_id)
-    _cache[order_id] = (now, res)
-    return res
+async def find_order(
+    order_id: Optional[str] = None,
+    email: Optional[str] = None,
+    sku: Optional[str] = None,
+    max_wait_s: Optional[float] = None,
+) -> Optional[Dict[str, Any]]:
+    if order_id and not (email or sku):
+        return await get_order(order_id, max_wait_s)
+    cache_key = f"{order_id or ''}:{email or ''}:{sku or ''}"
+    return await _cache.get_or_load(cache_key, lambda: _lookup(order_id, email, sku, max_wait_s))
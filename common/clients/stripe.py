@@ -1,22 +1,89 @@
 import os
-import time
-import stripe
-import asyncio
-from typing import Any, Dict, Optional, Tuple
-
-_CACHE_TTL_SECONDS = 600
-_cache: dict[str, Tuple[float, Optional[Dict[str, Any]]]] = {}
-
-
-def _now() -> float:
-    return time.time()
-
-
-def _fetch_charge_sync(
+from datetime import datetime, timezone
+from email.utils import parseaddr
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from api.app.db import SessionLocal
+from common.cache import enrichment_cache
+from common.clients import http, ratelimit
+from common.db.dao import MessageRepository
+
+_API_BASE = "https://api.stripe.com/v1"
+SYNC_CURSOR = "stripe_charges"
+
+_cache = enrichment_cache("stripe_charge")
+
+
+def _sandbox_enabled() -> bool:
+    return os.getenv("STRIPE_SANDBOX", "1").lower() in ("1", "true", "yes", "y")
+
+
+def _api_key() -> Optional[str]:
+    return os.getenv("STRIPE_API_KEY")
+
+
+def _api_base() -> str:
+    return (os.getenv("STRIPE_API_BASE") or _API_BASE).rstrip("/")
+
+
+def charge_row(charge: Dict[str, Any]) -> Dict[str, Any]:
+    card = (charge.get("payment_method_details") or {}).get("card") or {}
+    billing = charge.get("billing_details") or {}
+    email = billing.get("email") or charge.get("receipt_email")
+    order_id = (charge.get("metadata") or {}).get("order_id")
+    return {
+        "id": charge["id"],
+        "created": datetime.fromtimestamp(charge["created"], tz=timezone.utc),
+        "amount_cents": charge["amount"],
+        "currency": (charge.get("currency") or "").upper() or None,
+        "status": charge.get("status"),
+        "email": email.lower() if email else None,
+        "order_id": order_id.replace("#", "").strip() if order_id else None,
+        "receipt_url": charge.get("receipt_url"),
+        "card_brand": card.get("brand"),
+        "risk_score": (charge.get("outcome") or {}).get("risk_score"),
+        "raw": charge,
+    }
+
+
+def _to_result(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "charge_id": row["id"],
+        "amount": row["amount_cents"] / 100.0,
+        "status": row["status"],
+        "payment_status": row["status"],
+        "receipt_url": row.get("receipt_url"),
+        "card_brand": row.get("card_brand"),
+        "risk_score": row.get("risk_score"),
+        "currency": row.get("currency"),
+    }
+
+
+async def list_charges(
+    created_gte: int, page_size: int = 100
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    api_key = _api_key()
+    if _sandbox_enabled() or not api_key:
+        return
+    params: Dict[str, Any] = {"created[gte]": created_gte, "limit": page_size}
+    async with http.client("stripe") as client:
+        while True:
+            await ratelimit.acquire("stripe", api_key)
+            resp = await client.get(f"{_api_base()}/charges", params=params, auth=(api_key, ""))
+            resp.raise_for_status()
+            data = resp.json()
+            charges = data.get("data", [])
+            if charges:
+                yield charges
+            if not data.get("has_more") or not charges:
+                return
+            params["starting_after"] = charges[-1]["id"]
+
+
+async def _lookup(
     order_id: Optional[str], email: Optional[str], amount: Optional[float]
 ) -> Optional[Dict[str, Any]]:
-    sandbox_env = os.getenv("STRIPE_SANDBOX", "1").lower()
-    if sandbox_env in ("1", "true", "yes", "y"):
+    if _sandbox_enabled():
         return {
             "charge_id": "ch_stub_123",
             "status": "succeeded",
@@ -26,70 +93,26 @@ def _fetch_charge_sync(
             "source": "sandbox",
         }
 
-    api_key = os.getenv("STRIPE_API_KEY")
-    if not api_key:
-        return None
-
-    stripe.api_key = api_key
-
-    query_parts = []
-
-    if email:
-        query_parts.append(f"email:'{email}'")
-
+    address = parseaddr(email)[1].lower() if email else None
+    amount_cents = None
     if amount:
         try:
-            amount_cents = int(amount * 100)
-            query_parts.append(f"amount={amount_cents}")
-        except Exception:
+            amount_cents = round(float(amount) * 100)
+        except (TypeError, ValueError):
             pass
+    clean_id = order_id.replace("#", "").strip() if order_id else None
 
-    if order_id:
-        clean_id = order_id.replace("#", "")
-        query_parts.append(f"metadata['order_id']:'{clean_id}'")
-
-    if not query_parts:
-        return None
-
-    query = " AND ".join(query_parts)
-
-    try:
-        resp = stripe.Charge.search(query=query, limit=1)
-        if resp.data:
-            charge = resp.data[0]
-            pm_details = getattr(charge, "payment_method_details", None)
-            card_brand = (
-                getattr(pm_details.card, "brand", None)
-                if pm_details and getattr(pm_details, "card", None)
-                else None
-            )
-            outcome = getattr(charge, "outcome", None)
-            risk_score = getattr(outcome, "risk_score", None) if outcome else None
-            return {
-                "charge_id": charge.id,
-                "amount": charge.amount / 100.0,
-                "status": charge.status,
-                "payment_status": charge.status,
-                "receipt_url": getattr(charge, "receipt_url", None),
-                "card_brand": card_brand,
-                "risk_score": risk_score,
-                "currency": getattr(charge, "currency", None),
-            }
-    except Exception:
-        return None
-
-    return None
+    # Served from the stripe_charges index kept current by worker.jobs.stripe_sync
+    # rather than the slow, eventually consistent Charge search API.
+    async with SessionLocal() as session:
+        row = await MessageRepository(session).find_stripe_charge(
+            order_id=clean_id, email=address or None, amount_cents=amount_cents
+        )
+    return _to_result(row) if row else None
 
 
 async def find_charge(
     order_id: Optional[str] = None, email: Optional[str] = None, amount: Optional[float] = None
 ) -> Optional[Dict[str, Any]]:
-    now = _now()
     cache_key = f"{order_id or ''}:{email or ''}:{amount or ''}"
-    cached = _cache.get(cache_key)
-    if cached and now - cached[0] < _CACHE_TTL_SECONDS:
-        return cached[1]
-
-    res = await asyncio.to_thread(_fetch_charge_sync, order_id, email, amount)
-    _cache[cache_key] = (now, res)
-    return res
+    return await _cache.get_or_load(cache_key, lambda: _lookup(order_id, email, amount))
@@ -1,7 +1,13 @@
 import os
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 
-import httpx
+from common.clients import http, ratelimit
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(f"rate limited, retry after {retry_after:.0f}s")
+        self.retry_after = retry_after
 
 
 def _sandbox_enabled() -> bool:
@@ -9,26 +15,46 @@ def _sandbox_enabled() -> bool:
 
 
 def _base_url() -> Optional[str]:
+    override = os.getenv("ZENDESK_BASE_URL")
+    if override:
+        return override.rstrip("/")
     subdomain = os.getenv("ZENDESK_SUBDOMAIN")
     if not subdomain:
         return None
     return f"https://{subdomain}.zendesk.com/api/v2"
 
 
-async def create_ticket(ticket: Dict[str, Any]) -> Optional[str]:
-    if _sandbox_enabled():
-        return f"zd_stub_{ticket.get('subject','ticket')}"
-
+def _api() -> Optional[Tuple[str, Tuple[str, str]]]:
     base = _base_url()
     email = os.getenv("ZENDESK_EMAIL")
     token = os.getenv("ZENDESK_API_TOKEN")
     if not (base and email and token):
         return None
+    return base, (f"{email}/token", token)
+
+
+async def _throttle(base: str, auth: Tuple[str, str]) -> None:
+    await ratelimit.acquire("zendesk", f"{base} {auth[0]}")
+
 
-    auth = (f"{email}/token", token)
+def _check(resp) -> None:
+    if resp.status_code == 429:
+        raise RateLimited(float(resp.headers.get("Retry-After") or 60))
+    resp.raise_for_status()
+
+
+async def create_ticket(ticket: Dict[str, Any]) -> Optional[str]:
+    if _sandbox_enabled():
+        return f"zd_stub_{ticket.get('subject','ticket')}"
+
+    api = _api()
+    if not api:
+        return None
+    base, auth = api
     try:
-        async with httpx.AsyncClient(auth=auth) as client:
-            resp = await client.post(f"{base}/tickets.json", json={"ticket": ticket})
+        await _throttle(base, auth)
+        async with http.client("zendesk") as client:
+            resp = await client.post(f"{base}/tickets.json", json={"ticket": ticket}, auth=auth)
             resp.raise_for_status()
             data = resp.json()
             return str(data.get("ticket", {}).get("id"))
@@ -36,22 +62,86 @@ async def create_ticket(ticket: Dict[str, Any]) -> Optional[str]:
         return None
 
 
+async def create_many(tickets: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Queue up to 100 tickets; returns the job status to poll.
+
+    Raises ``RateLimited`` on 429 and lets other HTTP errors propagate so the
+    caller can retry; returns None when Zendesk is not configured.
+    """
+    if _sandbox_enabled():
+        subjects = [t.get("subject", "ticket") for t in tickets]
+        return {
+            "id": "zd_stub_job",
+            "status": "completed",
+            "results": [
+                {"index": i, "id": f"zd_stub_{subject}", "success": True}
+                for i, subject in enumerate(subjects)
+            ],
+        }
+
+    api = _api()
+    if not api:
+        return None
+    base, auth = api
+    await _throttle(base, auth)
+    async with http.client("zendesk") as client:
+        resp = await client.post(
+            f"{base}/tickets/create_many.json", json={"tickets": tickets}, auth=auth
+        )
+        _check(resp)
+        return resp.json().get("job_status")
+
+
+async def job_statuses(job_ids: List[str]) -> List[Dict[str, Any]]:
+    if _sandbox_enabled() or not job_ids:
+        return []
+
+    api = _api()
+    if not api:
+        return []
+    base, auth = api
+    await _throttle(base, auth)
+    async with http.client("zendesk") as client:
+        resp = await client.get(
+            f"{base}/job_statuses/show_many.json", params={"ids": ",".join(job_ids)}, auth=auth
+        )
+        _check(resp)
+        return resp.json().get("job_statuses", [])
+
+
+async def find_by_external_id(external_id: str) -> Optional[str]:
+    if _sandbox_enabled():
+        return None
+
+    api = _api()
+    if not api:
+        return None
+    base, auth = api
+    await _throttle(base, auth)
+    async with http.client("zendesk") as client:
+        resp = await client.get(
+            f"{base}/tickets.json", params={"external_id": external_id}, auth=auth
+        )
+        _check(resp)
+        tickets = resp.json().get("tickets", [])
+        return str(tickets[0]["id"]) if tickets else None
+
+
 async def add_public_comment(ticket_id: str, body: str) -> bool:
     if _sandbox_enabled():
         return True
 
-    base = _base_url()
-    email = os.getenv("ZENDESK_EMAIL")
-    token = os.getenv("ZENDESK_API_TOKEN")
-    if not (base and email and token):
+    api = _api()
+    if not api:
         return False
-
-    auth = (f"{email}/token", token)
+    base, auth = api
     try:
-        async with httpx.AsyncClient(auth=auth) as client:
+        await _throttle(base, auth)
+        async with http.client("zendesk") as client:
             resp = await client.put(
                 f"{base}/tickets/{ticket_id}.json",
                 json={"ticket": {"comment": {"body": body, "public": True}}},
+                auth=auth,
             )
             resp.raise_for_status()
             return True
@@ -8,6 +8,38 @@ from sqlalchemy.ext.asyncio import AsyncSession
 import json
 
 
+# pipeline_state columns that hold JSON and need an explicit jsonb cast.
+_STATE_JSON_COLUMNS = {
+    "fanout",
+    "docqa",
+    "selected_fields",
+    "classify_scores",
+    "normalized",
+    "vqa",
+    "enrichment",
+    "ticket",
+}
+_STATE_COLUMNS = _STATE_JSON_COLUMNS | {
+    "asr_attachment_id",
+    "asr_text",
+    "asr_confidence",
+    "selected_attachment_id",
+    "classify_label",
+    "summary",
+    "ticket_id",
+}
+_STATE_MAP_COLUMNS = {"docqa", "vqa"}
+
+
+def _load_payload(payload: Any) -> Optional[Dict[str, Any]]:
+    if isinstance(payload, str):
+        try:
+            return json.loads(payload)
+        except json.JSONDecodeError:
+            return None
+    return payload
+
+
 class MessageRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
@@ -21,13 +53,19 @@ class MessageRepository:
         from_addr: str,
         ts: datetime,
         body_text: str,
+        source_meta: Optional[Dict[str, Any]] = None,
     ) -> str:
         result = await self.session.execute(
             text(
                 """
-                insert into messages(source, external_id, subject, from_addr, ts, body_text)
-                values (:source, :external_id, :subject, :from_addr, :ts, :body_text)
-                on conflict (source, external_id)
+                insert into messages(
+                    source, external_id, subject, from_addr, ts, body_text, source_meta
+                )
+                values (
+                    :source, :external_id, :subject, :from_addr, :ts, :body_text,
+                    cast(:source_meta as jsonb)
+                )
+                on conflict (source, external_id) where external_id is not null
                 do update set subject = excluded.subject
                 returning id
                 """
@@ -39,10 +77,102 @@ class MessageRepository:
                 "from_addr": from_addr,
                 "ts": ts,
                 "body_text": body_text,
+                "source_meta": json.dumps(source_meta) if source_meta is not None else None,
             },
         )
         return str(result.scalar_one())
 
+    async def known_gmail_ids(self, gmail_ids: List[str]) -> set[str]:
+        if not gmail_ids:
+            return set()
+        result = await self.session.execute(
+            text(
+                """
+                select source_meta->>'gmail_id'
+                from messages
+                where source = 'gmail' and source_meta->>'gmail_id' = any(:ids)
+                """
+            ),
+            {"ids": list(gmail_ids)},
+        )
+        return {row[0] for row in result.fetchall()}
+
+    async def ensure_mailbox(self, address: str, poll_interval_s: int = 60) -> None:
+        await self.session.execute(
+            text(
+                """
+                insert into mailboxes(address, poll_interval_s)
+                values (:address, :interval)
+                on conflict (address) do nothing
+                """
+            ),
+            {"address": address, "interval": poll_interval_s},
+        )
+
+    async def get_mailbox(self, address: str) -> Optional[Dict[str, Any]]:
+        result = await self.session.execute(
+            text("select * from mailboxes where address = :address"),
+            {"address": address},
+        )
+        row = result.mappings().first()
+        return dict(row) if row else None
+
+    async def claim_due_mailboxes(self, limit: int = 100) -> List[str]:
+        # Pushing next_poll_at forward in the same statement means a second
+        # scheduler tick (e.g. two beat instances) sees nothing to dispatch.
+        result = await self.session.execute(
+            text(
+                """
+                update mailboxes m
+                set next_poll_at = now() + make_interval(secs => m.poll_interval_s)
+                where m.address in (
+                    select address from mailboxes
+                    where enabled and next_poll_at <= now()
+                    order by next_poll_at
+                    limit :limit
+                    for update skip locked
+                )
+                returning m.address
+                """
+            ),
+            {"limit": limit},
+        )
+        return [row[0] for row in result.fetchall()]
+
+    async def mark_mailbox_polled(self, address: str) -> None:
+        await self.session.execute(
+            text(
+                """
+                update mailboxes
+                set last_polled_at = now(),
+                    next_poll_at = now() + make_interval(secs => poll_interval_s)
+                where address = :address
+                """
+            ),
+            {"address": address},
+        )
+
+    async def get_mailbox_history_id(self, address: str) -> Optional[str]:
+        result = await self.session.execute(
+            text("select history_id from mailboxes where address = :address"),
+            {"address": address},
+        )
+        row = result.first()
+        return row[0] if row else None
+
+    async def set_mailbox_history_id(self, address: str, history_id: str) -> None:
+        await self.session.execute(
+            text(
+                """
+                insert into mailboxes(address, history_id, updated_at)
+                values (:address, :history_id, now())
+                on conflict (address)
+                do update set history_id = excluded.history_id, updated_at = now()
+                """
+            ),
+            {"address": address, "history_id": history_id},
+        )
+
     async def insert_event(
         self,
         *,
@@ -54,12 +184,13 @@ class MessageRepository:
         await self.session.execute(
             text(
                 """
-                insert into events(ticket_id, type, payload, ts)
-                values (:ticket_id, :type, :payload, now())
+                insert into events(ticket_id, message_id, type, payload, ts)
+                values (:ticket_id, :message_id, :type, :payload, now())
                 """
             ),
             {
                 "ticket_id": ticket_id,
+                "message_id": message_id,
                 "type": type_,
                 "payload": json.dumps(payload, default=str),
             },
@@ -71,8 +202,8 @@ class MessageRepository:
                 """
                 select payload
                 from events
-                where type = :type
-                  and payload->>'message_id' = :message_id
+                where message_id = :message_id
+                  and type = :type
                 order by ts desc
                 limit 1
                 """
@@ -82,33 +213,457 @@ class MessageRepository:
         row = result.first()
         if not row:
             return None
-        payload = row[0]
-        if isinstance(payload, str):
-            try:
-                return json.loads(payload)
-            except json.JSONDecodeError:
-                return None
-        return payload
+        return _load_payload(row[0])
+
+    async def get_events(self, *, message_id: str, type_: str) -> List[Dict[str, Any]]:
+        result = await self.session.execute(
+            text(
+                """
+                select payload
+                from events
+                where message_id = :message_id
+                  and type = :type
+                order by ts desc
+                """
+            ),
+            {"message_id": message_id, "type": type_},
+        )
+        payloads = (_load_payload(row[0]) for row in result.all())
+        return [p for p in payloads if p]
+
+    async def get_pipeline_state(self, message_id: str) -> Dict[str, Any]:
+        result = await self.session.execute(
+            text("select * from pipeline_state where message_id = :message_id"),
+            {"message_id": message_id},
+        )
+        row = result.mappings().first()
+        return dict(row) if row else {}
+
+    async def update_pipeline_state(self, *, message_id: str, **values: Any) -> None:
+        unknown = set(values) - _STATE_COLUMNS
+        if unknown:
+            raise ValueError(f"unknown pipeline_state columns: {sorted(unknown)}")
+        columns = list(values)
+        params: Dict[str, Any] = {"message_id": message_id}
+        placeholders = []
+        for col in columns:
+            if col in _STATE_JSON_COLUMNS:
+                params[col] = json.dumps(values[col], default=str)
+                placeholders.append(f"cast(:{col} as jsonb)")
+            else:
+                params[col] = values[col]
+                placeholders.append(f":{col}")
+        assignments = "".join(f"{col} = excluded.{col}, " for col in columns)
+        await self.session.execute(
+            text(
+                f"""
+                insert into pipeline_state(message_id, {", ".join(columns)}, updated_at)
+                values (:message_id, {", ".join(placeholders)}, now())
+                on conflict (message_id)
+                do update set {assignments}updated_at = now()
+                """
+            ),
+            params,
+        )
+
+    async def merge_pipeline_state(
+        self, *, message_id: str, column: str, key: str, value: Any
+    ) -> None:
+        # Per-attachment results are merged key by key so concurrent stage
+        # tasks for the same message never overwrite each other.
+        if column not in _STATE_MAP_COLUMNS:
+            raise ValueError(f"pipeline_state.{column} is not a per-attachment map")
+        await self.session.execute(
+            text(
+                f"""
+                insert into pipeline_state(message_id, {column}, updated_at)
+                values (:message_id, jsonb_build_object(:key, cast(:value as jsonb)), now())
+                on conflict (message_id)
+                do update set {column} = coalesce(pipeline_state.{column}, '{{}}'::jsonb)
+                                          || excluded.{column},
+                              updated_at = now()
+                """
+            ),
+            {"message_id": message_id, "key": key, "value": json.dumps(value, default=str)},
+        )
+
+    async def get_ml_result(
+        self, *, content_hash: str, stage: str, model_version: str
+    ) -> Optional[Dict[str, Any]]:
+        result = await self.session.execute(
+            text(
+                """
+                select result
+                from ml_results
+                where hash_sha256 = :hash and stage = :stage and model_version = :version
+                """
+            ),
+            {"hash": content_hash, "stage": stage, "version": model_version},
+        )
+        row = result.first()
+        return _load_payload(row[0]) if row else None
+
+    async def put_ml_result(
+        self, *, content_hash: str, stage: str, model_version: str, result: Dict[str, Any]
+    ) -> None:
+        await self.session.execute(
+            text(
+                """
+                insert into ml_results(hash_sha256, stage, model_version, result)
+                values (:hash, :stage, :version, cast(:result as jsonb))
+                on conflict (hash_sha256, stage, model_version) do nothing
+                """
+            ),
+            {
+                "hash": content_hash,
+                "stage": stage,
+                "version": model_version,
+                "result": json.dumps(result, default=str),
+            },
+        )
 
     async def insert_attachments(self, message_id: str, atts: List[Dict[str, Any]]) -> List[str]:
-        rows = [
+        # One multi-row insert per message. Rows are matched back to their
+        # input by content hash (or s3_key when there is none), so identical
+        # attachments in one message share a row instead of tripping
+        # "ON CONFLICT DO UPDATE cannot affect row a second time".
+        def ident(a: Dict[str, Any]) -> str:
+            return a.get("hash_sha256") or a["s3_key"]
+
+        unique: Dict[str, Dict[str, Any]] = {}
+        for a in atts:
+            unique.setdefault(ident(a), a)
+        if not unique:
+            return []
+
+        columns = ("s3_key", "mime", "filename", "size_bytes", "hash_sha256")
+        values = []
+        params: Dict[str, Any] = {"message_id": message_id}
+        for i, a in enumerate(unique.values()):
+            placeholders = ", ".join(f":{column}_{i}" for column in columns)
+            values.append(f"(:message_id, {placeholders})")
+            params.update(
+                {
+                    f"s3_key_{i}": a["s3_key"],
+                    f"mime_{i}": a["mime"],
+                    f"filename_{i}": a["filename"],
+                    f"size_bytes_{i}": a["size_bytes"],
+                    f"hash_sha256_{i}": a.get("hash_sha256"),
+                }
+            )
+        result = await self.session.execute(
+            text(
+                f"""
+                insert into attachments(message_id, s3_key, mime, filename, size_bytes, hash_sha256)
+                values {", ".join(values)}
+                on conflict (message_id, hash_sha256) do update set filename = excluded.filename
+                returning id, s3_key, hash_sha256
+                """
+            ),
+            params,
+        )
+        ids = {row.hash_sha256 or row.s3_key: str(row.id) for row in result.fetchall()}
+        return [ids[ident(a)] for a in atts]
+
+    async def get_sync_cursor(self, name: str) -> Optional[str]:
+        result = await self.session.execute(
+            text("select cursor from sync_cursors where name = :name"),
+            {"name": name},
+        )
+        row = result.first()
+        return row[0] if row else None
+
+    async def set_sync_cursor(self, name: str, cursor: str) -> None:
+        await self.session.execute(
+            text(
+                """
+                insert into sync_cursors(name, cursor, updated_at)
+                values (:name, :cursor, now())
+                on conflict (name) do update set cursor = excluded.cursor, updated_at = now()
+                """
+            ),
+            {"name": name, "cursor": cursor},
+        )
+
+    async def upsert_stripe_charges(self, charges: List[Dict[str, Any]]) -> None:
+        if not charges:
+            return
+        await self.session.execute(
+            text(
+                """
+                insert into stripe_charges(
+                    id, created, amount_cents, currency, status, email, order_id,
+                    receipt_url, card_brand, risk_score, raw, synced_at
+                )
+                values (
+                    :id, :created, :amount_cents, :currency, :status, :email, :order_id,
+                    :receipt_url, :card_brand, :risk_score, cast(:raw as jsonb), now()
+                )
+                on conflict (id) do update set
+                    status = excluded.status,
+                    email = excluded.email,
+                    order_id = excluded.order_id,
+                    receipt_url = excluded.receipt_url,
+                    risk_score = excluded.risk_score,
+                    raw = excluded.raw,
+                    synced_at = now()
+                """
+            ),
+            [{**c, "raw": json.dumps(c.get("raw"), default=str)} for c in charges],
+        )
+
+    async def find_stripe_charge(
+        self,
+        *,
+        order_id: Optional[str] = None,
+        email: Optional[str] = None,
+        amount_cents: Optional[int] = None,
+    ) -> Optional[Dict[str, Any]]:
+        filters = []
+        params: Dict[str, Any] = {}
+        if order_id:
+            filters.append("order_id = :order_id")
+            params["order_id"] = order_id
+        if email:
+            filters.append("email = :email")
+            params["email"] = email
+        if amount_cents:
+            filters.append("amount_cents = :amount_cents")
+            params["amount_cents"] = amount_cents
+        if not filters:
+            return None
+        result = await self.session.execute(
+            text(
+                f"""
+                select id, amount_cents, currency, status, receipt_url, card_brand, risk_score
+                from stripe_charges
+                where {" and ".join(filters)}
+                order by created desc
+                limit 1
+                """
+            ),
+            params,
+        )
+        row = result.mappings().first()
+        return dict(row) if row else None
+
+    async def upsert_shopify_orders(self, orders: List[Dict[str, Any]]) -> None:
+        if not orders:
+            return
+        await self.session.execute(
+            text(
+                """
+                insert into shopify_orders(
+                    id, name, order_number, email, total_price, currency, financial_status,
+                    fulfillment_status, skus, line_items, tracking_urls, created_at,
+                    updated_at, synced_at
+                )
+                values (
+                    :id, :name, :order_number, :email, :total_price, :currency, :financial_status,
+                    :fulfillment_status, :skus, cast(:line_items as jsonb), :tracking_urls,
+                    :created_at, :updated_at, now()
+                )
+                on conflict (id) do update set
+                    email = excluded.email,
+                    total_price = excluded.total_price,
+                    financial_status = excluded.financial_status,
+                    fulfillment_status = excluded.fulfillment_status,
+                    skus = excluded.skus,
+                    line_items = excluded.line_items,
+                    tracking_urls = excluded.tracking_urls,
+                    updated_at = excluded.updated_at,
+                    synced_at = now()
+                where shopify_orders.updated_at <= excluded.updated_at
+                """
+            ),
+            [{**o, "line_items": json.dumps(o.get("line_items"), default=str)} for o in orders],
+        )
+
+    async def find_shopify_order(
+        self,
+        *,
+        order_id: Optional[str] = None,
+        email: Optional[str] = None,
+        sku: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        filters = []
+        params: Dict[str, Any] = {}
+        if order_id:
+            filters.append("name = :order_id")
+            params["order_id"] = order_id
+        if email:
+            filters.append("email = :email")
+            params["email"] = email
+        if sku:
+            filters.append("skus @> array[cast(:sku as text)]")
+            params["sku"] = sku
+        if not filters:
+            return None
+        result = await self.session.execute(
+            text(
+                f"""
+                select id, name, order_number, email, total_price, currency, financial_status,
+                       fulfillment_status, line_items, tracking_urls
+                from shopify_orders
+                where {" and ".join(filters)}
+                order by created_at desc nulls last
+                limit 1
+                """
+            ),
+            params,
+        )
+        row = result.mappings().first()
+        if not row:
+            return None
+        order = dict(row)
+        order["line_items"] = _load_payload(order["line_items"]) or []
+        return order
+
+    async def enqueue_zendesk_ticket(self, *, ticket_id: str, payload: Dict[str, Any]) -> None:
+        await self.session.execute(
+            text(
+                """
+                insert into zendesk_outbox(ticket_id, payload)
+                values (:ticket_id, cast(:payload as jsonb))
+                on conflict (ticket_id) do nothing
+                """
+            ),
+            {"ticket_id": ticket_id, "payload": json.dumps(payload, default=str)},
+        )
+
+    async def claim_zendesk_outbox(self, limit: int, stale_after_s: int) -> List[Dict[str, Any]]:
+        # In-flight rows without a job id were claimed by a dispatcher that
+        # died before Zendesk acknowledged the batch; they are taken over
+        # once stale.
+        result = await self.session.execute(
+            text(
+                """
+                update zendesk_outbox o
+                set status = 'in_flight', attempts = o.attempts + 1, updated_at = now()
+                from (
+                    select id from zendesk_outbox
+                    where (status = 'pending' and next_attempt_at <= now())
+                       or (status = 'in_flight' and job_id is null
+                           and updated_at < now() - make_interval(secs => :stale_after_s))
+                    order by next_attempt_at
+                    limit :limit
+                    for update skip locked
+                ) due
+                where o.id = due.id
+                returning o.id, o.ticket_id, o.payload, o.attempts
+                """
+            ),
+            {"limit": limit, "stale_after_s": stale_after_s},
+        )
+        return [
             {
-                "message_id": message_id,
-                "s3_key": a["s3_key"],
-                "mime": a["mime"],
-                "filename": a["filename"],
-                "size_bytes": a["size_bytes"],
+                "id": row.id,
+                "ticket_id": str(row.ticket_id),
+                "payload": _load_payload(row.payload),
+                "attempts": row.attempts,
             }
-            for a in atts
+            for row in result.fetchall()
         ]
+
+    async def set_zendesk_outbox_job(self, ids: List[int], job_id: str) -> None:
+        await self.session.execute(
+            text(
+                """
+                update zendesk_outbox set job_id = :job_id, updated_at = now()
+                where id = any(:ids) and status = 'in_flight'
+                """
+            ),
+            {"ids": ids, "job_id": job_id},
+        )
+
+    async def zendesk_outbox_jobs(self) -> Dict[str, List[int]]:
         result = await self.session.execute(
             text(
                 """
-                insert into attachments(message_id, s3_key, mime, filename, size_bytes)
-                values (:message_id, :s3_key, :mime, :filename, :size_bytes)
-                returning id
+                select job_id, array_agg(id order by id) as ids from zendesk_outbox
+                where status = 'in_flight' and job_id is not null
+                group by job_id
+                """
+            )
+        )
+        return {row.job_id: list(row.ids) for row in result.fetchall()}
+
+    async def complete_zendesk_outbox(self, done: List[Dict[str, Any]]) -> None:
+        if not done:
+            return
+        await self.session.execute(
+            text(
+                """
+                with row as (
+                    update zendesk_outbox
+                    set status = 'done', external_id = :external_id, last_error = null,
+                        updated_at = now()
+                    where id = :id and status = 'in_flight'
+                    returning ticket_id
+                )
+                update tickets set external_id = :external_id, updated_at = now()
+                where id = (select ticket_id from row)
                 """
             ),
-            rows,
+            [{"id": d["id"], "external_id": d["external_id"]} for d in done],
+        )
+
+    async def retry_zendesk_outbox(
+        self,
+        ids: List[int],
+        *,
+        delay_s: float,
+        error: str,
+        max_attempts: int,
+        count_attempt: bool = True,
+    ) -> None:
+        if not ids:
+            return
+        await self.session.execute(
+            text(
+                """
+                update zendesk_outbox
+                set status = case when attempts - :refund >= :max_attempts
+                                  then 'failed' else 'pending' end,
+                    attempts = attempts - :refund,
+                    next_attempt_at = now() + make_interval(secs => :delay_s),
+                    job_id = null,
+                    last_error = :error,
+                    updated_at = now()
+                where id = any(:ids) and status = 'in_flight'
+                """
+            ),
+            {
+                "ids": ids,
+                "delay_s": delay_s,
+                "error": error,
+                "max_attempts": max_attempts,
+                "refund": 0 if count_attempt else 1,
+            },
+        )
+
+    async def fail_zendesk_outbox(self, failed: List[Dict[str, Any]]) -> None:
+        if not failed:
+            return
+        await self.session.execute(
+            text(
+                """
+                update zendesk_outbox
+                set status = 'failed', last_error = :error, updated_at = now()
+                where id = :id and status = 'in_flight'
+                """
+            ),
+            [{"id": f["id"], "error": f["error"]} for f in failed],
+        )
+
+    async def zendesk_outbox_depth(self) -> Dict[str, int]:
+        result = await self.session.execute(
+            text(
+                """
+                select status, count(*) as n from zendesk_outbox
+                where status <> 'done'
+                group by status
+                """
+            )
         )
-        return [str(row[0]) for row in result.fetchall()]
+        return {row.status: row.n for row in result.fetchall()}
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from api.app.config import settings
+from common.clients import shopify, stripe
+from common.clients.guard import guarded
+from common.storage.s3 import AttachmentStorage
+
+
+def parse_amount(amount: Any) -> Optional[float]:
+    if amount is None:
+        return None
+    try:
+        return float(str(amount).replace("$", "").replace(",", ""))
+    except Exception:
+        return None
+
+
+async def presign_all(keys: List[str], ttl_seconds: int = 600) -> List[str]:
+    storage = AttachmentStorage()
+    urls = await asyncio.gather(
+        *(storage.presign(k, ttl_seconds=ttl_seconds) for k in keys), return_exceptions=True
+    )
+    return [u for u in urls if isinstance(u, str)]
+
+
+async def enrich(
+    *,
+    order_id: Optional[str],
+    email: Optional[str],
+    amount: Any,
+    sku: Optional[str],
+    s3_keys: List[str],
+) -> Dict[str, Any]:
+    """Run the Shopify, Stripe and presign lookups concurrently.
+
+    Each dependency gets its own timeout, clipped to the overall
+    ``enrich_deadline_s`` so the stage never takes longer than the budget.
+    Whatever finished in time is returned; ``source`` records, per
+    dependency, ``hit``, ``miss``, ``timeout``, ``error``, ``throttled``
+    (rate limit), ``open`` (circuit breaker) or ``skipped``.
+    """
+    budget = settings.enrich_deadline_s
+    # A rate-limit token that is not due within the lookup's own timeout is
+    # not worth waiting for: the lookup reports "throttled" straight away.
+    shopify_timeout = min(settings.enrich_shopify_timeout_s, budget)
+    calls: Dict[str, Tuple[Callable[[], Awaitable[Any]], float]] = {}
+    if order_id:
+        calls["shopify"] = (
+            lambda: shopify.get_order(order_id, max_wait_s=shopify_timeout),
+            shopify_timeout,
+        )
+    elif email or sku:
+        calls["shopify"] = (
+            lambda: shopify.find_order(email=email, sku=sku, max_wait_s=shopify_timeout),
+            shopify_timeout,
+        )
+    calls["stripe"] = (
+        lambda: stripe.find_charge(order_id=order_id, email=email, amount=parse_amount(amount)),
+        settings.enrich_stripe_timeout_s,
+    )
+    if s3_keys:
+        calls["s3"] = (lambda: presign_all(s3_keys), settings.enrich_s3_timeout_s)
+
+    start = time.perf_counter()
+    outcomes = await asyncio.gather(
+        *(guarded(name, call, min(timeout, budget)) for name, (call, timeout) in calls.items())
+    )
+    results = dict(zip(calls, outcomes))
+
+    source: Dict[str, str] = {}
+    errors: Dict[str, Optional[str]] = {}
+    values: Dict[str, Any] = {}
+    for name in ("shopify", "stripe", "s3"):
+        if name not in results:
+            source[name], errors[name], values[name] = "skipped", None, None
+            continue
+        outcome, value, error = results[name]
+        if outcome == "ok":
+            outcome = "hit" if value else "miss"
+        source[name], errors[name], values[name] = outcome, error, value
+
+    return {
+        "order_id": order_id,
+        "shopify": values["shopify"],
+        "stripe": values["stripe"],
+        "attachment_urls": values["s3"] or [],
+        "source": source,
+        "errors": errors,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
@@ -39,6 +39,16 @@ def extract_best_text(msg: EmailMessage) -> str:
         return ""
 
 
+def parse_headers(raw_bytes: bytes) -> Dict[str, str]:
+    msg = BytesParser(policy=policy.default).parsebytes(raw_bytes, headersonly=True)
+    return {
+        "message_id": str(msg.get("Message-Id", "") or "").strip(),
+        "subject": str(msg.get("Subject", "") or ""),
+        "from": str(msg.get("From", "") or ""),
+        "date": str(msg.get("Date", "") or ""),
+    }
+
+
 def parse_email(raw_bytes: bytes) -> Tuple[str, List[Dict[str, Any]]]:
     msg: EmailMessage = BytesParser(policy=policy.default).parsebytes(raw_bytes)
     body_text = extract_best_text(msg)
@@ -1,3 +1,4 @@
+import asyncio
 import json
 from typing import List, Dict, Any
 
@@ -5,12 +6,15 @@ from fastapi import UploadFile, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 
+from api.app.config import settings
+from common.db.dao import MessageRepository
 from common.storage.s3 import AttachmentStorage
 
 
 class IngestUploadService:
-    def __init__(self, storage: AttachmentStorage) -> None:
+    def __init__(self, storage: AttachmentStorage, upload_concurrency: int | None = None) -> None:
         self.storage = storage
+        self.upload_concurrency = upload_concurrency or settings.ingest_upload_concurrency
 
     async def __call__(
         self, *, body: str | None, files: List[UploadFile], session: AsyncSession
@@ -30,58 +34,48 @@ class IngestUploadService:
         )
         message_id = result.scalar_one()
 
-        attachments_out = []
-
-        for file in files:
-            file_bytes = await file.read()
-            size_bytes = len(file_bytes)
-
-            s3_key = await self.storage.put(
-                data=file_bytes,
-                mime=file.content_type,
-                filename=file.filename or "upload.bin",
-            )
-
-            result = await session.execute(
-                text(
-                    """
-                     INSERT INTO attachments(
-                     message_id, s3_key, mime, filename, size_bytes
-                     )
-                     VALUES (
-                     :message_id, :s3_key, :mime, :filename, :size_bytes
-                     )
-                     RETURNING ID
-                """
-                ),
-                {
-                    "message_id": message_id,
-                    "s3_key": s3_key,
-                    "mime": file.content_type,
-                    "filename": file.filename,
-                    "size_bytes": size_bytes,
-                },
-            )
-            attachment_id = result.scalar_one()
+        limit = asyncio.Semaphore(self.upload_concurrency)
+
+        async def upload(file: UploadFile) -> Dict[str, Any]:
+            async with limit:
+                stored = await self.storage.put_stream(
+                    file.read,
+                    mime=file.content_type,
+                    filename=file.filename or "upload.bin",
+                )
+            return {
+                "filename": file.filename,
+                "mime": file.content_type,
+                "size_bytes": stored["size"],
+                "s3_key": stored["key"],
+                "hash_sha256": stored["sha256"],
+            }
+
+        uploaded = await asyncio.gather(*(upload(f) for f in files))
+        attachment_ids = await MessageRepository(session).insert_attachments(
+            str(message_id), uploaded
+        )
 
-            attachments_out.append(
-                {
-                    "id": str(attachment_id),
-                    "filename": file.filename,
-                    "mime": file.content_type,
-                    "size_bytes": size_bytes,
-                    "s3_key": s3_key,
-                }
-            )
+        attachments_out = [
+            {
+                "id": attachment_id,
+                "filename": u["filename"],
+                "mime": u["mime"],
+                "size_bytes": u["size_bytes"],
+                "s3_key": u["s3_key"],
+            }
+            for attachment_id, u in zip(attachment_ids, uploaded)
+        ]
 
         await session.execute(
             text(
                 """
-                INSERT INTO events (ticket_id, type, payload)
-                VALUES (NULL, 'INGESTED', :payload ::jsonb)
+                INSERT INTO events (ticket_id, message_id, type, payload)
+                VALUES (NULL, :message_id, 'INGESTED', :payload ::jsonb)
             """
             ),
             {
+                "message_id": message_id,
                 "payload": json.dumps({"message_id": str(message_id)}),
             },
         )
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from typing import Any, Sequence
+
+try:
+    from prometheus_client import Counter, Gauge, Histogram
+except Exception:
+    Counter = Gauge = Histogram = None
+
+
+class _NoopMetric:
+    def labels(self, *args: Any, **kwargs: Any) -> "_NoopMetric":
+        return self
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def dec(self, amount: float = 1) -> None:
+        pass
+
+    def set(self, value: float) -> None:
+        pass
+
+    def observe(self, value: float) -> None:
+        pass
+
+
+_registry: dict[str, Any] = {}
+
+
+def _get_or_create(factory: Any, name: str, doc: str, labels: Sequence[str], **kwargs: Any) -> Any:
+    # Metrics are module-level singletons; re-importing a module (tests,
+    # reloads) must not try to register the same name twice.
+    if name in _registry:
+        return _registry[name]
+    metric: Any = _NoopMetric()
+    if factory is not None:
+        try:
+            metric = factory(name, doc, list(labels), **kwargs)
+        except Exception:
+            metric = _NoopMetric()
+    _registry[name] = metric
+    return metric
+
+
+def counter(name: str, doc: str, labels: Sequence[str] = ()) -> Any:
+    return _get_or_create(Counter, name, doc, labels)
+
+
+def gauge(name: str, doc: str, labels: Sequence[str] = ()) -> Any:
+    return _get_or_create(Gauge, name, doc, labels)
+
+
+def histogram(
+    name: str, doc: str, labels: Sequence[str] = (), buckets: Sequence[float] | None = None
+) -> Any:
+    kwargs = {"buckets": buckets} if buckets else {}
+    return _get_or_create(Histogram, name, doc, labels, **kwargs)
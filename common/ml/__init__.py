@@ -4,3 +4,9 @@ import os
 def use_stub() -> bool:
     # Default to real models; set ML_MODE=stub to force stubs
     return os.getenv("ML_MODE", "real").lower() == "stub"
+
+
+def model_version(version: str) -> str:
+    # Results are cached by model version; stub output must never be served
+    # as if a real model had produced it.
+    return "stub" if use_stub() else version
@@ -1,11 +1,13 @@
-from transformers import pipeline
-
-from . import use_stub
+from . import backends, remote, use_stub
 from .types import Transcript
 
 import anyio
 
 import io, soundfile as sf
+from pathlib import Path
+
+MODEL_ID = "openai/whisper-tiny"
+MODEL_VERSION = backends.versioned(f"{MODEL_ID}@1", "asr")
 
 _asr_pipeline = None
 
@@ -13,9 +15,10 @@ _asr_pipeline = None
 def _get_asr():
     global _asr_pipeline
     if _asr_pipeline is None:
-        _asr_pipeline = pipeline(
+        _asr_pipeline = backends.build_pipeline(
+            "asr",
             "automatic-speech-recognition",
-            model="openai/whisper-tiny",
+            MODEL_ID,
             device="cpu",
             chunk_length_s=30,
             generate_kwargs={"task": "transcribe", "language": "en"},
@@ -23,20 +26,23 @@ def _get_asr():
     return _asr_pipeline
 
 
-def transcribe_sync(audio_bytes: bytes, mime: str) -> Transcript:
+def transcribe_sync(audio_bytes: bytes | Path, mime: str) -> Transcript:
     if use_stub():
         return Transcript(
             text="I need a refund for my order, please help.",
             confidence=0.97,
         )
 
-    data, sr = sf.read(io.BytesIO(audio_bytes))
+    source = audio_bytes if isinstance(audio_bytes, Path) else io.BytesIO(audio_bytes)
+    data, sr = sf.read(source)
     asr = _get_asr()
     result = asr({"array": data, "sampling_rate": sr})
     return Transcript(text=result["text"], confidence=float(result.get("score", 1.0)))
 
 
-async def transcribe(audio_bytes: bytes, mime: str) -> Transcript:
+async def transcribe(audio_bytes: bytes | Path, mime: str) -> Transcript:
+    if remote.enabled():
+        return Transcript(**await remote.post_bytes("/v1/transcribe", audio_bytes, mime=mime))
     return await anyio.to_thread.run_sync(
         transcribe_sync,
         audio_bytes,
@@ -0,0 +1,155 @@
+import logging
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Tuple
+
+LOG = logging.getLogger(__name__)
+
+# torch       eager PyTorch, fp32 (the default)
+# torch-int8  eager PyTorch with every nn.Linear dynamically quantized to int8
+# onnx        exported to ONNX, run with ONNX Runtime, fp32
+# onnx-int8   as onnx, weights dynamically quantized to int8
+#
+# ML_BACKEND sets it for every model, ML_BACKEND_<NAME> (ML_BACKEND_ZEROSHOT,
+# ML_BACKEND_DOCQA, ...) for one. The onnx backends need optimum[onnxruntime].
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+# pipeline task -> (optimum ORTModel class, preprocessors the pipeline needs)
+_ORT_TASKS: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "zero-shot-classification": ("ORTModelForSequenceClassification", ("tokenizer",)),
+    "summarization": ("ORTModelForSeq2SeqLM", ("tokenizer",)),
+    "automatic-speech-recognition": (
+        "ORTModelForSpeechSeq2Seq",
+        ("tokenizer", "feature_extractor"),
+    ),
+    "image-classification": ("ORTModelForImageClassification", ("image_processor",)),
+}
+
+_PREPROCESSORS = {
+    "tokenizer": "AutoTokenizer",
+    "feature_extractor": "AutoFeatureExtractor",
+    "image_processor": "AutoImageProcessor",
+}
+
+
+def backend(name: str) -> str:
+    value = os.getenv(f"ML_BACKEND_{name.upper()}") or os.getenv("ML_BACKEND") or "torch"
+    value = value.strip().lower()
+    if value not in BACKENDS:
+        raise ValueError(f"ML backend for {name}: {value!r}, expected one of {BACKENDS}")
+    return value
+
+
+def versioned(version: str, name: str) -> str:
+    # Quantized models do not give bit-identical answers, so cached results
+    # are kept apart per backend; torch keeps the plain version.
+    choice = backend(name)
+    return version if choice == "torch" else f"{version}+{choice}"
+
+
+def onnx_dir(model_id: str, quantized: bool) -> Path:
+    root = Path(os.getenv("ML_ONNX_DIR", "~/.cache/shopdesk/onnx")).expanduser()
+    return root / model_id.replace("/", "--") / ("int8" if quantized else "fp32")
+
+
+def quantize_linear(model: Any) -> Any:
+    import torch
+
+    return torch.ao.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+    )
+
+
+def _pipeline(task: str, **kwargs: Any) -> Any:
+    from transformers import pipeline
+
+    return pipeline(task, **kwargs)
+
+
+def _ort() -> Any:
+    try:
+        from optimum import onnxruntime
+    except ImportError as exc:
+        raise RuntimeError("the onnx backends need `pip install optimum[onnxruntime]`") from exc
+    return onnxruntime
+
+
+@contextmanager
+def _staged(target: Path) -> Iterator[Path]:
+    # Each process writes into its own directory next to ``target`` and
+    # renames it into place, so workers exporting the same model at once
+    # never write into each other's files.
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(prefix=f"{target.name}.", dir=target.parent))
+    try:
+        yield tmp
+        try:
+            tmp.rename(target)
+        except OSError:
+            # another process got there first; its copy is as good as ours
+            if not (target / "config.json").exists():
+                raise
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _export_onnx(task: str, model_id: str, quantized: bool) -> Path:
+    target = onnx_dir(model_id, quantized)
+    if (target / "config.json").exists():
+        return target
+
+    import transformers
+
+    ort = _ort()
+    model_cls, preprocessors = _ORT_TASKS[task]
+    fp32 = onnx_dir(model_id, quantized=False)
+    if not (fp32 / "config.json").exists():
+        LOG.info("exporting %s to ONNX in %s", model_id, fp32)
+        with _staged(fp32) as tmp:
+            getattr(ort, model_cls).from_pretrained(model_id, export=True).save_pretrained(tmp)
+            for kind in preprocessors:
+                preprocessor = getattr(transformers, _PREPROCESSORS[kind]).from_pretrained(model_id)
+                preprocessor.save_pretrained(tmp)
+    if not quantized:
+        return fp32
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    LOG.info("quantizing %s to int8 in %s", model_id, target)
+    with _staged(target) as tmp:
+        # same file names as the fp32 export, so both load the same way
+        shutil.copytree(
+            fp32,
+            tmp,
+            ignore=shutil.ignore_patterns("*.onnx", "*.onnx_data"),
+            dirs_exist_ok=True,
+        )
+        for path in sorted(fp32.glob("*.onnx")):
+            quantize_dynamic(path, tmp / path.name, weight_type=QuantType.QInt8)
+    return target
+
+
+def build_pipeline(name: str, task: str, model_id: str, **kwargs: Any) -> Any:
+    """A transformers pipeline for ``task`` on the backend chosen for ``name``.
+
+    Every backend returns a regular pipeline, so callers post-process the
+    outputs the same way whichever one runs underneath.
+    """
+    choice = backend(name)
+    if choice in ("torch", "torch-int8"):
+        pipe = _pipeline(task, model=model_id, **kwargs)
+        if choice == "torch-int8":
+            quantize_linear(pipe.model)
+        return pipe
+
+    if task not in _ORT_TASKS:
+        raise ValueError(f"{name}: no ONNX export for {task}, use torch or torch-int8")
+    model_cls, preprocessors = _ORT_TASKS[task]
+    path = _export_onnx(task, model_id, quantized=choice == "onnx-int8")
+    model = getattr(_ort(), model_cls).from_pretrained(path)
+    # ORT sessions place themselves; the pipeline must not try to move them
+    kwargs.pop("device", None)
+    return _pipeline(task, model=model, **{kind: str(path) for kind in preprocessors}, **kwargs)
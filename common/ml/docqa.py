@@ -1,94 +1,241 @@
+import hashlib
 import io
-from pdf2image import convert_from_bytes
+import os
+from datetime import date
+from pathlib import Path
+from pdf2image import convert_from_bytes, convert_from_path
 from PIL import Image
-from transformers import pipeline
+from cachetools import LRUCache
+from transformers.pipelines.document_question_answering import apply_tesseract
 
-from typing import Any
+from typing import Any, Optional
 
-from . import use_stub
-from .types import DocFields
+from . import backends, remote, use_stub
+from .pdftext import fields_from_text_layer, read_text_layer
+from .types import DocExtraction, DocFields
+from ..norm.amounts import normalize_amount, normalize_currency
+from ..norm.dates import parse_date_eu
+from ..norm.regexes import CURRENCY_SYMBOL_MAP, CURRENCY_WORD_MAP, extract_amount_currency
 
 import anyio
 
+QUESTIONS = {
+    "order_id": "What is the order number?",
+    "amount": "What is the total number?",
+    "currency": "What is the currency?",
+    "order_date": "What is the date of the order?",
+    "sku": "What is the SKU or item code?",
+}
+
+# PDFs with an embedded text layer skip rasterization entirely; otherwise only
+# the first DOCQA_MAX_PAGES pages are rendered, at DOCQA_PDF_DPI.
+_MAX_PAGES = int(os.getenv("DOCQA_MAX_PAGES", "1"))
+_PDF_DPI = int(os.getenv("DOCQA_PDF_DPI", "150"))
+_MIN_TEXT_CHARS = int(os.getenv("DOCQA_MIN_TEXT_CHARS", "20"))
+
+MODEL_ID = "impira/layoutlm-document-qa"
+# Bump when extraction logic changes (text-layer rules, page/DPI limits),
+# not only when the model does: cached results are keyed on this.
+MODEL_VERSION = backends.versioned(f"{MODEL_ID}@2", "docqa")
+
 _qa_pipeline = None
 
 
 def _get_pipeline():
     global _qa_pipeline
     if _qa_pipeline is None:
-        _qa_pipeline = pipeline(
+        _qa_pipeline = backends.build_pipeline(
+            "docqa",
             "document-question-answering",
-            model="impira/layoutlm-document-qa",
+            MODEL_ID,
         )
     return _qa_pipeline
 
 
-def _load_pages(doc_bytes, mime):
+def _load_pages(doc_bytes, mime, max_pages: int = _MAX_PAGES):
     if mime.startswith("application/pdf"):
-        return convert_from_bytes(doc_bytes)
-    img = Image.open(io.BytesIO(doc_bytes)).convert("RGB")
+        convert = convert_from_path if isinstance(doc_bytes, Path) else convert_from_bytes
+        return convert(doc_bytes, dpi=_PDF_DPI, first_page=1, last_page=max_pages)
+    source = doc_bytes if isinstance(doc_bytes, Path) else io.BytesIO(doc_bytes)
+    img = Image.open(source).convert("RGB")
     return [img]
 
 
-def extract_fields_sync(doc_bytes: bytes, mime: str) -> DocFields:
+class DocQAEngine:
+    # OCR runs once per page and its word boxes are cached by page content;
+    # every question is then answered from those boxes in one batched forward
+    # pass instead of one OCR + forward pass per question.
+    def __init__(self, qa: Any = None, cache_size: int = 32) -> None:
+        self._qa = qa
+        self._word_boxes: LRUCache = LRUCache(maxsize=cache_size)
+
+    @property
+    def qa(self) -> Any:
+        if self._qa is None:
+            self._qa = _get_pipeline()
+        return self._qa
+
+    def word_boxes(self, page: Image.Image) -> list[tuple[str, list[int]]]:
+        key = hashlib.sha1(page.tobytes()).hexdigest()
+        cached = self._word_boxes.get(key)
+        if cached is None:
+            words, boxes = apply_tesseract(page, lang=None, tesseract_config="")
+            cached = list(zip(words, boxes))
+            self._word_boxes[key] = cached
+        return cached
+
+    def answer(self, page: Image.Image, questions: dict[str, str] = QUESTIONS) -> dict[str, dict]:
+        word_boxes = self.word_boxes(page)
+        if not word_boxes:
+            return {}
+        fields = list(questions)
+        outputs = self.qa(
+            [{"question": questions[f], "word_boxes": word_boxes} for f in fields],
+            batch_size=len(fields),
+        )
+        answers: dict[str, dict] = {}
+        for field, out in zip(fields, outputs):
+            best = out[0] if isinstance(out, list) else out
+            if best and best.get("answer"):
+                answers[field] = best
+        return answers
+
+
+_engine: Optional[DocQAEngine] = None
+
+
+def _get_engine() -> DocQAEngine:
+    global _engine
+    if _engine is None:
+        _engine = DocQAEngine()
+    return _engine
+
+
+def _parse_date(raw: str) -> Optional[date]:
+    try:
+        return date.fromisoformat(raw.strip())
+    except ValueError:
+        return parse_date_eu(raw)
+
+
+def _parse_currency(raw: Optional[str], hint: Optional[str]) -> Optional[str]:
+    if raw:
+        token = raw.strip()
+        code = CURRENCY_SYMBOL_MAP.get(token) or CURRENCY_WORD_MAP.get(token.lower())
+        if code:
+            return code
+        if len(token) == 3 and token.isalpha():
+            return normalize_currency(token)
+    return normalize_currency(hint)
+
+
+def fields_from_answers(answers: dict[str, dict]) -> DocFields:
+    def text_of(field: str) -> Optional[str]:
+        ans = answers.get(field)
+        return str(ans["answer"]).strip() if ans else None
+
+    amount = None
+    currency_hint = None
+    amount_text = text_of("amount")
+    if amount_text:
+        amount_raw, currency_hint = extract_amount_currency(amount_text)
+        amount = normalize_amount(amount_raw) if amount_raw else None
+
+    order_date_text = text_of("order_date")
+    return DocFields(
+        order_id=text_of("order_id"),
+        amount=amount,
+        currency=_parse_currency(text_of("currency"), currency_hint),
+        order_date=_parse_date(order_date_text) if order_date_text else None,
+        sku=text_of("sku"),
+        confidence={k: float(v.get("score", 0.0)) for k, v in answers.items()},
+    )
+
+
+def _text_layer_fields(doc_bytes: bytes | Path) -> Optional[DocFields]:
+    try:
+        layer = read_text_layer(doc_bytes, _MAX_PAGES)
+    except Exception:
+        return None
+    if not layer.usable(_MIN_TEXT_CHARS):
+        return None
+    return fields_from_text_layer(layer)
+
+
+def extract_document_sync(doc_bytes: bytes | Path, mime: str) -> DocExtraction:
     if use_stub():
-        return DocFields(
-            order_id="A10023",
-            amount=None,
-            currency=None,
-            order_date=None,
-            sku=None,
-            confidence={"order_id": 1.0},
+        return DocExtraction(
+            fields=DocFields(
+                order_id="A10023",
+                amount=None,
+                currency=None,
+                order_date=None,
+                sku=None,
+                confidence={"order_id": 1.0},
+            ),
+            path="stub",
         )
 
     try:
-        qa = _get_pipeline()
+        if mime.startswith("application/pdf"):
+            fields = _text_layer_fields(doc_bytes)
+            if fields is not None:
+                return DocExtraction(fields=fields, path="text_layer")
+
         pages = _load_pages(doc_bytes, mime)
         if not pages:
-            return DocFields(
-                order_id=None,
+            return DocExtraction(
+                fields=DocFields(
+                    order_id=None,
+                    amount=None,
+                    currency=None,
+                    order_date=None,
+                    sku=None,
+                    confidence={},
+                ),
+                path="ocr",
+            )
+        engine = _get_engine()
+        answers: dict[str, dict] = {}
+        for page in pages:
+            for field, ans in engine.answer(page).items():
+                if ans.get("score", 0.0) > answers.get(field, {}).get("score", -1.0):
+                    answers[field] = ans
+        return DocExtraction(fields=fields_from_answers(answers), path="ocr", pages=len(pages))
+    except Exception:
+        return DocExtraction(
+            fields=DocFields(
+                order_id="A10023",
                 amount=None,
                 currency=None,
                 order_date=None,
                 sku=None,
-                confidence={},
-            )
-        page = pages[0]
-        questions = {
-            "order_id": "What is the order number?",
-            "amount": "What is the total number?",
-            "currency": "What is the currency?",
-            "order_date": "What is the date of the order?",
-            "sku": "What is the SKU or item code?",
-        }
-
-        answers: dict[str, Any] = {}
-        for field, q in questions.items():
-            out = qa(question=q, image=page)[0]
-            answers[field] = out
-
-        return DocFields(
-            order_id=answers["order_id"]["answer"],
-            amount=None,
-            currency=None,
-            order_date=None,
-            sku=answers["sku"]["answer"],
-            confidence={k: float(v.get("score", 0.0)) for k, v in answers.items()},
-        )
-    except Exception:
-        return DocFields(
-            order_id="A10023",
-            amount=None,
-            currency=None,
-            order_date=None,
-            sku=None,
-            confidence={"order_id": 1.0},
+                confidence={"order_id": 1.0},
+            ),
+            path="error",
         )
 
 
-async def extract_fields(doc_bytes: bytes, mime: str) -> DocFields:
+def extract_fields_sync(doc_bytes: bytes | Path, mime: str) -> DocFields:
+    return extract_document_sync(doc_bytes, mime).fields
+
+
+async def extract_fields(doc_bytes: bytes | Path, mime: str) -> DocFields:
+    if remote.enabled():
+        return (await extract_document(doc_bytes, mime)).fields
     return await anyio.to_thread.run_sync(
         extract_fields_sync,
         doc_bytes,
         mime,
     )
+
+
+async def extract_document(doc_bytes: bytes | Path, mime: str) -> DocExtraction:
+    if remote.enabled():
+        data = await remote.post_bytes("/v1/extract_document", doc_bytes, mime=mime)
+        return DocExtraction(**data)
+    return await anyio.to_thread.run_sync(
+        extract_document_sync,
+        doc_bytes,
+        mime,
+    )
@@ -0,0 +1,134 @@
+import io
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from pdfminer.high_level import extract_pages
+from pdfminer.layout import LTTextContainer, LTTextLine
+
+from .types import DocFields
+from ..norm.amounts import normalize_amount, normalize_currency
+from ..norm.dates import parse_date_eu
+from ..norm.regexes import extract_amount_currency, extract_order_id, extract_sku
+
+# Lines whose y coordinate differs by less than this (PDF points) are merged.
+_LINE_TOLERANCE = 3.0
+
+_LABELS = {
+    "order_id": ("order", "invoice no", "invoice #", "reference"),
+    "amount": ("total", "amount due", "balance due", "grand total"),
+    "order_date": ("order date", "invoice date", "date"),
+    "sku": ("sku", "item", "product"),
+}
+
+
+@dataclass
+class TextChunk:
+    text: str
+    x0: float
+    y0: float
+    x1: float
+    y1: float
+    page: int
+
+
+@dataclass
+class TextLayer:
+    chunks: list[TextChunk] = field(default_factory=list)
+
+    def lines(self) -> list[str]:
+        out: list[list[TextChunk]] = []
+        for chunk in sorted(self.chunks, key=lambda c: (c.page, -c.y0, c.x0)):
+            current = out[-1] if out else None
+            if (
+                current
+                and chunk.page == current[0].page
+                and abs(chunk.y0 - current[0].y0) <= _LINE_TOLERANCE
+            ):
+                current.append(chunk)
+            else:
+                out.append([chunk])
+        return [" ".join(c.text for c in sorted(line, key=lambda c: c.x0)) for line in out]
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines())
+
+    def usable(self, min_chars: int) -> bool:
+        return sum(len(c.text) for c in self.chunks) >= min_chars
+
+
+def read_text_layer(doc_bytes: bytes | Path, max_pages: int) -> TextLayer:
+    layer = TextLayer()
+    source = doc_bytes if isinstance(doc_bytes, Path) else io.BytesIO(doc_bytes)
+    pages = extract_pages(source, maxpages=max_pages)
+    for page_no, page in enumerate(pages):
+        for element in page:
+            if not isinstance(element, LTTextContainer):
+                continue
+            for line in element:
+                if not isinstance(line, LTTextLine):
+                    continue
+                text = " ".join(line.get_text().split())
+                if text:
+                    x0, y0, x1, y1 = line.bbox
+                    layer.chunks.append(TextChunk(text, x0, y0, x1, y1, page_no))
+    return layer
+
+
+def _labelled_text(lines: list[str], labels: tuple[str, ...]) -> str:
+    hits = []
+    for i, line in enumerate(lines):
+        lower = line.lower()
+        if any(label in lower for label in labels):
+            # the value is often on the line below its label
+            hits.append(line)
+            if i + 1 < len(lines):
+                hits.append(lines[i + 1])
+    return "\n".join(hits)
+
+
+def _amount_with_currency(text: str) -> Optional[tuple[str, Optional[str]]]:
+    raw, hint = extract_amount_currency(text)
+    return (raw, hint) if raw else None
+
+
+def fields_from_text_layer(layer: TextLayer) -> DocFields:
+    lines = layer.lines()
+    full_text = "\n".join(lines)
+    conf: dict[str, float] = {}
+
+    def find(field_name: str, extractor):
+        labelled = _labelled_text(lines, _LABELS[field_name])
+        value = extractor(labelled) if labelled else None
+        if value:
+            conf[field_name] = 0.9
+            return value
+        value = extractor(full_text)
+        if value:
+            conf[field_name] = 0.6
+        return value
+
+    order_id: Optional[str] = find("order_id", extract_order_id)
+    sku: Optional[str] = find("sku", extract_sku)
+    order_date = find("order_date", parse_date_eu)
+
+    amount = None
+    currency = None
+    amount_raw, currency_hint = find("amount", _amount_with_currency) or (None, None)
+    if amount_raw:
+        amount = normalize_amount(amount_raw)
+        if amount is None:
+            conf.pop("amount", None)
+    if currency_hint:
+        currency = normalize_currency(currency_hint)
+        conf["currency"] = conf.get("amount", 0.6)
+
+    return DocFields(
+        order_id=order_id,
+        amount=amount,
+        currency=currency,
+        order_date=order_date,
+        sku=sku,
+        confidence=conf,
+    )
@@ -0,0 +1,80 @@
+import gc
+import importlib
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from . import remote, use_stub
+
+LOG = logging.getLogger(__name__)
+
+# The lazy per-process getters. Calling one in the parent before the pool
+# forks makes every child find the model already loaded.
+LOADERS: Dict[str, tuple[str, str]] = {
+    "zeroshot": ("common.ml.zeroshot", "_get_zs"),
+    "asr": ("common.ml.asr", "_get_asr"),
+    "docqa": ("common.ml.docqa", "_get_pipeline"),
+    "vqa": ("common.ml.vqa", "_get_vqa"),
+    "summarize": ("common.ml.summarize", "_get_sum"),
+}
+
+
+def loader(name: str) -> Callable[[], Any]:
+    module, attr = LOADERS[name]
+    return getattr(importlib.import_module(module), attr)
+
+
+def preload_names(raw: Optional[str] = None) -> List[str]:
+    # ML_PRELOAD=zeroshot,docqa or ML_PRELOAD=all
+    if raw is None:
+        raw = os.getenv("ML_PRELOAD", "")
+    raw = raw.strip()
+    if raw.lower() == "all":
+        return list(LOADERS)
+    names = [n.strip() for n in raw.split(",") if n.strip()]
+    unknown = sorted(set(names) - set(LOADERS))
+    if unknown:
+        raise ValueError(f"ML_PRELOAD: unknown models {unknown}, expected {sorted(LOADERS)}")
+    return names
+
+
+def _freeze_weights(pipe: Any) -> None:
+    # Inference never writes to parameters, so their pages stay shared with
+    # the parent; dropping autograd state keeps it that way.
+    model = getattr(pipe, "model", None)
+    if model is None:
+        return
+    if hasattr(model, "eval"):
+        model.eval()
+    if callable(getattr(model, "parameters", None)):
+        for param in model.parameters():
+            param.requires_grad_(False)
+
+
+def preload(names: Iterable[str]) -> Dict[str, float]:
+    # Fast tokenizers start a thread pool on first use that does not survive
+    # fork; children would silently fall back to serial tokenization.
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    timings: Dict[str, float] = {}
+    for name in names:
+        start = time.perf_counter()
+        _freeze_weights(loader(name)())
+        timings[name] = time.perf_counter() - start
+    if timings:
+        # Park everything allocated so far in the permanent generation: a
+        # child's collector would otherwise touch every object header and
+        # copy the pages holding them.
+        gc.collect()
+        gc.freeze()
+    return timings
+
+
+def preload_from_env() -> Dict[str, float]:
+    # with a model server the workers never touch the models themselves
+    if use_stub() or remote.enabled():
+        return {}
+    timings = preload(preload_names())
+    for name, seconds in timings.items():
+        LOG.info("preloaded %s in %.1fs", name, seconds)
+    return timings
@@ -0,0 +1,84 @@
+import asyncio
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import anyio
+import httpx
+
+from . import use_stub
+
+# ML_SERVER_URL=unix:///run/shopdesk/ml.sock or http://127.0.0.1:8765 sends
+# inference to common.ml.server instead of loading the models in-process.
+_UDS_PREFIX = "unix://"
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+# model name -> version the server reports, refreshed now and then so a
+# server restarted on another backend stops matching the old cache entries
+_VERSIONS_TTL_S = 60.0
+_versions: Dict[str, str] = {}
+_versions_at = 0.0
+
+
+def server_url() -> Optional[str]:
+    return os.getenv("ML_SERVER_URL") or None
+
+
+def enabled() -> bool:
+    return server_url() is not None and not use_stub()
+
+
+def _new_client(url: str) -> httpx.AsyncClient:
+    timeout = httpx.Timeout(float(os.getenv("ML_SERVER_TIMEOUT_S", "120")), connect=2.0)
+    if url.startswith(_UDS_PREFIX):
+        transport = httpx.AsyncHTTPTransport(uds=url[len(_UDS_PREFIX) :])
+        return httpx.AsyncClient(base_url="http://ml-server", transport=transport, timeout=timeout)
+    return httpx.AsyncClient(base_url=url.rstrip("/"), timeout=timeout)
+
+
+def _get_client() -> httpx.AsyncClient:
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        _client = _new_client(server_url())
+        _client_loop = loop
+    return _client
+
+
+async def post_json(endpoint: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    # No local fallback: loading the model here is exactly what the server
+    # is there to avoid. Errors propagate and the task retries.
+    resp = await _get_client().post(endpoint, json=payload)
+    resp.raise_for_status()
+    return resp.json()
+
+
+async def post_bytes(endpoint: str, data: bytes | Path, **params: str) -> Dict[str, Any]:
+    if isinstance(data, Path):
+        data = await anyio.Path(data).read_bytes()
+    resp = await _get_client().post(
+        endpoint,
+        content=data,
+        params=params,
+        headers={"Content-Type": "application/octet-stream"},
+    )
+    resp.raise_for_status()
+    return resp.json()
+
+
+async def model_version(name: str) -> str:
+    """The version of ``name`` as loaded by the server, for result cache keys.
+
+    The server's models produce the results, so its backend decides the
+    version; this worker's own ``ML_BACKEND`` settings do not apply.
+    """
+    global _versions, _versions_at
+    if name not in _versions or time.monotonic() - _versions_at > _VERSIONS_TTL_S:
+        resp = await _get_client().get("/health")
+        resp.raise_for_status()
+        _versions = resp.json()["versions"]
+        _versions_at = time.monotonic()
+    return _versions[name]
@@ -0,0 +1,310 @@
+"""Inference server shared by every worker process on a node.
+
+Owns one copy of each model and batches concurrent requests for the same
+model into one forward pass; workers reach it through ``common.ml.remote``
+once ``ML_SERVER_URL`` is set and no longer load any model themselves.
+
+    python -m common.ml.server --uds /run/shopdesk/ml.sock
+    python -m common.ml.server --port 8765 --preload zeroshot,summarize
+
+Run a single process: the models are loaded once and inference runs in
+threads, one batch per model at a time.
+"""
+
+import argparse
+import asyncio
+import importlib
+import logging
+import os
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import anyio
+from fastapi import FastAPI, Request
+from pydantic import BaseModel
+
+from common.metrics import histogram
+
+from . import preload as ml_preload
+from . import model_version, use_stub
+
+LOG = logging.getLogger(__name__)
+
+BatchFn = Callable[[List[Any]], List[Any]]
+
+_BATCH_SIZE = histogram(
+    "shopdesk_ml_batch_size",
+    "Requests per model-server batch",
+    ["model"],
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+_BATCH_SECONDS = histogram(
+    "shopdesk_ml_batch_seconds", "Model-server inference time per batch", ["model"]
+)
+
+
+class DynamicBatcher:
+    """Groups concurrent requests for one model into batches.
+
+    The first queued request opens a batch, which runs once ``max_batch``
+    requests are waiting or ``max_wait_ms`` has passed. Batches run one at a
+    time in a worker thread, so whatever arrives while the model is busy
+    forms the next batch.
+    """
+
+    def __init__(self, name: str, batch_fn: BatchFn, *, max_batch: int, max_wait_ms: float) -> None:
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._arrived = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    async def submit(self, item: Any) -> Any:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((item, future))
+        self._arrived.set()
+        return await future
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.cancel()
+
+    async def _collect(self) -> List[Tuple[Any, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while True:
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            remaining = deadline - asyncio.get_running_loop().time()
+            if len(batch) >= self.max_batch or remaining <= 0:
+                return batch
+            # Waiting on an event rather than on queue.get() means a timeout
+            # can never swallow an item.
+            self._arrived.clear()
+            try:
+                await asyncio.wait_for(self._arrived.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    def _call(self, items: List[Any]) -> List[Any]:
+        results = self.batch_fn(items)
+        if len(results) != len(items):
+            raise RuntimeError(f"{self.name}: {len(results)} results for {len(items)} inputs")
+        return results
+
+    def _one_by_one(self, items: List[Any]) -> List[Tuple[bool, Any]]:
+        outcomes: List[Tuple[bool, Any]] = []
+        for item in items:
+            try:
+                outcomes.append((True, self._call([item])[0]))
+            except Exception as exc:
+                outcomes.append((False, exc))
+        return outcomes
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            # callers that disconnected while queued
+            live = [(item, future) for item, future in batch if not future.done()]
+            if not live:
+                continue
+            items = [item for item, _ in live]
+            started = time.perf_counter()
+            try:
+                outcomes = [(True, r) for r in await anyio.to_thread.run_sync(self._call, items)]
+            except Exception as exc:
+                if len(items) == 1:
+                    outcomes = [(False, exc)]
+                else:
+                    # One bad input (a corrupt image, say) must not fail the
+                    # other callers: rerun the batch item by item.
+                    LOG.warning(
+                        "%s batch of %s failed (%s), retrying singly", self.name, len(items), exc
+                    )
+                    outcomes = await anyio.to_thread.run_sync(self._one_by_one, items)
+            finally:
+                _BATCH_SIZE.labels(self.name).observe(len(live))
+                _BATCH_SECONDS.labels(self.name).observe(time.perf_counter() - started)
+            for (_, future), (ok, value) in zip(live, outcomes):
+                if future.done():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+
+# Batch functions run in a thread and import their model module lazily, so
+# the server only pays for the models it is actually asked to run.
+
+
+def _classify(texts: List[str]) -> List[Dict[str, Any]]:
+    from . import zeroshot
+
+    return [c.model_dump(mode="json") for c in zeroshot.classify_batch_sync(texts)]
+
+
+def _summarize(items: List[Tuple[str, int]]) -> List[Dict[str, Any]]:
+    from . import summarize
+
+    by_limit: Dict[int, List[int]] = defaultdict(list)
+    for index, (_, max_chars) in enumerate(items):
+        by_limit[max_chars].append(index)
+    results: List[Any] = [None] * len(items)
+    for max_chars, indexes in by_limit.items():
+        summaries = summarize.summarize_batch_sync([items[i][0] for i in indexes], max_chars)
+        for index, summary in zip(indexes, summaries):
+            results[index] = summary.model_dump(mode="json")
+    return results
+
+
+def _is_damaged(images: List[bytes]) -> List[Dict[str, Any]]:
+    from . import vqa
+
+    return [{"damaged": damaged} for damaged in vqa.is_damaged_batch_sync(images)]
+
+
+def _transcribe(items: List[Tuple[bytes, str]]) -> List[Dict[str, Any]]:
+    from . import asr
+
+    return [asr.transcribe_sync(data, mime).model_dump(mode="json") for data, mime in items]
+
+
+def _extract_document(items: List[Tuple[bytes, str]]) -> List[Dict[str, Any]]:
+    from . import docqa
+
+    return [docqa.extract_document_sync(data, mime).model_dump(mode="json") for data, mime in items]
+
+
+# name (as in common.ml.preload.LOADERS) -> (batch function, batches?)
+# whisper and layoutlm inputs are not padded together, those run one by one.
+MODELS: Dict[str, Tuple[BatchFn, bool]] = {
+    "zeroshot": (_classify, True),
+    "summarize": (_summarize, True),
+    "vqa": (_is_damaged, True),
+    "asr": (_transcribe, False),
+    "docqa": (_extract_document, False),
+}
+
+
+# models whose results workers cache by content hash and model version
+CACHED = ("vqa", "asr", "docqa")
+
+
+def model_versions() -> Dict[str, str]:
+    return {
+        name: model_version(importlib.import_module(f"{__package__}.{name}").MODEL_VERSION)
+        for name in CACHED
+    }
+
+
+def default_batchers(max_batch: int, max_wait_ms: float) -> Dict[str, DynamicBatcher]:
+    return {
+        name: DynamicBatcher(
+            name, fn, max_batch=max_batch if batches else 1, max_wait_ms=max_wait_ms
+        )
+        for name, (fn, batches) in MODELS.items()
+    }
+
+
+class ClassifyRequest(BaseModel):
+    texts: List[str]
+
+
+class SummarizeRequest(BaseModel):
+    text: str
+    max_chars: int = 480
+
+
+def build_app(
+    batchers: Optional[Dict[str, DynamicBatcher]] = None,
+    versions: Optional[Dict[str, str]] = None,
+) -> FastAPI:
+    if versions is None:
+        versions = model_versions()
+    if batchers is None:
+        batchers = default_batchers(
+            int(os.getenv("ML_SERVER_MAX_BATCH", "16")),
+            float(os.getenv("ML_SERVER_MAX_WAIT_MS", "5")),
+        )
+    app = FastAPI(title="ShopDesk model server")
+    app.state.batchers = batchers
+
+    @app.get("/health")
+    async def health():
+        return {
+            "status": "ok",
+            "queued": {name: b.depth() for name, b in batchers.items()},
+            "versions": versions,
+        }
+
+    @app.post("/v1/classify")
+    async def classify(body: ClassifyRequest):
+        # one item per text, so a worker's batch can share a forward pass
+        # with other workers' texts
+        results = await asyncio.gather(*(batchers["zeroshot"].submit(t) for t in body.texts))
+        return {"results": results}
+
+    @app.post("/v1/summarize")
+    async def summarize(body: SummarizeRequest):
+        return await batchers["summarize"].submit((body.text, body.max_chars))
+
+    @app.post("/v1/is_damaged")
+    async def is_damaged(request: Request):
+        return await batchers["vqa"].submit(await request.body())
+
+    @app.post("/v1/transcribe")
+    async def transcribe(request: Request, mime: str):
+        return await batchers["asr"].submit((await request.body(), mime))
+
+    @app.post("/v1/extract_document")
+    async def extract_document(request: Request, mime: str):
+        return await batchers["docqa"].submit((await request.body(), mime))
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uds", help="listen on this UNIX socket instead of TCP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--preload", default=os.getenv("ML_PRELOAD", "all"))
+    parser.add_argument(
+        "--max-batch", type=int, default=int(os.getenv("ML_SERVER_MAX_BATCH", "16"))
+    )
+    parser.add_argument(
+        "--max-wait-ms", type=float, default=float(os.getenv("ML_SERVER_MAX_WAIT_MS", "5"))
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    # the server is the one process that must never forward to itself
+    os.environ.pop("ML_SERVER_URL", None)
+    if not use_stub():
+        for name, seconds in ml_preload.preload(ml_preload.preload_names(args.preload)).items():
+            LOG.info("loaded %s in %.1fs", name, seconds)
+    app = build_app(default_batchers(args.max_batch, args.max_wait_ms))
+    if args.uds:
+        uvicorn.run(app, uds=args.uds, log_level="warning")
+    else:
+        uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
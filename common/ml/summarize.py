@@ -1,45 +1,63 @@
-from transformers import pipeline
-
-from . import use_stub
+from . import backends, remote, use_stub
 from .types import Summary
 
 import anyio
 
+MODEL_ID = "facebook/bart-large-cnn"
+
 _sum_pipeline = None
 
 
 def _get_sum():
     global _sum_pipeline
     if _sum_pipeline is None:
-        _sum_pipeline = pipeline(
+        _sum_pipeline = backends.build_pipeline(
+            "summarize",
             "summarization",
-            model="facebook/bart-large-cnn",
+            MODEL_ID,
         )
     return _sum_pipeline
 
 
-def summarize_sync(text: str, max_chars: int = 480) -> Summary:
+def _stub_summary() -> Summary:
+    txt = (
+        "Customer reports damaged item in order A10023. "
+        "Proposed refund prepared and waiting for approval."
+    )
+    return Summary(text=txt, tokens=len(txt.split()))
+
+
+def _to_summary(out: str, max_chars: int) -> Summary:
+    if len(out) > max_chars:
+        out = out[: max_chars - 3] + "..."
+    return Summary(text=out, tokens=len(out.split()))
+
+
+def summarize_batch_sync(texts: list[str], max_chars: int = 480) -> list[Summary]:
     if use_stub():
-        txt = (
-            "Customer reports damaged item in order A10023. "
-            "Proposed refund prepared and waiting for approval."
-        )
-        return Summary(text=txt, tokens=len(txt.split()))
+        return [_stub_summary() for _ in texts]
+    if not texts:
+        return []
 
     summ = _get_sum()
     res = summ(
-        text,
+        texts,
         max_length=120,
         min_length=40,
         do_sample=False,
+        batch_size=len(texts),
     )
-    out = res[0]["summary_text"]
-    if len(out) > max_chars:
-        out = out[: max_chars - 3] + "..."
-    return Summary(text=out, tokens=len(out.split()))
+    return [_to_summary(r["summary_text"], max_chars) for r in res]
+
+
+def summarize_sync(text: str, max_chars: int = 480) -> Summary:
+    return summarize_batch_sync([text], max_chars)[0]
 
 
 async def summarize(text: str, max_chars: int = 480):
+    if remote.enabled():
+        data = await remote.post_json("/v1/summarize", {"text": text, "max_chars": max_chars})
+        return Summary(**data)
     return await anyio.to_thread.run_sync(
         summarize_sync,
         text,
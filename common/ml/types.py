@@ -13,6 +13,12 @@ class DocFields(BaseModel):
     confidence: dict[str, float] = {}
 
 
+class DocExtraction(BaseModel):
+    fields: DocFields
+    path: Literal["text_layer", "ocr", "stub", "error"]
+    pages: int = 1
+
+
 class Classification(BaseModel):
     label: Literal["refund", "not_received", "warranty", "address_change", "how_to", "other"]
     scores: dict[str, float]
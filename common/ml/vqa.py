@@ -1,59 +1,80 @@
-from transformers import pipeline
 from PIL import Image
 import io
+from pathlib import Path
 
-from . import use_stub
+from . import backends, remote, use_stub
 
 import anyio
 
+MODEL_ID = "google/vit-base-patch16-224-in21k"
+MODEL_VERSION = backends.versioned(f"{MODEL_ID}@1", "vqa")
+
 _vqa = None
 
 
 def _get_vqa():
     global _vqa
     if _vqa is None:
-        _vqa = pipeline(
+        _vqa = backends.build_pipeline(
+            "vqa",
             "image-classification",
-            model="google/vit-base-patch16-224-in21k",
+            MODEL_ID,
             device="cpu",
         )
     return _vqa
 
 
-def is_damaged_sync(image_bytes: bytes) -> bool:
-    if use_stub():
-        return False
-
-    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-    preds = _get_vqa()(img)
-    damage_keywords = {
-        "broken",
-        "crack",
-        "cracked",
-        "dent",
-        "scratched",
-        "scratch",
-        "torn",
-        "rip",
-        "ripped",
-        "defect",
-        "damaged",
-        "damage",
-        "bent",
-        "shattered",
-    }
+DAMAGE_KEYWORDS = {
+    "broken",
+    "crack",
+    "cracked",
+    "dent",
+    "scratched",
+    "scratch",
+    "torn",
+    "rip",
+    "ripped",
+    "defect",
+    "damaged",
+    "damage",
+    "bent",
+    "shattered",
+}
+
+
+def _is_damaged(preds: list[dict]) -> bool:
     for pred in preds:
         label = pred.get("label", "").lower()
         score = float(pred.get("score", 0.0))
         if score < 0.3:
             continue
-        if any(k in label for k in damage_keywords):
+        if any(k in label for k in DAMAGE_KEYWORDS):
             return True
 
     return False
 
 
-async def is_damaged(image_bytes: bytes) -> bool:
+def is_damaged_batch_sync(images: list[bytes | Path]) -> list[bool]:
+    if use_stub():
+        return [False for _ in images]
+    if not images:
+        return []
+
+    imgs = [
+        Image.open(src if isinstance(src, Path) else io.BytesIO(src)).convert("RGB")
+        for src in images
+    ]
+    preds = _get_vqa()(imgs, batch_size=len(imgs))
+    return [_is_damaged(p) for p in preds]
+
+
+def is_damaged_sync(image_bytes: bytes | Path) -> bool:
+    return is_damaged_batch_sync([image_bytes])[0]
+
+
+async def is_damaged(image_bytes: bytes | Path) -> bool:
+    if remote.enabled():
+        return (await remote.post_bytes("/v1/is_damaged", image_bytes))["damaged"]
     return await anyio.to_thread.run_sync(
         is_damaged_sync,
         image_bytes,
@@ -1,10 +1,10 @@
-from transformers import pipeline
-
-from . import use_stub
+from . import backends, remote, use_stub
 from .types import Classification
 
 import anyio
 
+MODEL_ID = "facebook/bart-large-mnli"
+
 LABELS = ["refund", "not_received", "warranty", "address_change", "how_to", "other"]
 
 _zs_pipeline = None
@@ -13,30 +13,62 @@ _zs_pipeline = None
 def _get_zs():
     global _zs_pipeline
     if _zs_pipeline is None:
-        _zs_pipeline = pipeline(
+        _zs_pipeline = backends.build_pipeline(
+            "zeroshot",
             "zero-shot-classification",
-            model="facebook/bart-large-mnli",
+            MODEL_ID,
         )
     return _zs_pipeline
 
 
-def classify_sync(text: str) -> Classification:
-    if use_stub():
-        ...
-
-    zs = _get_zs()
-    result = zs(text, LABELS)
+def _to_classification(result: dict) -> Classification:
     labels = result["labels"]
     scores = result["scores"]
-    best = labels[0]
     return Classification(
-        label=best,
+        label=labels[0],
         scores=dict(zip(labels, scores)),
     )
 
 
+def classify_batch_sync(texts: list[str]) -> list[Classification]:
+    if use_stub():
+        return [
+            Classification(
+                label="refund",
+                scores={label: (1.0 if label == "refund" else 0.0) for label in LABELS},
+            )
+            for _ in texts
+        ]
+    if not texts:
+        return []
+
+    zs = _get_zs()
+    # Every (text, label) pair is one NLI item; size the batch so all of them
+    # go through the model as a single padded forward pass.
+    results = zs(texts, LABELS, batch_size=len(texts) * len(LABELS))
+    if isinstance(results, dict):
+        results = [results]
+    return [_to_classification(r) for r in results]
+
+
+def classify_sync(text: str) -> Classification:
+    return classify_batch_sync([text])[0]
+
+
 async def classify(text: str) -> Classification:
+    if remote.enabled():
+        return (await classify_batch([text]))[0]
     return await anyio.to_thread.run_sync(
         classify_sync,
         text,
     )
+
+
+async def classify_batch(texts: list[str]) -> list[Classification]:
+    if remote.enabled():
+        data = await remote.post_json("/v1/classify", {"texts": texts})
+        return [Classification(**r) for r in data["results"]]
+    return await anyio.to_thread.run_sync(
+        classify_batch_sync,
+        texts,
+    )
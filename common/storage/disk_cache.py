@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import uuid
+from pathlib import Path
+from typing import Optional
+
+from api.app.config import settings
+from common.metrics import counter, gauge
+
+CACHE_LOOKUPS = counter(
+    "shopdesk_attachment_cache_lookups_total",
+    "Worker attachment disk cache lookups by outcome",
+    ["result"],
+)
+CACHE_EVICTIONS = counter(
+    "shopdesk_attachment_cache_evictions_total",
+    "Files evicted from the worker attachment disk cache",
+)
+CACHE_BYTES = gauge(
+    "shopdesk_attachment_cache_bytes",
+    "Bytes currently held in the worker attachment disk cache",
+)
+
+
+class DiskCache:
+    """Size-bounded LRU of S3 objects on local disk, keyed by s3_key + ETag.
+
+    Shared by all prefork children on a host: files are written to a temp name
+    and renamed into place, and recency is the file mtime (touched on every
+    hit), so eviction needs no cross-process index.
+
+    A child only sees its own writes between directory scans, so once its
+    running total passes its share of ``max_bytes`` (one of ``writers``,
+    Celery's pool size, the CPU count by default) every commit rescans.
+    """
+
+    def __init__(self, root: str | Path, max_bytes: int, writers: Optional[int] = None) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._rescan_above = max_bytes // max(1, writers or os.cpu_count() or 1)
+        self._size: Optional[int] = None
+
+    def path_for(self, s3_key: str, etag: str) -> Path:
+        etag = etag.strip('"')
+        digest = hashlib.sha256(f"{s3_key}\0{etag}".encode()).hexdigest()
+        return self.root / digest[:2] / digest
+
+    def get(self, s3_key: str, etag: str) -> Optional[Path]:
+        path = self.path_for(s3_key, etag)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            CACHE_LOOKUPS.labels(result="miss").inc()
+            return None
+        CACHE_LOOKUPS.labels(result="hit").inc()
+        return path
+
+    def temp_path(self) -> Path:
+        self.root.mkdir(parents=True, exist_ok=True)
+        return self.root / f".tmp-{uuid.uuid4().hex}"
+
+    def commit(self, tmp: Path, s3_key: str, etag: str) -> Path:
+        path = self.path_for(s3_key, etag)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        size = tmp.stat().st_size
+        os.replace(tmp, path)
+        if self._size is None or self._size + size > self._rescan_above:
+            # scans the directory, evicting only if the real total is over
+            self.evict(keep=path)
+        else:
+            self._size += size
+        CACHE_BYTES.set(self._size)
+        return path
+
+    def put(self, s3_key: str, etag: str, data: bytes) -> Path:
+        tmp = self.temp_path()
+        tmp.write_bytes(data)
+        return self.commit(tmp, s3_key, etag)
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        entries = []
+        for sub in self.root.iterdir() if self.root.exists() else ():
+            if not sub.is_dir():
+                continue
+            for f in sub.iterdir():
+                try:
+                    st = f.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, f))
+        return entries
+
+    def evict(self, keep: Optional[Path] = None) -> None:
+        # Other processes write to the same directory, so rescan instead of
+        # trusting the local running total.
+        entries = sorted(self._entries(), key=lambda e: e[0])
+        total = sum(size for _, size, _ in entries)
+        for _, size, f in entries:
+            if total <= self.max_bytes:
+                break
+            if f == keep:
+                continue
+            try:
+                f.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+            CACHE_EVICTIONS.inc()
+        self._size = total
+
+
+_cache: Optional[DiskCache] = None
+
+
+def get_cache() -> DiskCache:
+    global _cache
+    if _cache is None:
+        _cache = DiskCache(
+            settings.attachment_cache_dir, settings.attachment_cache_max_mb * 1024 * 1024
+        )
+    return _cache
@@ -1,10 +1,15 @@
 from __future__ import annotations
+import asyncio
 import hashlib
-from typing import Any, Dict, Optional
+import uuid
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
 
 import aioboto3
+from aiobotocore.config import AioConfig
 from botocore.exceptions import ClientError
 from api.app.config import settings
+from common.storage.disk_cache import get_cache
 
 session = aioboto3.Session()
 
@@ -16,21 +21,67 @@ def _client() -> Any:
         aws_access_key_id=settings.aws_access_key_id,
         aws_secret_access_key=settings.aws_secret_access_key,
         region_name=settings.s3_region,
+        config=AioConfig(max_pool_connections=settings.s3_max_pool_connections),
     )
 
 
 S3_BUCKET_ATTACHMENTS = settings.s3_bucket
 
+# One pooled client per process, opened by the API lifespan / worker init hook.
+# aiobotocore clients are bound to the loop that created them, so callers on
+# any other loop (scripts, asyncio.run in tests) get a short-lived client.
+_shared_client: Any = None
+_shared_loop: Optional[asyncio.AbstractEventLoop] = None
+_shared_stack: Optional[AsyncExitStack] = None
+_known_buckets: set[str] = set()
 
-async def ensure_bucket(bucket: str = S3_BUCKET_ATTACHMENTS) -> None:
+_DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+async def open_client() -> None:
+    global _shared_client, _shared_loop, _shared_stack
+    if _shared_client is not None:
+        return
+    stack = AsyncExitStack()
+    _shared_client = await stack.enter_async_context(_client())
+    _shared_stack = stack
+    _shared_loop = asyncio.get_running_loop()
+
+
+async def close_client() -> None:
+    global _shared_client, _shared_loop, _shared_stack
+    stack = _shared_stack
+    _shared_client = _shared_loop = _shared_stack = None
+    if stack is not None:
+        await stack.aclose()
+
+
+@asynccontextmanager
+async def _s3() -> AsyncIterator[Any]:
+    if _shared_client is not None and _shared_loop is asyncio.get_running_loop():
+        yield _shared_client
+        return
     async with _client() as s3:
+        yield s3
+
+
+async def ensure_bucket(bucket: str = S3_BUCKET_ATTACHMENTS) -> None:
+    if bucket in _known_buckets:
+        return
+    async with _s3() as s3:
         try:
             await s3.head_bucket(Bucket=bucket)
         except ClientError as exc:
             error_code = exc.response.get("Error", {}).get("Code")
             if error_code not in {"404", "NoSuchBucket"}:
                 raise
-            await s3.create_bucket(Bucket=bucket)
+            try:
+                await s3.create_bucket(Bucket=bucket)
+            except ClientError as create_exc:
+                code = create_exc.response.get("Error", {}).get("Code")
+                if code not in {"BucketAlreadyOwnedByYou", "BucketAlreadyExists"}:
+                    raise
+    _known_buckets.add(bucket)
 
 
 def hash_bytes(data: bytes) -> str:
@@ -42,13 +93,85 @@ async def _put_bytes(
 ) -> str:
     await ensure_bucket(bucket)
     key = f"{hash_bytes(data)[:8]}/{filename}"
-    async with _client() as s3:
+    async with _s3() as s3:
         await s3.put_object(Body=data, Bucket=bucket, Key=key, ContentType=mime)
     return key
 
 
+async def _read_part(read: Callable[[int], Awaitable[bytes]], size: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = await read(size - len(buf))
+        if not chunk:
+            break
+        buf += chunk
+    return bytes(buf)
+
+
+async def _put_stream(
+    read: Callable[[int], Awaitable[bytes]],
+    mime: str,
+    filename: str,
+    bucket: str = S3_BUCKET_ATTACHMENTS,
+    part_size: Optional[int] = None,
+) -> Dict[str, Any]:
+    # At most one part is held in memory. Small bodies go up with a single
+    # put_object. Larger ones are sent as a multipart upload to a staging key,
+    # because the content-addressed key is only known once the last part has
+    # been hashed, and are then copied server-side to their final key.
+    part_size = part_size or settings.s3_multipart_part_mb * 1024 * 1024
+    await ensure_bucket(bucket)
+    digest = hashlib.sha256()
+    size = 0
+
+    part = await _read_part(read, part_size)
+    digest.update(part)
+    size += len(part)
+
+    async with _s3() as s3:
+        if len(part) < part_size:
+            key = f"{digest.hexdigest()[:8]}/{filename}"
+            await s3.put_object(Body=part, Bucket=bucket, Key=key, ContentType=mime)
+            return {"key": key, "sha256": digest.hexdigest(), "size": size}
+
+        staging_key = f"uploads/{uuid.uuid4().hex}"
+        upload = await s3.create_multipart_upload(Bucket=bucket, Key=staging_key, ContentType=mime)
+        upload_id = upload["UploadId"]
+        parts = []
+        try:
+            while part:
+                number = len(parts) + 1
+                resp = await s3.upload_part(
+                    Body=part, Bucket=bucket, Key=staging_key, PartNumber=number, UploadId=upload_id
+                )
+                parts.append({"ETag": resp["ETag"], "PartNumber": number})
+                part = await _read_part(read, part_size)
+                digest.update(part)
+                size += len(part)
+            await s3.complete_multipart_upload(
+                Bucket=bucket,
+                Key=staging_key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except BaseException:
+            await s3.abort_multipart_upload(Bucket=bucket, Key=staging_key, UploadId=upload_id)
+            raise
+
+        key = f"{digest.hexdigest()[:8]}/{filename}"
+        await s3.copy_object(
+            Bucket=bucket,
+            Key=key,
+            CopySource={"Bucket": bucket, "Key": staging_key},
+            ContentType=mime,
+            MetadataDirective="REPLACE",
+        )
+        await s3.delete_object(Bucket=bucket, Key=staging_key)
+    return {"key": key, "sha256": digest.hexdigest(), "size": size}
+
+
 async def _presign(key: str, ttl_seconds: int = 600, bucket: str = S3_BUCKET_ATTACHMENTS) -> str:
-    async with _client() as s3:
+    async with _s3() as s3:
         url = await s3.generate_presigned_url(
             "get_object",
             Params={"Bucket": bucket, "Key": key},
@@ -58,7 +181,7 @@ async def _presign(key: str, ttl_seconds: int = 600, bucket: str = S3_BUCKET_ATT
 
 
 async def _head_object(key: str, bucket: str = S3_BUCKET_ATTACHMENTS) -> Optional[Dict[str, Any]]:
-    async with _client() as s3:
+    async with _s3() as s3:
         try:
             resp: Dict[str, Any] = await s3.head_object(Bucket=bucket, Key=key)
             return resp
@@ -69,7 +192,7 @@ async def _head_object(key: str, bucket: str = S3_BUCKET_ATTACHMENTS) -> Optiona
 
 
 async def _get_object(key: str, bucket: str = S3_BUCKET_ATTACHMENTS) -> Dict[str, Any]:
-    async with _client() as s3:
+    async with _s3() as s3:
         resp: Dict[str, Any] = await s3.get_object(Bucket=bucket, Key=key)
         body: bytes = await resp["Body"].read()
         return {
@@ -80,6 +203,36 @@ async def _get_object(key: str, bucket: str = S3_BUCKET_ATTACHMENTS) -> Dict[str
         }
 
 
+async def _fetch_object(key: str, bucket: str = S3_BUCKET_ATTACHMENTS) -> Dict[str, Any]:
+    cache = get_cache()
+    async with _s3() as s3:
+        head: Dict[str, Any] = await s3.head_object(Bucket=bucket, Key=key)
+        meta = {
+            "mime": head.get("ContentType"),
+            "content_length": head.get("ContentLength"),
+            "etag": head.get("ETag"),
+        }
+        path = cache.get(key, head["ETag"])
+        if path is not None:
+            return {"path": path, **meta}
+
+        resp: Dict[str, Any] = await s3.get_object(Bucket=bucket, Key=key)
+        tmp = cache.temp_path()
+        try:
+            with tmp.open("wb") as fh:
+                while chunk := await resp["Body"].read(_DOWNLOAD_CHUNK_BYTES):
+                    fh.write(chunk)
+            path = cache.commit(tmp, key, resp["ETag"])
+        finally:
+            tmp.unlink(missing_ok=True)
+    return {
+        "path": path,
+        "mime": resp.get("ContentType"),
+        "content_length": resp.get("ContentLength"),
+        "etag": resp.get("ETag"),
+    }
+
+
 class AttachmentStorage:
     def __init__(self, bucket: str = S3_BUCKET_ATTACHMENTS) -> None:
         self.bucket = bucket
@@ -90,6 +243,11 @@ class AttachmentStorage:
     async def put(self, data: bytes, mime: str, filename: str) -> str:
         return await _put_bytes(data=data, mime=mime, filename=filename, bucket=self.bucket)
 
+    async def put_stream(
+        self, read: Callable[[int], Awaitable[bytes]], mime: str, filename: str
+    ) -> Dict[str, Any]:
+        return await _put_stream(read=read, mime=mime, filename=filename, bucket=self.bucket)
+
     async def presign(self, key: str, ttl_seconds: int = 600) -> str:
         return await _presign(key=key, ttl_seconds=ttl_seconds, bucket=self.bucket)
 
@@ -99,6 +257,11 @@ class AttachmentStorage:
     async def get(self, key: str) -> Dict[str, Any]:
         return await _get_object(key=key, bucket=self.bucket)
 
+    async def fetch(self, key: str) -> Dict[str, Any]:
+        # Like get(), but the body lands in the worker's disk cache and the
+        # caller receives its path instead of an in-memory copy.
+        return await _fetch_object(key=key, bucket=self.bucket)
+
     async def get_bytes(self, key: str) -> bytes:
         obj = await _get_object(key=key, bucket=self.bucket)
         return obj["data"]
@@ -0,0 +1,46 @@
+"""Indexed message_id column on events
+
+Revision ID: 4b7e2c1d9f3a
+Revises: 9d1e7f9b1a2b
+Create Date: 2026-10-17 10:12:41.502113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql as psql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "4b7e2c1d9f3a"
+down_revision: Union[str, None] = "9d1e7f9b1a2b"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("events", sa.Column("message_id", psql.UUID(as_uuid=True), nullable=True))
+
+    # Backfill from the JSONB payload; skip anything that is not a UUID so a
+    # malformed historical payload cannot abort the migration.
+    op.execute(
+        """
+        UPDATE events
+        SET message_id = (payload->>'message_id')::uuid
+        WHERE message_id IS NULL
+          AND payload->>'message_id' ~* '^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$'
+        """
+    )
+
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS ix_events_message_type_ts
+        ON events (message_id, type, ts DESC)
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_events_message_type_ts")
+    op.drop_column("events", "message_id")
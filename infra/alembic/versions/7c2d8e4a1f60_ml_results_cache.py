@@ -0,0 +1,35 @@
+"""Content-addressed ML result cache
+
+Revision ID: 7c2d8e4a1f60
+Revises: e5a9c3f0b7d2
+Create Date: 2026-10-17 12:20:05.881342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql as psql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "7c2d8e4a1f60"
+down_revision: Union[str, None] = "e5a9c3f0b7d2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "ml_results",
+        sa.Column("hash_sha256", sa.Text(), nullable=False),
+        sa.Column("stage", sa.Text(), nullable=False),          # 'asr','docqa','vqa'
+        sa.Column("model_version", sa.Text(), nullable=False),
+        sa.Column("result", psql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), nullable=False, server_default=sa.text("NOW()")),
+        sa.PrimaryKeyConstraint("hash_sha256", "stage", "model_version"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("ml_results")
@@ -0,0 +1,51 @@
+"""Local Shopify order mirror
+
+Revision ID: a4c8e2f6d913
+Revises: f2c7a9e3b4d1
+Create Date: 2026-10-17 16:02:44.518230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql as psql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a4c8e2f6d913"
+down_revision: Union[str, None] = "f2c7a9e3b4d1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "shopify_orders",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("name", sa.Text(), nullable=False),         # order name without '#', e.g. '1001'
+        sa.Column("order_number", sa.BigInteger(), nullable=True),
+        sa.Column("email", psql.CITEXT(), nullable=True),
+        sa.Column("total_price", sa.Numeric(12, 2), nullable=True),
+        sa.Column("currency", sa.Text(), nullable=True),
+        sa.Column("financial_status", sa.Text(), nullable=True),
+        sa.Column("fulfillment_status", sa.Text(), nullable=True),
+        sa.Column("skus", psql.ARRAY(sa.Text()), nullable=False, server_default=sa.text("'{}'")),
+        sa.Column("line_items", psql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column("tracking_urls", psql.ARRAY(sa.Text()), nullable=False, server_default=sa.text("'{}'")),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column("synced_at", sa.TIMESTAMP(timezone=True), nullable=False, server_default=sa.text("NOW()")),
+    )
+    op.create_index("ix_shopify_orders_name", "shopify_orders", ["name"])
+    op.create_index("ix_shopify_orders_email", "shopify_orders", ["email", "created_at"])
+    op.create_index(
+        "ix_shopify_orders_skus", "shopify_orders", ["skus"], postgresql_using="gin"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_shopify_orders_skus", table_name="shopify_orders")
+    op.drop_index("ix_shopify_orders_email", table_name="shopify_orders")
+    op.drop_index("ix_shopify_orders_name", table_name="shopify_orders")
+    op.drop_table("shopify_orders")
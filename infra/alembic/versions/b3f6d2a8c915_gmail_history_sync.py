@@ -0,0 +1,41 @@
+"""Gmail history checkpoints and gmail_id lookup
+
+Revision ID: b3f6d2a8c915
+Revises: 7c2d8e4a1f60
+Create Date: 2026-10-17 13:05:41.204417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b3f6d2a8c915"
+down_revision: Union[str, None] = "7c2d8e4a1f60"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "mailboxes",
+        sa.Column("address", sa.Text(), primary_key=True),
+        sa.Column("history_id", sa.Text(), nullable=True),
+        sa.Column("updated_at", sa.TIMESTAMP(timezone=True), nullable=False, server_default=sa.text("NOW()")),
+    )
+    # Gmail message ids are known before download; external_id (Message-Id)
+    # only after, so this is what the poller dedupes on.
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS ix_messages_gmail_id
+        ON messages ((source_meta->>'gmail_id'))
+        WHERE source = 'gmail'
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_messages_gmail_id")
+    op.drop_table("mailboxes")
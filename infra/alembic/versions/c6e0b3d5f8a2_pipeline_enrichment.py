@@ -0,0 +1,30 @@
+"""Persist the enrichment stage result in pipeline_state
+
+Revision ID: c6e0b3d5f8a2
+Revises: a4c8e2f6d913
+Create Date: 2026-10-17 17:12:05.663914
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql as psql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c6e0b3d5f8a2"
+down_revision: Union[str, None] = "a4c8e2f6d913"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "pipeline_state",
+        sa.Column("enrichment", psql.JSONB(astext_type=sa.Text()), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("pipeline_state", "enrichment")
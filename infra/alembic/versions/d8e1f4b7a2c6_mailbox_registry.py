@@ -0,0 +1,62 @@
+"""Mailbox registry for sharded Gmail polling
+
+Revision ID: d8e1f4b7a2c6
+Revises: b3f6d2a8c915
+Create Date: 2026-10-17 13:48:12.660913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql as psql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d8e1f4b7a2c6"
+down_revision: Union[str, None] = "b3f6d2a8c915"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("mailboxes") as batch:
+        batch.add_column(sa.Column("credentials_file", sa.Text(), nullable=True))
+        batch.add_column(sa.Column("query", sa.Text(), nullable=True))
+        batch.add_column(sa.Column("label_ids", psql.ARRAY(sa.Text()), nullable=True))
+        batch.add_column(
+            sa.Column("poll_interval_s", sa.Integer(), nullable=False, server_default=sa.text("60"))
+        )
+        batch.add_column(
+            sa.Column("enabled", sa.Boolean(), nullable=False, server_default=sa.text("true"))
+        )
+        batch.add_column(sa.Column("last_polled_at", sa.TIMESTAMP(timezone=True), nullable=True))
+        batch.add_column(
+            sa.Column(
+                "next_poll_at",
+                sa.TIMESTAMP(timezone=True),
+                nullable=False,
+                server_default=sa.text("NOW()"),
+            )
+        )
+    op.create_index(
+        "ix_mailboxes_due",
+        "mailboxes",
+        ["next_poll_at"],
+        postgresql_where=sa.text("enabled"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_mailboxes_due", table_name="mailboxes")
+    with op.batch_alter_table("mailboxes") as batch:
+        for column in (
+            "next_poll_at",
+            "last_polled_at",
+            "enabled",
+            "poll_interval_s",
+            "label_ids",
+            "query",
+            "credentials_file",
+        ):
+            batch.drop_column(column)
@@ -0,0 +1,47 @@
+"""Materialized per-message pipeline state
+
+Revision ID: e5a9c3f0b7d2
+Revises: 4b7e2c1d9f3a
+Create Date: 2026-10-17 11:03:18.240519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql as psql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e5a9c3f0b7d2"
+down_revision: Union[str, None] = "4b7e2c1d9f3a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "pipeline_state",
+        sa.Column("message_id", psql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("fanout", psql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column("asr_attachment_id", psql.UUID(as_uuid=True), nullable=True),
+        sa.Column("asr_text", sa.Text(), nullable=True),
+        sa.Column("asr_confidence", sa.Float(), nullable=True),
+        sa.Column("docqa", psql.JSONB(astext_type=sa.Text()), nullable=True),   # attachment_id -> fields
+        sa.Column("selected_attachment_id", psql.UUID(as_uuid=True), nullable=True),
+        sa.Column("selected_fields", psql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column("classify_label", sa.Text(), nullable=True),
+        sa.Column("classify_scores", psql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column("summary", sa.Text(), nullable=True),
+        sa.Column("normalized", psql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column("vqa", psql.JSONB(astext_type=sa.Text()), nullable=True),     # attachment_id -> result
+        sa.Column("ticket_id", psql.UUID(as_uuid=True), nullable=True),
+        sa.Column("ticket", psql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column("updated_at", sa.TIMESTAMP(timezone=True), nullable=False, server_default=sa.text("NOW()")),
+        sa.ForeignKeyConstraint(["message_id"], ["messages.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["ticket_id"], ["tickets.id"], ondelete="SET NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("pipeline_state")
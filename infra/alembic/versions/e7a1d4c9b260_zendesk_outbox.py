@@ -0,0 +1,56 @@
+"""Transactional outbox for Zendesk ticket creation
+
+Revision ID: e7a1d4c9b260
+Revises: c6e0b3d5f8a2
+Create Date: 2026-10-17 18:20:41.307552
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql as psql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e7a1d4c9b260"
+down_revision: Union[str, None] = "c6e0b3d5f8a2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "zendesk_outbox",
+        sa.Column("id", sa.BigInteger(), sa.Identity(), primary_key=True),
+        # one Zendesk ticket per local ticket; also sent as the Zendesk external_id
+        sa.Column("ticket_id", psql.UUID(as_uuid=True), nullable=False, unique=True),
+        sa.Column("payload", psql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column("status", sa.Text(), nullable=False, server_default="pending"),  # pending|in_flight|done|failed
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("next_attempt_at", sa.TIMESTAMP(timezone=True), nullable=False, server_default=sa.text("NOW()")),
+        sa.Column("job_id", sa.Text(), nullable=True),
+        sa.Column("external_id", sa.Text(), nullable=True),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), nullable=False, server_default=sa.text("NOW()")),
+        sa.Column("updated_at", sa.TIMESTAMP(timezone=True), nullable=False, server_default=sa.text("NOW()")),
+        sa.ForeignKeyConstraint(["ticket_id"], ["tickets.id"], ondelete="CASCADE"),
+    )
+    op.create_index(
+        "ix_zendesk_outbox_due",
+        "zendesk_outbox",
+        ["next_attempt_at"],
+        postgresql_where=sa.text("status = 'pending'"),
+    )
+    op.create_index(
+        "ix_zendesk_outbox_in_flight",
+        "zendesk_outbox",
+        ["updated_at"],
+        postgresql_where=sa.text("status = 'in_flight'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_zendesk_outbox_in_flight", table_name="zendesk_outbox")
+    op.drop_index("ix_zendesk_outbox_due", table_name="zendesk_outbox")
+    op.drop_table("zendesk_outbox")
@@ -0,0 +1,55 @@
+"""Local Stripe charge index and sync cursors
+
+Revision ID: f2c7a9e3b4d1
+Revises: d8e1f4b7a2c6
+Create Date: 2026-10-17 14:31:27.095113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql as psql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f2c7a9e3b4d1"
+down_revision: Union[str, None] = "d8e1f4b7a2c6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "sync_cursors",
+        sa.Column("name", sa.Text(), primary_key=True),       # 'stripe_charges', ...
+        sa.Column("cursor", sa.Text(), nullable=True),
+        sa.Column("updated_at", sa.TIMESTAMP(timezone=True), nullable=False, server_default=sa.text("NOW()")),
+    )
+
+    op.create_table(
+        "stripe_charges",
+        sa.Column("id", sa.Text(), primary_key=True),         # ch_...
+        sa.Column("created", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column("amount_cents", sa.BigInteger(), nullable=False),
+        sa.Column("currency", sa.Text(), nullable=True),
+        sa.Column("status", sa.Text(), nullable=True),
+        sa.Column("email", psql.CITEXT(), nullable=True),
+        sa.Column("order_id", sa.Text(), nullable=True),
+        sa.Column("receipt_url", sa.Text(), nullable=True),
+        sa.Column("card_brand", sa.Text(), nullable=True),
+        sa.Column("risk_score", sa.Integer(), nullable=True),
+        sa.Column("raw", psql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column("synced_at", sa.TIMESTAMP(timezone=True), nullable=False, server_default=sa.text("NOW()")),
+    )
+    op.create_index("ix_stripe_charges_order_id", "stripe_charges", ["order_id", "created"])
+    op.create_index("ix_stripe_charges_email", "stripe_charges", ["email", "created"])
+    op.create_index("ix_stripe_charges_amount", "stripe_charges", ["amount_cents", "created"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_stripe_charges_amount", table_name="stripe_charges")
+    op.drop_index("ix_stripe_charges_email", table_name="stripe_charges")
+    op.drop_index("ix_stripe_charges_order_id", table_name="stripe_charges")
+    op.drop_table("stripe_charges")
+    op.drop_table("sync_cursors")
@@ -0,0 +1,183 @@
+import asyncio
+
+import pytest
+
+from common.cache import TwoTierCache
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+class _FakeRedis:
+    def __init__(self, fail=False):
+        self.kv = {}
+        self.ttls = {}
+        self.fail = fail
+
+    def pipeline(self):
+        redis = self
+
+        class _Pipe:
+            def __init__(self):
+                self.keys = []
+
+            def get(self, key):
+                self.keys.append(("get", key))
+
+            def pttl(self, key):
+                self.keys.append(("pttl", key))
+
+            async def execute(self):
+                if redis.fail:
+                    raise ConnectionError("redis down")
+                return [
+                    redis.kv.get(k) if op == "get" else redis.ttls.get(k, -2)
+                    for op, k in self.keys
+                ]
+
+        return _Pipe()
+
+    async def set(self, key, value, px=None):
+        if self.fail:
+            raise ConnectionError("redis down")
+        self.kv[key] = value
+        self.ttls[key] = px
+
+
+def _cache(redis=None, **kwargs):
+    opts = {"max_entries": 8, "ttl_s": 60, "negative_ttl_s": 5}
+    opts.update(kwargs)
+    cache = TwoTierCache("orders", redis_url="redis://fake" if redis else None, **opts)
+    if redis is not None:
+        cache._get_redis = lambda: None if cache._redis_down_until else redis
+    return cache
+
+
+@pytest.mark.anyio
+async def test_concurrent_misses_share_one_load():
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"order_id": "A1"}
+
+    cache = _cache()
+    results = await asyncio.gather(*(cache.get_or_load("A1", load) for _ in range(10)))
+
+    assert len(calls) == 1
+    assert all(r == {"order_id": "A1"} for r in results)
+    assert await cache.get_or_load("A1", load) == {"order_id": "A1"}
+    assert len(calls) == 1
+
+
+@pytest.mark.anyio
+async def test_negative_results_use_shorter_ttl():
+    redis = _FakeRedis()
+    cache = _cache(redis)
+
+    async def missing():
+        return None
+
+    assert await cache.get_or_load("nope", missing) is None
+    assert redis.ttls["enrich:orders:nope"] == 5000
+
+    async def found():
+        return {"ok": True}
+
+    await cache.get_or_load("yes", found)
+    assert redis.ttls["enrich:orders:yes"] == 60000
+
+
+@pytest.mark.anyio
+async def test_redis_tier_shared_between_processes():
+    redis = _FakeRedis()
+    calls = []
+
+    async def load():
+        calls.append(1)
+        return {"order_id": "B2"}
+
+    first, second = _cache(redis), _cache(redis)
+    await first.get_or_load("B2", load)
+    redis.ttls["enrich:orders:B2"] = 30000
+
+    assert await second.get_or_load("B2", load) == {"order_id": "B2"}
+    assert len(calls) == 1
+
+
+@pytest.mark.anyio
+async def test_local_tier_is_bounded():
+    cache = _cache(max_entries=2)
+
+    async def load():
+        return 1
+
+    for key in ("a", "b", "c"):
+        await cache.get_or_load(key, load)
+
+    assert len(cache._local) == 2
+    assert "a" not in cache._local
+
+
+@pytest.mark.anyio
+async def test_redis_failure_falls_back_to_loader():
+    cache = _cache(_FakeRedis(fail=True))
+
+    async def load():
+        return {"ok": 1}
+
+    assert await cache.get_or_load("k", load) == {"ok": 1}
+    assert cache._redis_down_until > 0
+
+
+@pytest.mark.anyio
+async def test_loader_error_reaches_waiters_and_is_not_cached():
+    attempts = []
+
+    async def boom():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    cache = _cache()
+    results = await asyncio.gather(
+        *(cache.get_or_load("x", boom) for _ in range(3)), return_exceptions=True
+    )
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert len(attempts) == 1
+    assert "x" not in cache._local
+
+
+@pytest.mark.anyio
+async def test_cancelled_leader_does_not_cancel_coalesced_waiters():
+    attempts = []
+
+    async def load():
+        attempts.append(1)
+        await asyncio.sleep(0.05)
+        return {"order_id": "C3"}
+
+    cache = _cache()
+    leader = asyncio.create_task(cache.get_or_load("C3", load))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(cache.get_or_load("C3", load))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    assert await waiter == {"order_id": "C3"}
+    assert leader.cancelled()
+    assert len(attempts) == 2
+
+    # a waiter that is cancelled itself still sees the cancellation
+    slow = asyncio.create_task(cache.get_or_load("D4", load))
+    await asyncio.sleep(0)
+    waiting = asyncio.create_task(cache.get_or_load("D4", load))
+    await asyncio.sleep(0.01)
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    assert await slow == {"order_id": "C3"}
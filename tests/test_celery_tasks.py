@@ -1,4 +1,5 @@
 import pytest
+from pathlib import Path
 from types import SimpleNamespace
 from unittest.mock import AsyncMock, Mock
 from worker.jobs import celery_tasks
@@ -31,19 +32,32 @@ def _make_session(first_value):
 class _FakeRepo:
     def __init__(self):
         self.events = []
-        self.get_last_event_result = None
-        self.get_last_event_calls = []
-        self.event_by_type: dict[str, object] | None = None
+        self.state: dict = {}
+        self.state_reads = 0
+        self.state_updates: list[dict] = []
+        self.ml_results: dict = {}
 
-    async def get_last_event(self, *, message_id: str, type_: str):
-        self.get_last_event_calls.append((message_id, type_))
-        if self.event_by_type is not None and type_ in self.event_by_type:
-            return self.event_by_type[type_]
-        return self.get_last_event_result
+    async def get_pipeline_state(self, message_id: str):
+        self.state_reads += 1
+        return dict(self.state)
+
+    async def update_pipeline_state(self, *, message_id: str, **values):
+        self.state_updates.append(values)
+        self.state.update(values)
+
+    async def merge_pipeline_state(self, *, message_id: str, column: str, key: str, value):
+        self.state_updates.append({column: {key: value}})
+        self.state.setdefault(column, {})[key] = value
 
     async def insert_event(self, *, ticket_id, message_id, type_, payload):
         self.events.append((ticket_id, message_id, type_, payload))
 
+    async def get_ml_result(self, *, content_hash: str, stage: str, model_version: str):
+        return self.ml_results.get((content_hash, stage, model_version))
+
+    async def put_ml_result(self, *, content_hash: str, stage: str, model_version: str, result):
+        self.ml_results.setdefault((content_hash, stage, model_version), result)
+
 
 def test_celery_tasks_registered():
     try:
@@ -61,9 +75,14 @@ def test_celery_tasks_registered():
         "pipeline.normalized",
         "pipeline.ingested",
         "pipeline.docqa_select",
+        "pipeline.enrich",
         "pipeline.create_ticket",
         "pipeline.run",
         "worker.jobs.gmail_poll.poll_gmail",
+        "worker.jobs.gmail_poll.poll_mailbox",
+        "sync.stripe_charges",
+        "sync.shopify_orders",
+        "outbox.zendesk",
     }
 
     missing = expected.difference(app.tasks.keys())
@@ -86,12 +105,13 @@ async def test_asr_task_missing_attachment(monkeypatch):
 
 @pytest.mark.anyio
 async def test_asr_task_skips_non_audio(monkeypatch):
-    row = SimpleNamespace(message_id="m1", s3_key="key1", mime="application/pdf")
+    row = SimpleNamespace(message_id="m1", s3_key="key1", mime="application/pdf", hash_sha256=None)
     session = _make_session(first_value=row)
     monkeypatch.setattr(celery_tasks, "SessionLocal", lambda: session)
     repo = _FakeRepo()
     monkeypatch.setattr(celery_tasks, "MessageRepository", lambda s: repo)
-    storage = SimpleNamespace(get=AsyncMock(return_value={"data": b"pdf", "mime": "application/pdf"}))
+    fetched = {"path": Path("pdf"), "mime": "application/pdf"}
+    storage = SimpleNamespace(fetch=AsyncMock(return_value=fetched))
     monkeypatch.setattr(celery_tasks, "AttachmentStorage", lambda: storage)
     transcribe_mock = Mock()
     monkeypatch.setattr(celery_tasks, "transcribe", transcribe_mock)
@@ -106,34 +126,35 @@ async def test_asr_task_skips_non_audio(monkeypatch):
 
 @pytest.mark.anyio
 async def test_asr_task_dedupes_existing(monkeypatch):
-    row = SimpleNamespace(message_id="m2", s3_key="key2", mime="audio/wav")
+    row = SimpleNamespace(message_id="m2", s3_key="key2", mime="audio/wav", hash_sha256=None)
     session = _make_session(first_value=row)
     monkeypatch.setattr(celery_tasks, "SessionLocal", lambda: session)
     repo = _FakeRepo()
-    repo.get_last_event_result = {"text": "cached"}
+    repo.state = {"asr_text": "cached"}
     monkeypatch.setattr(celery_tasks, "MessageRepository", lambda s: repo)
-    storage = SimpleNamespace(get=AsyncMock())
+    storage = SimpleNamespace(fetch=AsyncMock())
     monkeypatch.setattr(celery_tasks, "AttachmentStorage", lambda: storage)
     transcribe_mock = AsyncMock()
     monkeypatch.setattr(celery_tasks, "transcribe", transcribe_mock)
 
     result = await celery_tasks._asr_task("att-3")
 
-    assert result == {"text": "cached"}
+    assert result == "cached"
     transcribe_mock.assert_not_awaited()
-    storage.get.assert_not_awaited()
+    storage.fetch.assert_not_awaited()
     assert repo.events == []
     session.commit.assert_not_awaited()
 
 
 @pytest.mark.anyio
 async def test_asr_task_happy_path(monkeypatch):
-    row = SimpleNamespace(message_id="m3", s3_key="key3", mime="audio/wav")
+    row = SimpleNamespace(message_id="m3", s3_key="key3", mime="audio/wav", hash_sha256=None)
     session = _make_session(first_value=row)
     monkeypatch.setattr(celery_tasks, "SessionLocal", lambda: session)
     repo = _FakeRepo()
     monkeypatch.setattr(celery_tasks, "MessageRepository", lambda s: repo)
-    storage = SimpleNamespace(get=AsyncMock(return_value={"data": b"wav", "mime": "audio/wav"}))
+    fetched = {"path": Path("wav"), "mime": "audio/wav"}
+    storage = SimpleNamespace(fetch=AsyncMock(return_value=fetched))
     monkeypatch.setattr(celery_tasks, "AttachmentStorage", lambda: storage)
     transcribe_mock = AsyncMock(return_value=SimpleNamespace(text="hi there", confidence=0.9))
     monkeypatch.setattr(celery_tasks, "transcribe", transcribe_mock)
@@ -148,9 +169,63 @@ async def test_asr_task_happy_path(monkeypatch):
     assert message_id == "m3"
     assert type_ == "ASR_DONE"
     assert payload["text"] == "hi there"
+    assert repo.state["asr_text"] == "hi there"
+    assert repo.state["asr_attachment_id"] == "att-4"
+    session.commit.assert_awaited_once()
+
+
+@pytest.mark.anyio
+async def test_asr_task_uses_content_cache(monkeypatch):
+    row = SimpleNamespace(message_id="m4", s3_key="key4", mime="audio/wav", hash_sha256="abc")
+    session = _make_session(first_value=row)
+    monkeypatch.setattr(celery_tasks, "SessionLocal", lambda: session)
+    repo = _FakeRepo()
+    version = celery_tasks.model_version(celery_tasks.asr.MODEL_VERSION)
+    repo.ml_results[("abc", "asr", version)] = {"text": "seen before", "confidence": 0.8}
+    monkeypatch.setattr(celery_tasks, "MessageRepository", lambda s: repo)
+    storage = SimpleNamespace(fetch=AsyncMock())
+    monkeypatch.setattr(celery_tasks, "AttachmentStorage", lambda: storage)
+    transcribe_mock = AsyncMock()
+    monkeypatch.setattr(celery_tasks, "transcribe", transcribe_mock)
+
+    result = await celery_tasks._asr_task("att-5")
+
+    assert result == "seen before"
+    storage.fetch.assert_not_awaited()
+    transcribe_mock.assert_not_awaited()
+    assert repo.events[0][2] == "ASR_DONE"
+    assert repo.state["asr_confidence"] == 0.8
     session.commit.assert_awaited_once()
 
 
+@pytest.mark.anyio
+async def test_docqa_task_stores_result_by_hash(monkeypatch):
+    from common.ml.types import DocExtraction, DocFields
+
+    row = SimpleNamespace(message_id="m5", s3_key="key5", mime="application/pdf", hash_sha256="def")
+    session = _make_session(first_value=row)
+    monkeypatch.setattr(celery_tasks, "SessionLocal", lambda: session)
+    repo = _FakeRepo()
+    monkeypatch.setattr(celery_tasks, "MessageRepository", lambda s: repo)
+    fetched = {"path": Path("pdf"), "mime": "application/pdf"}
+    storage = SimpleNamespace(fetch=AsyncMock(return_value=fetched))
+    monkeypatch.setattr(celery_tasks, "AttachmentStorage", lambda: storage)
+    extraction = DocExtraction(
+        fields=DocFields(
+            order_id="DOC-2", amount=None, currency=None, order_date=None, sku=None
+        ),
+        path="text_layer",
+    )
+    monkeypatch.setattr(celery_tasks, "extract_document", AsyncMock(return_value=extraction))
+
+    await celery_tasks._docqa_task("att-6")
+
+    version = celery_tasks.model_version(celery_tasks.docqa.MODEL_VERSION)
+    cached = repo.ml_results[("def", "docqa", version)]
+    assert cached["fields"]["order_id"] == "DOC-2"
+    assert cached["path"] == "text_layer"
+
+
 @pytest.mark.anyio
 async def test_docqa_task_missing_attachment(monkeypatch):
     session = _make_session(first_value=None)
@@ -167,69 +242,77 @@ async def test_docqa_task_missing_attachment(monkeypatch):
 
 @pytest.mark.anyio
 async def test_docqa_task_skip_non_image(monkeypatch):
-    row = SimpleNamespace(message_id="m1", s3_key="key1", mime="audio/wav")
+    row = SimpleNamespace(message_id="m1", s3_key="key1", mime="audio/wav", hash_sha256=None)
     session = _make_session(first_value=row)
     monkeypatch.setattr(celery_tasks, "SessionLocal", lambda: session)
     repo = _FakeRepo()
     monkeypatch.setattr(celery_tasks, "MessageRepository", lambda s: repo)
-    storage = SimpleNamespace(get=AsyncMock(return_value={"data": b"wav", "mime": "audio/wav"}))
+    fetched = {"path": Path("wav"), "mime": "audio/wav"}
+    storage = SimpleNamespace(fetch=AsyncMock(return_value=fetched))
     monkeypatch.setattr(celery_tasks, "AttachmentStorage", lambda: storage)
-    extract_fields_mock = AsyncMock()
-    monkeypatch.setattr(celery_tasks, "extract_fields", extract_fields_mock)
+    extract_document_mock = AsyncMock()
+    monkeypatch.setattr(celery_tasks, "extract_document", extract_document_mock)
 
     result = await celery_tasks._docqa_task("att-2")
 
     assert result is None
-    extract_fields_mock.assert_not_awaited()
+    extract_document_mock.assert_not_awaited()
     assert repo.events == []
     session.commit.assert_not_awaited()
 
 
 @pytest.mark.anyio
 async def test_docqa_task_dedupes_existing(monkeypatch):
-    row = SimpleNamespace(message_id="m2", s3_key="key2", mime="application/pdf")
+    row = SimpleNamespace(message_id="m2", s3_key="key2", mime="application/pdf", hash_sha256=None)
     session = _make_session(first_value=row)
     monkeypatch.setattr(celery_tasks, "SessionLocal", lambda: session)
     repo = _FakeRepo()
-    repo.get_last_event_result = {"fields": {"order_id": "cached"}}
+    repo.state = {"docqa": {"att-3": {"order_id": "cached"}}}
     monkeypatch.setattr(celery_tasks, "MessageRepository", lambda s: repo)
-    storage = SimpleNamespace(get=AsyncMock())
+    storage = SimpleNamespace(fetch=AsyncMock())
     monkeypatch.setattr(celery_tasks, "AttachmentStorage", lambda: storage)
-    extract_fields_mock = AsyncMock()
-    monkeypatch.setattr(celery_tasks, "extract_fields", extract_fields_mock)
+    extract_document_mock = AsyncMock()
+    monkeypatch.setattr(celery_tasks, "extract_document", extract_document_mock)
 
     result = await celery_tasks._docqa_task("att-3")
 
-    assert result == {"fields": {"order_id": "cached"}}
-    extract_fields_mock.assert_not_awaited()
-    storage.get.assert_not_awaited()
+    assert result["fields"] == {"order_id": "cached"}
+    extract_document_mock.assert_not_awaited()
+    storage.fetch.assert_not_awaited()
     assert repo.events == []
     session.commit.assert_not_awaited()
 
 
 @pytest.mark.anyio
 async def test_docqa_task_happy_path(monkeypatch):
-    row = SimpleNamespace(message_id="m3", s3_key="key3", mime="application/pdf")
+    row = SimpleNamespace(message_id="m3", s3_key="key3", mime="application/pdf", hash_sha256=None)
     session = _make_session(first_value=row)
     monkeypatch.setattr(celery_tasks, "SessionLocal", lambda: session)
     repo = _FakeRepo()
     monkeypatch.setattr(celery_tasks, "MessageRepository", lambda s: repo)
-    storage = SimpleNamespace(get=AsyncMock(return_value={"data": b"pdfdata", "mime": "application/pdf"}))
+    fetched = {"path": Path("pdfdata"), "mime": "application/pdf"}
+    storage = SimpleNamespace(fetch=AsyncMock(return_value=fetched))
     monkeypatch.setattr(celery_tasks, "AttachmentStorage", lambda: storage)
-    extract_fields_mock = AsyncMock(return_value=SimpleNamespace(model_dump=lambda: {"order_id": "DOC-1"}))
-    monkeypatch.setattr(celery_tasks, "extract_fields", extract_fields_mock)
+    extract_document_mock = AsyncMock(
+        return_value=SimpleNamespace(
+            fields=SimpleNamespace(model_dump=lambda: {"order_id": "DOC-1"}), path="text_layer"
+        )
+    )
+    monkeypatch.setattr(celery_tasks, "extract_document", extract_document_mock)
 
     result = await celery_tasks._docqa_task("att-4")
 
     assert result["fields"] == {"order_id": "DOC-1"}
-    extract_fields_mock.assert_awaited_once()
-    storage.get.assert_awaited_once()
+    extract_document_mock.assert_awaited_once()
+    storage.fetch.assert_awaited_once()
     assert len(repo.events) == 1
     ticket_id, message_id, type_, payload = repo.events[0]
     assert ticket_id is None
     assert message_id == "m3"
     assert type_ == "DOCQA_DONE"
     assert payload["fields"] == {"order_id": "DOC-1"}
+    assert payload["path"] == "text_layer"
+    assert repo.state["docqa"] == {"att-4": {"order_id": "DOC-1"}}
     session.commit.assert_awaited_once()
 
 
@@ -256,14 +339,14 @@ async def test_classify_task_dedupes_existing(monkeypatch):
     session = _make_session(first_value=row)
     monkeypatch.setattr(celery_tasks, "SessionLocal", lambda: session)
     repo = _FakeRepo()
-    repo.event_by_type = {"CLASSIFY_DONE": {"label": "cached"}}
+    repo.state = {"classify_label": "cached"}
     monkeypatch.setattr(celery_tasks, "MessageRepository", lambda s: repo)
     classify_mock = AsyncMock()
     monkeypatch.setattr(celery_tasks, "classify", classify_mock)
 
     result = await celery_tasks._classify_task("m1")
 
-    assert result == {"label": "cached"}
+    assert result["label"] == "cached"
     classify_mock.assert_not_awaited()
     assert repo.events == []
     session.commit.assert_not_awaited()
@@ -275,10 +358,7 @@ async def test_classify_task_concat_asr_and_inserts(monkeypatch):
     session = _make_session(first_value=row)
     monkeypatch.setattr(celery_tasks, "SessionLocal", lambda: session)
     repo = _FakeRepo()
-    repo.event_by_type = {
-        "CLASSIFY_DONE": None,
-        "ASR_DONE": {"text": " from asr"},
-    }
+    repo.state = {"asr_text": " from asr"}
     monkeypatch.setattr(celery_tasks, "MessageRepository", lambda s: repo)
     classify_mock = AsyncMock(return_value=SimpleNamespace(label="refund", scores={"refund": 0.9}))
     monkeypatch.setattr(celery_tasks, "classify", classify_mock)
@@ -294,6 +374,8 @@ async def test_classify_task_concat_asr_and_inserts(monkeypatch):
     assert type_ == "CLASSIFY_DONE"
     assert payload["label"] == "refund"
     assert payload["scores"] == {"refund": 0.9}
+    assert repo.state["classify_label"] == "refund"
+    assert repo.state_reads == 1
     session.commit.assert_awaited_once()
 
 
@@ -320,14 +402,14 @@ async def test_normalize_task_dedupes_existing(monkeypatch):
     session = _make_session(first_value=row)
     monkeypatch.setattr(celery_tasks, "SessionLocal", lambda: session)
     repo = _FakeRepo()
-    repo.event_by_type = {"NORMALIZE_DONE": {"normalized": {"order_id": "cached"}}}
+    repo.state = {"normalized": {"order_id": "cached"}}
     monkeypatch.setattr(celery_tasks, "MessageRepository", lambda s: repo)
     merge_mock = Mock()
     monkeypatch.setattr(celery_tasks, "merge_fields", merge_mock)
 
     result = await celery_tasks._normalize_task("m3")
 
-    assert result == {"normalized": {"order_id": "cached"}}
+    assert result["normalized"] == {"order_id": "cached"}
     merge_mock.assert_not_called()
     assert repo.events == []
     session.commit.assert_not_awaited()
@@ -339,9 +421,9 @@ async def test_normalize_task_builds_docfields_and_inserts(monkeypatch):
     session = _make_session(first_value=row)
     monkeypatch.setattr(celery_tasks, "SessionLocal", lambda: session)
     repo = _FakeRepo()
-    repo.event_by_type = {
-        "DOCQA_DONE": {
-            "fields": {
+    repo.state = {
+        "docqa": {
+            "a1": {
                 "order_id": "DOCQA-1",
                 "amount": None,
                 "currency": None,
@@ -350,7 +432,7 @@ async def test_normalize_task_builds_docfields_and_inserts(monkeypatch):
                 "confidence": {},
             }
         },
-        "ASR_DONE": {"text": "from asr"},
+        "asr_text": "from asr",
     }
     monkeypatch.setattr(celery_tasks, "MessageRepository", lambda s: repo)
     merged = SimpleNamespace(model_dump=lambda: {"order_id": "FINAL"})
@@ -372,4 +454,103 @@ async def test_normalize_task_builds_docfields_and_inserts(monkeypatch):
     assert message_id == "m4"
     assert type_ == "NORMALIZE_DONE"
     assert payload["normalized"] == {"order_id": "FINAL"}
+    assert repo.state["normalized"] == {"order_id": "FINAL"}
     session.commit.assert_awaited_once()
+
+
+def test_build_pipeline_orders_stages_by_dependency():
+    from worker.celery_app import build_pipeline
+
+    dispatched = [
+        {"task": "asr", "attachment_id": "a1", "task_id": "m1:asr:a1"},
+        {"task": "docqa", "attachment_id": "a2", "task_id": "m1:docqa:a2"},
+    ]
+    workflow = build_pipeline("m1", dispatched)
+
+    header = list(workflow.tasks)
+    select, finish = workflow.body.tasks
+    classify, normalize_then_enrich = finish.tasks
+    assert [t.task for t in header] == ["pipeline.asr", "pipeline.docqa", "pipeline.summarize"]
+    assert [t.options["task_id"] for t in header][:2] == ["m1:asr:a1", "m1:docqa:a2"]
+    assert select.task == "pipeline.docqa_select"
+    assert classify.task == "pipeline.zeroshot"
+    assert [t.task for t in normalize_then_enrich.tasks] == [
+        "pipeline.normalized",
+        "pipeline.enrich",
+    ]
+    assert finish.body.task == "pipeline.create_ticket"
+    stages = [*header, select, classify, *normalize_then_enrich.tasks, finish.body]
+    assert all(t.immutable for t in stages)
+    assert "countdown" not in finish.body.options
+
+
+@pytest.mark.anyio
+async def test_fanout_starts_pipeline_dag(monkeypatch):
+    from worker import celery_app
+
+    session = _make_session(first_value=None)
+    monkeypatch.setattr(celery_tasks, "SessionLocal", lambda: session)
+    repo = _FakeRepo()
+    monkeypatch.setattr(celery_tasks, "MessageRepository", lambda s: repo)
+    monkeypatch.setattr(
+        celery_tasks,
+        "_get_attachments_for_fanout",
+        AsyncMock(
+            return_value=[
+                {"id": "a1", "mime": "audio/ogg", "s3_key": "k1"},
+                {"id": "a2", "mime": "text/plain", "s3_key": "k2"},
+            ]
+        ),
+    )
+    workflow = Mock()
+    build_mock = Mock(return_value=workflow)
+    monkeypatch.setattr(celery_app, "build_pipeline", build_mock)
+
+    result = await celery_tasks._fanout_ingested("m5")
+
+    build_mock.assert_called_once_with(
+        "m5", [{"task": "asr", "attachment_id": "a1", "task_id": "m5:asr:a1"}]
+    )
+    workflow.apply_async.assert_called_once_with()
+    assert result["dispatched"][0]["task"] == "asr"
+    assert repo.events[0][2] == "INGESTED_FANOUT"
+    assert repo.state["fanout"] == result["dispatched"]
+
+
+@pytest.mark.anyio
+async def test_choose_best_docqa_prefers_order_id(monkeypatch):
+    session = _make_session(first_value=None)
+    monkeypatch.setattr(celery_tasks, "SessionLocal", lambda: session)
+    repo = _FakeRepo()
+    repo.state = {
+        "docqa": {
+            "a1": {"order_id": None, "confidence": {"amount": 0.9}},
+            "a2": {"order_id": "X1", "confidence": {"order_id": 0.4}},
+        }
+    }
+    monkeypatch.setattr(celery_tasks, "MessageRepository", lambda s: repo)
+
+    result = await celery_tasks._choose_best_docqa("m6")
+
+    assert result["attachment_id"] == "a2"
+    assert repo.events[0][2] == "DOCQA_SELECTED"
+    assert repo.state["selected_fields"]["order_id"] == "X1"
+    session.commit.assert_awaited_once()
+
+
+@pytest.mark.anyio
+async def test_enrich_task_records_result_once(monkeypatch):
+    session = _make_session(first_value=None)
+    monkeypatch.setattr(celery_tasks, "SessionLocal", lambda: session)
+    repo = _FakeRepo()
+    monkeypatch.setattr(celery_tasks, "MessageRepository", lambda s: repo)
+    run = AsyncMock(return_value={"source": {"shopify": "hit"}, "attachment_urls": []})
+    monkeypatch.setattr(celery_tasks, "_run_enrichment", run)
+
+    first = await celery_tasks._enrich_task("m7")
+    second = await celery_tasks._enrich_task("m7")
+
+    assert first == second
+    run.assert_awaited_once()
+    assert repo.events[0][2] == "ENRICHED"
+    assert repo.state["enrichment"]["source"]["shopify"] == "hit"
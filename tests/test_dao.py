@@ -0,0 +1,132 @@
+import json
+
+import pytest
+
+from common.db.dao import MessageRepository
+
+
+class _RecordingSession:
+    def __init__(self):
+        self.calls = []
+
+    async def execute(self, stmt, params=None):
+        self.calls.append((str(stmt), params))
+
+
+@pytest.mark.anyio
+async def test_update_pipeline_state_upserts_typed_and_json_columns():
+    session = _RecordingSession()
+    repo = MessageRepository(session)
+
+    await repo.update_pipeline_state(
+        message_id="m1", classify_label="refund", classify_scores={"refund": 0.9}
+    )
+
+    sql, params = session.calls[0]
+    assert "on conflict (message_id)" in sql
+    assert "cast(:classify_scores as jsonb)" in sql
+    assert "classify_label = excluded.classify_label" in sql
+    assert params["classify_label"] == "refund"
+    assert json.loads(params["classify_scores"]) == {"refund": 0.9}
+
+
+@pytest.mark.anyio
+async def test_update_pipeline_state_rejects_unknown_columns():
+    repo = MessageRepository(_RecordingSession())
+
+    with pytest.raises(ValueError):
+        await repo.update_pipeline_state(message_id="m1", **{"label; drop table": 1})
+
+
+@pytest.mark.anyio
+async def test_merge_pipeline_state_only_for_map_columns():
+    session = _RecordingSession()
+    repo = MessageRepository(session)
+
+    await repo.merge_pipeline_state(message_id="m1", column="docqa", key="a1", value={"sku": None})
+
+    sql, params = session.calls[0]
+    assert "coalesce(pipeline_state.docqa, '{}'::jsonb)" in sql
+    assert params["key"] == "a1"
+    with pytest.raises(ValueError):
+        await repo.merge_pipeline_state(message_id="m1", column="summary", key="a1", value=1)
+
+
+@pytest.mark.anyio
+async def test_put_ml_result_is_insert_only():
+    session = _RecordingSession()
+    repo = MessageRepository(session)
+
+    await repo.put_ml_result(
+        content_hash="abc", stage="docqa", model_version="m@1", result={"amount": 1}
+    )
+
+    sql, params = session.calls[0]
+    assert "on conflict (hash_sha256, stage, model_version) do nothing" in sql
+    assert params["hash"] == "abc"
+    assert json.loads(params["result"]) == {"amount": 1}
+
+
+@pytest.mark.anyio
+async def test_insert_attachments_single_statement_dedupes_by_hash():
+    from types import SimpleNamespace
+
+    class _Session(_RecordingSession):
+        async def execute(self, stmt, params=None):
+            await super().execute(stmt, params)
+            rows = [
+                SimpleNamespace(id="id-a", s3_key="k1", hash_sha256="h1"),
+                SimpleNamespace(id="id-b", s3_key="k3", hash_sha256=None),
+            ]
+            return SimpleNamespace(fetchall=lambda: rows)
+
+    session = _Session()
+    repo = MessageRepository(session)
+    atts = [
+        {
+            "s3_key": "k1",
+            "mime": "image/png",
+            "filename": "a.png",
+            "size_bytes": 1,
+            "hash_sha256": "h1",
+        },
+        {
+            "s3_key": "k2",
+            "mime": "image/png",
+            "filename": "b.png",
+            "size_bytes": 1,
+            "hash_sha256": "h1",
+        },
+        {"s3_key": "k3", "mime": "text/plain", "filename": "c.txt", "size_bytes": 1},
+    ]
+
+    ids = await repo.insert_attachments("m1", atts)
+
+    assert ids == ["id-a", "id-a", "id-b"]
+    assert len(session.calls) == 1
+    sql, params = session.calls[0]
+    assert ":s3_key_1" in sql and ":s3_key_2" not in sql
+    assert params["s3_key_1"] == "k3"
+
+
+@pytest.mark.anyio
+async def test_find_shopify_order_ands_given_filters():
+    class _Session(_RecordingSession):
+        async def execute(self, stmt, params=None):
+            await super().execute(stmt, params)
+            from types import SimpleNamespace
+
+            row = {"id": 1, "line_items": '[{"sku": "MUG-01"}]', "tracking_urls": []}
+            return SimpleNamespace(mappings=lambda: SimpleNamespace(first=lambda: row))
+
+    session = _Session()
+    repo = MessageRepository(session)
+
+    order = await repo.find_shopify_order(email="jane@example.com", sku="MUG-01")
+
+    sql, params = session.calls[0]
+    assert "email = :email and skus @> array[cast(:sku as text)]" in sql
+    assert "name = :order_id" not in sql
+    assert params == {"email": "jane@example.com", "sku": "MUG-01"}
+    assert order["line_items"] == [{"sku": "MUG-01"}]
+    assert await repo.find_shopify_order() is None
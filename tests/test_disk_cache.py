@@ -0,0 +1,45 @@
+import os
+
+from common.storage.disk_cache import DiskCache
+
+
+def test_hit_requires_same_etag(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=1024)
+    path = cache.put("a/file.pdf", '"etag-1"', b"hello")
+
+    assert path.read_bytes() == b"hello"
+    assert cache.get("a/file.pdf", "etag-1") == path
+    assert cache.get("a/file.pdf", "etag-2") is None
+    assert cache.get("b/file.pdf", "etag-1") is None
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=10)
+    old = cache.put("old", "e", b"aaaa")
+    recent = cache.put("recent", "e", b"bbbb")
+    os.utime(old, (1, 1))
+    os.utime(recent, (2, 2))
+    cache.get("old", "e")  # touch: "recent" is now the oldest
+
+    newest = cache.put("newest", "e", b"cccc")
+
+    assert newest.exists()
+    assert old.exists()
+    assert not recent.exists()
+    assert cache.get("recent", "e") is None
+
+
+def test_keeps_entry_larger_than_budget(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=2)
+    path = cache.put("big", "e", b"too large")
+
+    assert path.exists()
+
+
+def test_size_limit_holds_across_processes_sharing_the_directory(tmp_path):
+    children = [DiskCache(tmp_path, max_bytes=10_000, writers=2) for _ in range(2)]
+
+    for i in range(40):
+        children[i % 2].put(f"key-{i}", "e", b"x" * 1000)
+        on_disk = sum(f.stat().st_size for f in tmp_path.glob("*/*"))
+        assert on_disk <= 10_000
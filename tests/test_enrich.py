@@ -0,0 +1,127 @@
+import asyncio
+import time
+
+import pytest
+
+from common import enrich as enrich_mod
+from common.clients import guard, ratelimit
+
+
+@pytest.fixture(autouse=True)
+def _fresh_breakers(monkeypatch):
+    monkeypatch.setattr(guard, "_breakers", {})
+
+
+def test_breaker_opens_then_lets_one_trial_through(monkeypatch):
+    cb = guard.CircuitBreaker("dep", failure_threshold=2, reset_after_s=10)
+    clock = [100.0]
+    monkeypatch.setattr(guard.time, "monotonic", lambda: clock[0])
+
+    cb.record_failure()
+    assert cb.allow()
+    cb.record_failure()
+    assert cb.is_open and not cb.allow()
+
+    clock[0] += 10
+    assert cb.allow()
+    assert not cb.allow()  # only one trial while half-open
+    cb.record_failure()
+    assert not cb.allow()
+
+    clock[0] += 10
+    assert cb.allow()
+    cb.record_success()
+    assert not cb.is_open and cb.allow()
+
+
+def test_guarded_reports_timeout_and_short_circuits(monkeypatch):
+    monkeypatch.setattr(guard.settings, "breaker_failure_threshold", 1)
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    async def run():
+        first = await guard.guarded("slow", slow, 0.01)
+        second = await guard.guarded("slow", slow, 0.01)
+        return first, second
+
+    (outcome, value, error), (outcome2, _, _) = asyncio.run(run())
+    assert (outcome, value) == ("timeout", None)
+    assert "timed out" in error
+    assert outcome2 == "open"
+
+
+def test_throttled_calls_do_not_count_against_the_breaker(monkeypatch):
+    monkeypatch.setattr(guard.settings, "breaker_failure_threshold", 1)
+    waits = []
+
+    async def throttled_order(order_id, max_wait_s=None):
+        waits.append(max_wait_s)
+        raise ratelimit.Throttled("shopify", 4.2)
+
+    async def no_charge(**kwargs):
+        return None
+
+    monkeypatch.setattr(enrich_mod.shopify, "get_order", throttled_order)
+    monkeypatch.setattr(enrich_mod.stripe, "find_charge", no_charge)
+    monkeypatch.setattr(enrich_mod.settings, "enrich_shopify_timeout_s", 1.5)
+    monkeypatch.setattr(enrich_mod.settings, "enrich_deadline_s", 0.8)
+
+    async def run():
+        kwargs = dict(order_id="A1", email=None, amount=None, sku=None, s3_keys=[])
+        return await enrich_mod.enrich(**kwargs), await enrich_mod.enrich(**kwargs)
+
+    first, second = asyncio.run(run())
+
+    assert first["source"]["shopify"] == second["source"]["shopify"] == "throttled"
+    assert "4.20s" in first["errors"]["shopify"]
+    # the limiter may only wait as long as the lookup itself is allowed to take
+    assert waits == [0.8, 0.8]
+    assert not guard.breaker("shopify").is_open
+
+
+def test_enrich_runs_lookups_concurrently_within_deadline(monkeypatch):
+    async def slow_order(order_id, max_wait_s=None):
+        await asyncio.sleep(1)
+
+    async def charge(**kwargs):
+        await asyncio.sleep(0.05)
+        return {"charge_id": "ch_1", "amount": kwargs["amount"]}
+
+    async def presign(keys):
+        await asyncio.sleep(0.05)
+        return [f"https://s3/{k}" for k in keys]
+
+    monkeypatch.setattr(enrich_mod.shopify, "get_order", slow_order)
+    monkeypatch.setattr(enrich_mod.stripe, "find_charge", charge)
+    monkeypatch.setattr(enrich_mod, "presign_all", presign)
+    monkeypatch.setattr(enrich_mod.settings, "enrich_deadline_s", 0.2)
+
+    start = time.perf_counter()
+    result = asyncio.run(
+        enrich_mod.enrich(
+            order_id="A1", email="a@b.c", amount="$1,049.50", sku=None, s3_keys=["k1", "k2"]
+        )
+    )
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.5
+    assert result["source"] == {"shopify": "timeout", "stripe": "hit", "s3": "hit"}
+    assert result["shopify"] is None
+    assert result["stripe"]["amount"] == 1049.5
+    assert result["attachment_urls"] == ["https://s3/k1", "https://s3/k2"]
+    assert result["errors"]["stripe"] is None
+
+
+def test_enrich_skips_lookups_without_inputs(monkeypatch):
+    async def no_charge(**kwargs):
+        return None
+
+    monkeypatch.setattr(enrich_mod.stripe, "find_charge", no_charge)
+
+    result = asyncio.run(
+        enrich_mod.enrich(order_id=None, email=None, amount=None, sku=None, s3_keys=[])
+    )
+
+    assert result["source"] == {"shopify": "skipped", "stripe": "miss", "s3": "skipped"}
+    assert result["attachment_urls"] == []
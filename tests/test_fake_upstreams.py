@@ -0,0 +1,93 @@
+import asyncio
+
+import httpx
+import pytest
+
+from benchmarks.fakes import Faults, FakeUpstreams, build_app
+from common.clients import http, ratelimit, shopify, stripe, zendesk
+
+BASE = "http://fakes.test"
+
+
+@pytest.fixture
+def fakes(monkeypatch):
+    upstreams = FakeUpstreams(orders=30, job_delay_ms=0)
+    app = build_app(upstreams)
+    monkeypatch.setattr(
+        http,
+        "_new_client",
+        lambda: httpx.AsyncClient(transport=httpx.ASGITransport(app=app)),
+    )
+    monkeypatch.setattr(ratelimit.settings, "ratelimit_enabled", False)
+    for name, value in {
+        "SHOPIFY_SANDBOX": "0",
+        "SHOPIFY_BASE_URL": BASE,
+        "SHOPIFY_DOMAIN": "fake",
+        "SHOPIFY_API_KEY": "k",
+        "SHOPIFY_PASSWORD": "p",
+        "STRIPE_SANDBOX": "0",
+        "STRIPE_API_BASE": f"{BASE}/v1",
+        "STRIPE_API_KEY": "sk_fake",
+        "ZENDESK_SANDBOX": "0",
+        "ZENDESK_BASE_URL": f"{BASE}/api/v2",
+        "ZENDESK_EMAIL": "bot@example.com",
+        "ZENDESK_API_TOKEN": "t",
+    }.items():
+        monkeypatch.setenv(name, value)
+    return upstreams
+
+
+async def _collect(pages):
+    return [item async for page in pages for item in page]
+
+
+def test_faults_parse_spec():
+    faults = Faults.parse("latency_ms=80, sigma=0.5,rps=2,burst=40")
+
+    assert (faults.latency_ms, faults.sigma, faults.rps, faults.burst) == (80, 0.5, 2, 40)
+    with pytest.raises(ValueError):
+        Faults.parse("latncy_ms=1")
+
+
+def test_clients_page_through_fake_orders_and_charges(fakes):
+    async def run():
+        orders = await _collect(shopify.list_orders("2000-01-01T00:00:00+00:00", page_size=7))
+        charges = await _collect(stripe.list_charges(0, page_size=7))
+        return orders, charges
+
+    orders, charges = asyncio.run(run())
+
+    assert [o["id"] for o in orders] == [o["id"] for o in fakes.orders]
+    assert len({c["id"] for c in charges}) == len(fakes.charges) == 30
+    assert fakes.stats["shopify:200"] == 5 and fakes.stats["stripe:200"] == 5
+
+
+def test_zendesk_bulk_create_and_job_status(fakes):
+    async def run():
+        job = await zendesk.create_many(
+            [{"subject": "a", "comment": {"body": "x"}, "external_id": "t1"}, {"subject": "b"}]
+        )
+        statuses = await zendesk.job_statuses([job["id"]])
+        found = await zendesk.find_by_external_id("t1")
+        return job, statuses, found
+
+    job, statuses, found = asyncio.run(run())
+
+    assert job["status"] == "queued"
+    assert statuses[0]["status"] == "completed"
+    assert statuses[0]["results"][1]["error"] == "InvalidValue"
+    assert found == str(statuses[0]["results"][0]["id"])
+
+
+def test_server_side_rate_limit_surfaces_as_429(fakes):
+    fakes.set_faults("zendesk", Faults(rps=0.001, burst=1, retry_after_s=7))
+
+    async def run():
+        await zendesk.job_statuses(["job1"])
+        await zendesk.job_statuses(["job1"])
+
+    with pytest.raises(zendesk.RateLimited) as exc:
+        asyncio.run(run())
+
+    assert exc.value.retry_after >= 7
+    assert fakes.stats["zendesk:429"] == 1
@@ -11,3 +11,193 @@ def test_parse_email_ignores_inline_images():
     assert any(n.endswith(".pdf") for n in names)
     assert any(m in mimes for m in ("audio/ogg", "audio/mpeg", "audio/mp4"))
     assert not any(m.startswith("image/") for m in mimes)
+
+
+class _FakeGmail:
+    user_id = "me"
+
+    def __init__(self, history=None, listed=None, history_error=None):
+        self.history = history
+        self.listed = listed or []
+        self.history_error = history_error
+        self.history_calls = []
+        self.raw_batches = []
+
+    def list_history(self, start, label_id=None):
+        self.history_calls.append(start)
+        if self.history_error:
+            raise self.history_error
+        return self.history
+
+    def get_history_id(self):
+        return "900"
+
+    def list_message_ids(self, query, max_results):
+        return self.listed
+
+    def get_raw_messages(self, ids, batch_size):
+        self.raw_batches.append(list(ids))
+        return {mid: f"raw-{mid}".encode() for mid in ids}
+
+
+class _PollRepo:
+    def __init__(self, checkpoint=None, known=()):
+        self.checkpoint = checkpoint
+        self.known = set(known)
+        self.saved = None
+
+    async def get_mailbox(self, address):
+        return {"address": address, "history_id": self.checkpoint, "query": None}
+
+    async def known_gmail_ids(self, ids):
+        return self.known.intersection(ids)
+
+    async def set_mailbox_history_id(self, address, history_id):
+        self.saved = history_id
+
+    async def mark_mailbox_polled(self, address):
+        self.polled = address
+
+
+class _PollSession:
+    committed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def commit(self):
+        self.committed = True
+
+
+def _run_poll(monkeypatch, client, repo):
+    import asyncio
+
+    from worker.jobs import gmail_poll
+
+    processed = []
+
+    async def fake_process(mid, raw):
+        assert raw == f"raw-{mid}".encode()
+        processed.append(mid)
+
+    session = _PollSession()
+    monkeypatch.setattr(gmail_poll, "_load_gmail_creds", lambda path=None: None)
+    monkeypatch.setattr(gmail_poll, "GmailClient", lambda creds: client)
+    monkeypatch.setattr(gmail_poll, "SessionLocal", lambda: session)
+    monkeypatch.setattr(gmail_poll, "MessageRepository", lambda s: repo)
+    monkeypatch.setattr(gmail_poll, "_process_message", fake_process)
+    asyncio.run(gmail_poll._poll_gmail_async("support@example.com"))
+    return processed, session
+
+
+def test_poll_uses_history_checkpoint_and_skips_known(monkeypatch):
+    client = _FakeGmail(history=(["g1", "g2", "g3"], "120"))
+    repo = _PollRepo(checkpoint="100", known={"g2"})
+
+    processed, session = _run_poll(monkeypatch, client, repo)
+
+    assert client.history_calls == ["100"]
+    assert client.raw_batches == [["g1", "g3"]]
+    assert sorted(processed) == ["g1", "g3"]
+    assert repo.saved == "120"
+    assert repo.polled == "support@example.com"
+    assert session.committed
+
+
+def test_poll_fetches_raw_in_batches(monkeypatch):
+    from worker.jobs import gmail_poll
+
+    monkeypatch.setattr(gmail_poll.settings, "gmail_batch_size", 2)
+    client = _FakeGmail(history=(["a", "b", "c"], "7"))
+
+    processed, _ = _run_poll(monkeypatch, client, _PollRepo(checkpoint="1"))
+
+    assert client.raw_batches == [["a", "b"], ["c"]]
+    assert sorted(processed) == ["a", "b", "c"]
+
+
+def test_parse_headers_from_raw():
+    from common.ingest.email_parser import parse_headers
+
+    raw = Path("tests/data/sample_multipart.eml").read_bytes()
+    headers = parse_headers(raw)
+
+    assert set(headers) == {"message_id", "subject", "from", "date"}
+    assert headers["message_id"] == "<sample-message-id@example.com>"
+    assert headers["subject"] == "Test email with attachments"
+
+
+def test_poll_falls_back_to_list_when_history_expired(monkeypatch):
+    from googleapiclient.errors import HttpError
+    from types import SimpleNamespace
+
+    expired = HttpError(SimpleNamespace(status=404, reason="Not Found"), b"")
+    client = _FakeGmail(listed=["g9"], history_error=expired)
+    repo = _PollRepo(checkpoint="5")
+
+    processed, _ = _run_poll(monkeypatch, client, repo)
+
+    assert processed == ["g9"]
+    assert repo.saved == "900"
+
+
+class _FakeLock:
+    held: set = set()
+
+    def __init__(self, name):
+        self.name = name
+
+    async def acquire(self, blocking=True):
+        if self.name in self.held:
+            return False
+        self.held.add(self.name)
+        return True
+
+    async def release(self):
+        self.held.discard(self.name)
+
+
+class _FakeRedis:
+    def lock(self, name, timeout):
+        return _FakeLock(name)
+
+    async def aclose(self):
+        pass
+
+
+def test_mailbox_lock_prevents_overlapping_polls(monkeypatch):
+    import asyncio
+
+    from worker.jobs import gmail_poll
+
+    monkeypatch.setattr(gmail_poll.aioredis, "from_url", lambda url: _FakeRedis())
+    polled = []
+
+    async def fake_poll(address, newest_n=25):
+        polled.append(address)
+        # a second worker tries the same mailbox while this poll is running
+        assert await gmail_poll._poll_mailbox_locked(address) is False
+
+    monkeypatch.setattr(gmail_poll, "_poll_gmail_async", fake_poll)
+
+    assert asyncio.run(gmail_poll._poll_mailbox_locked("a@example.com")) is True
+    assert polled == ["a@example.com"]
+    assert not _FakeLock.held
+
+
+def test_tick_dispatches_one_task_per_due_mailbox(monkeypatch):
+    from worker.jobs import gmail_poll
+
+    async def due():
+        return ["a@example.com", "b@example.com"]
+
+    sent = []
+    monkeypatch.setattr(gmail_poll, "_claim_due_mailboxes", due)
+    monkeypatch.setattr(gmail_poll.poll_mailbox, "apply_async", lambda args: sent.append(args))
+
+    gmail_poll.poll_gmail.run(10)
+
+    assert sent == [["a@example.com", 10], ["b@example.com", 10]]
@@ -0,0 +1,66 @@
+import asyncio
+
+import httpx
+
+from common.clients import http, zendesk
+
+
+def _mock_client_factory(handler, created):
+    def factory():
+        c = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        created.append(c)
+        return c
+
+    return factory
+
+
+def test_shared_client_reused_across_calls(monkeypatch):
+    created = []
+    monkeypatch.setattr(
+        http, "_new_client", _mock_client_factory(lambda r: httpx.Response(200), created)
+    )
+
+    async def _run():
+        await http.open_clients()
+        try:
+            async with http.client("zendesk") as a:
+                pass
+            async with http.client("zendesk") as b:
+                pass
+            async with http.client("shopify") as c:
+                pass
+            return a, b, c
+        finally:
+            await http.close_clients()
+
+    a, b, c = asyncio.run(_run())
+
+    assert a is b
+    assert a is not c
+    assert len(created) == len(http.UPSTREAMS)
+
+
+def test_zendesk_create_ticket_uses_pooled_client(monkeypatch):
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        return httpx.Response(201, json={"ticket": {"id": 42}})
+
+    monkeypatch.setattr(http, "_new_client", _mock_client_factory(handler, []))
+    monkeypatch.setenv("ZENDESK_SANDBOX", "0")
+    monkeypatch.setenv("ZENDESK_SUBDOMAIN", "acme")
+    monkeypatch.setenv("ZENDESK_EMAIL", "bot@acme.test")
+    monkeypatch.setenv("ZENDESK_API_TOKEN", "tok")
+    monkeypatch.setattr(zendesk.ratelimit.settings, "ratelimit_enabled", False)
+
+    async def _run():
+        await http.open_clients()
+        try:
+            return await zendesk.create_ticket({"subject": "refund"})
+        finally:
+            await http.close_clients()
+
+    assert asyncio.run(_run()) == "42"
+    assert seen[0].url == "https://acme.zendesk.com/api/v2/tickets.json"
+    assert seen[0].headers["authorization"].startswith("Basic ")
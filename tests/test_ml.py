@@ -30,3 +30,55 @@ def test_asr_sync_stub(monkeypatch):
     t = transcribe_sync(b"audio-bytes", "audio/ogg")
     assert "refund" in t.text.lower()
     assert t.confidence == pytest.approx(0.97)
+
+
+def test_docqa_engine_ocrs_once_and_batches_questions(monkeypatch):
+    from PIL import Image
+
+    from common.ml import docqa
+
+    ocr_calls = []
+
+    def fake_tesseract(image, lang, tesseract_config):
+        ocr_calls.append(image.size)
+        return ["Order", "A-77", "Total", "$59.99"], [[0, 0, 10, 10]] * 4
+
+    qa_calls = []
+
+    def fake_qa(inputs, batch_size):
+        qa_calls.append((len(inputs), batch_size))
+        return [[{"answer": f"ans-{i}", "score": 0.9}] for i, _ in enumerate(inputs)]
+
+    monkeypatch.setattr(docqa, "apply_tesseract", fake_tesseract)
+    engine = docqa.DocQAEngine(qa=fake_qa)
+    page = Image.new("RGB", (20, 20), "white")
+
+    first = engine.answer(page)
+    engine.answer(page.copy())
+
+    assert len(ocr_calls) == 1
+    assert qa_calls == [(5, 5), (5, 5)]
+    assert set(first) == set(docqa.QUESTIONS)
+
+
+def test_docqa_fields_from_answers_fills_amount_currency_date():
+    from datetime import date
+    from decimal import Decimal
+
+    from common.ml.docqa import fields_from_answers
+
+    fields = fields_from_answers(
+        {
+            "order_id": {"answer": "A10023", "score": 0.95},
+            "amount": {"answer": "€1,234.56", "score": 0.8},
+            "currency": {"answer": "", "score": 0.1},
+            "order_date": {"answer": "2025-03-01", "score": 0.7},
+        }
+    )
+
+    assert fields.order_id == "A10023"
+    assert fields.amount == Decimal("1234.56")
+    assert fields.currency == "EUR"
+    assert fields.order_date == date(2025, 3, 1)
+    assert fields.sku is None
+    assert fields.confidence["amount"] == pytest.approx(0.8)
@@ -0,0 +1,132 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks import ml_backends
+from common.ml import backends
+
+
+@pytest.fixture(autouse=True)
+def _no_backend_env(monkeypatch):
+    for key in ("ML_BACKEND", "ML_BACKEND_ZEROSHOT", "ML_BACKEND_DOCQA"):
+        monkeypatch.delenv(key, raising=False)
+
+
+def test_backend_defaults_to_torch_and_is_overridable_per_model(monkeypatch):
+    assert backends.backend("zeroshot") == "torch"
+    monkeypatch.setenv("ML_BACKEND", "onnx-int8")
+    monkeypatch.setenv("ML_BACKEND_DOCQA", "Torch-INT8")
+    assert backends.backend("zeroshot") == "onnx-int8"
+    assert backends.backend("docqa") == "torch-int8"
+
+    monkeypatch.setenv("ML_BACKEND_ZEROSHOT", "tensorrt")
+    with pytest.raises(ValueError, match="tensorrt"):
+        backends.backend("zeroshot")
+
+
+def test_cached_results_are_kept_apart_per_backend(monkeypatch):
+    assert backends.versioned("m@2", "docqa") == "m@2"
+    monkeypatch.setenv("ML_BACKEND_DOCQA", "torch-int8")
+    assert backends.versioned("m@2", "docqa") == "m@2+torch-int8"
+
+
+def _fake_pipeline(calls, model=None):
+    def pipeline(task, **kwargs):
+        calls.append((task, kwargs))
+        return SimpleNamespace(model=kwargs["model"] if model is None else model)
+
+    return pipeline
+
+
+def test_torch_int8_quantizes_linear_layers(monkeypatch):
+    torch = pytest.importorskip("torch")
+    model = torch.nn.Sequential(torch.nn.Linear(8, 8), torch.nn.ReLU(), torch.nn.Linear(8, 2))
+    calls = []
+    monkeypatch.setattr(backends, "_pipeline", _fake_pipeline(calls, model))
+    monkeypatch.setenv("ML_BACKEND_ZEROSHOT", "torch-int8")
+
+    pipe = backends.build_pipeline("zeroshot", "zero-shot-classification", "m", device="cpu")
+
+    assert calls == [("zero-shot-classification", {"model": "m", "device": "cpu"})]
+    assert not any(type(m) is torch.nn.Linear for m in pipe.model.modules())
+    assert pipe.model(torch.randn(1, 8)).shape == (1, 2)
+
+
+def test_onnx_runs_the_exported_model_with_its_preprocessors(monkeypatch, tmp_path):
+    export = tmp_path / "org--m" / "int8"
+    export.mkdir(parents=True)
+    (export / "config.json").write_text("{}")
+    loaded = []
+    model_cls = SimpleNamespace(from_pretrained=lambda p: loaded.append(p) or "ort")
+    ort = SimpleNamespace(ORTModelForSpeechSeq2Seq=model_cls)
+    calls = []
+    monkeypatch.setattr(backends, "_ort", lambda: ort)
+    monkeypatch.setattr(backends, "_pipeline", _fake_pipeline(calls))
+    monkeypatch.setenv("ML_ONNX_DIR", str(tmp_path))
+    monkeypatch.setenv("ML_BACKEND", "onnx-int8")
+
+    backends.build_pipeline(
+        "asr", "automatic-speech-recognition", "org/m", device="cpu", chunk_length_s=30
+    )
+
+    assert loaded == [export]
+    assert calls == [
+        (
+            "automatic-speech-recognition",
+            {
+                "model": "ort",
+                "tokenizer": str(export),
+                "feature_extractor": str(export),
+                "chunk_length_s": 30,
+            },
+        )
+    ]
+
+
+def test_onnx_is_refused_for_tasks_without_an_export(monkeypatch):
+    monkeypatch.setenv("ML_BACKEND_DOCQA", "onnx")
+    with pytest.raises(ValueError, match="torch-int8"):
+        backends.build_pipeline("docqa", "document-question-answering", "m")
+
+
+def test_concurrent_exports_keep_the_first_copy_and_clean_up(tmp_path):
+    target = tmp_path / "org--m" / "fp32"
+    with backends._staged(target) as ours:
+        (ours / "config.json").write_text("ours")
+        # another worker finishes the same export while this one is writing
+        with backends._staged(target) as theirs:
+            (theirs / "config.json").write_text("theirs")
+
+    assert (target / "config.json").read_text() == "theirs"
+    assert [p.name for p in target.parent.iterdir()] == ["fp32"]
+
+
+def test_failed_export_leaves_nothing_behind(tmp_path):
+    target = tmp_path / "org--m" / "int8"
+    with pytest.raises(RuntimeError):
+        with backends._staged(target) as tmp:
+            (tmp / "model.onnx").write_bytes(b"half")
+            raise RuntimeError("out of disk")
+
+    assert list(target.parent.iterdir()) == []
+
+
+def test_fixture_set_covers_every_label():
+    from common.ml.zeroshot import LABELS
+
+    fixtures = json.loads(ml_backends.FIXTURES.read_text())
+    counts = {label: 0 for label in LABELS}
+    for case in fixtures["zeroshot"]:
+        counts[case["label"]] += 1
+    assert min(counts.values()) >= 5
+    assert fixtures["summarize"]
+
+
+def test_benchmark_scores():
+    assert ml_backends.wer("the cat sat on the mat", "the cat sat on the mat") == 0
+    assert ml_backends.wer("the cat sat on the mat", "a cat sat on mat") == pytest.approx(2 / 6)
+    assert ml_backends.rouge1("refund the order", "refund the order") == 1
+    assert ml_backends.rouge1("refund the order", "ship it") == 0
+    expected = {"order_id": "A1", "sku": None}
+    assert ml_backends.field_match(expected, {"order_id": "a1", "sku": "X"}) == 0.5
@@ -0,0 +1,252 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+from common.ml import remote
+from common.ml.server import DynamicBatcher, build_app
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def _recording(batches, delay=0.0):
+    def run(items):
+        batches.append(list(items))
+        time.sleep(delay)
+        return [f"{item}!" for item in items]
+
+    return run
+
+
+@pytest.mark.anyio
+async def test_batcher_groups_concurrent_requests():
+    batches = []
+    batcher = DynamicBatcher("t", _recording(batches), max_batch=4, max_wait_ms=50)
+    try:
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(10)))
+    finally:
+        await batcher.close()
+
+    assert results == [f"{i}!" for i in range(10)]
+    assert [len(b) for b in batches] == [4, 4, 2]
+    assert [i for b in batches for i in b] == list(range(10))
+
+
+@pytest.mark.anyio
+async def test_batcher_forms_next_batch_while_model_is_busy():
+    batches = []
+    batcher = DynamicBatcher("t", _recording(batches, delay=0.1), max_batch=8, max_wait_ms=0)
+    try:
+        first = asyncio.create_task(batcher.submit("a"))
+        await asyncio.sleep(0.02)
+        rest = await asyncio.gather(*(batcher.submit(x) for x in "bcd"))
+        assert await first == "a!"
+    finally:
+        await batcher.close()
+
+    assert rest == ["b!", "c!", "d!"]
+    assert batches == [["a"], ["b", "c", "d"]]
+
+
+@pytest.mark.anyio
+async def test_batcher_fails_every_caller_in_a_failed_batch():
+    def boom(items):
+        raise RuntimeError("model crashed")
+
+    batcher = DynamicBatcher("t", boom, max_batch=4, max_wait_ms=20)
+    try:
+        results = await asyncio.gather(
+            *(batcher.submit(i) for i in range(3)), return_exceptions=True
+        )
+        assert all(isinstance(r, RuntimeError) for r in results)
+        # the loop survives and serves the next request
+        batcher.batch_fn = lambda items: items
+        assert await batcher.submit("ok") == "ok"
+    finally:
+        await batcher.close()
+
+
+@pytest.mark.anyio
+async def test_one_bad_input_fails_only_its_caller():
+    batches = []
+
+    def picky(items):
+        batches.append(list(items))
+        if "bad" in items:
+            raise ValueError("cannot decode image")
+        return [f"{item}!" for item in items]
+
+    batcher = DynamicBatcher("t", picky, max_batch=4, max_wait_ms=20)
+    try:
+        results = await asyncio.gather(
+            *(batcher.submit(x) for x in ("a", "bad", "c")), return_exceptions=True
+        )
+    finally:
+        await batcher.close()
+
+    assert results[0] == "a!" and results[2] == "c!"
+    assert isinstance(results[1], ValueError)
+    assert batches == [["a", "bad", "c"], ["a"], ["bad"], ["c"]]
+
+
+@pytest.mark.anyio
+async def test_short_result_list_fails_instead_of_leaving_callers_waiting():
+    batcher = DynamicBatcher("t", lambda items: items[:1], max_batch=4, max_wait_ms=20)
+    try:
+        results = await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True), 2
+        )
+    finally:
+        await batcher.close()
+
+    # retried singly, every item gets its one result
+    assert results == [0, 1, 2]
+
+    batcher = DynamicBatcher("t", lambda items: [], max_batch=4, max_wait_ms=20)
+    try:
+        results = await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit(i) for i in range(2)), return_exceptions=True), 2
+        )
+    finally:
+        await batcher.close()
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def _fake_batchers(batches):
+    def classify(texts):
+        batches.append(texts)
+        return [{"label": "refund", "scores": {"refund": 1.0}} for _ in texts]
+
+    return {
+        "zeroshot": DynamicBatcher("zeroshot", classify, max_batch=16, max_wait_ms=20),
+        "summarize": DynamicBatcher(
+            "summarize",
+            lambda items: [{"text": t[:m], "tokens": 1} for t, m in items],
+            max_batch=16,
+            max_wait_ms=0,
+        ),
+        "vqa": DynamicBatcher(
+            "vqa",
+            lambda images: [{"damaged": b"crack" in i} for i in images],
+            max_batch=16,
+            max_wait_ms=0,
+        ),
+        "asr": DynamicBatcher(
+            "asr",
+            lambda items: [{"text": m, "confidence": len(d)} for d, m in items],
+            max_batch=1,
+            max_wait_ms=0,
+        ),
+        "docqa": DynamicBatcher("docqa", lambda items: items, max_batch=1, max_wait_ms=0),
+    }
+
+
+SERVER_VERSIONS = {"vqa": "vit@1", "asr": "whisper@1+onnx-int8", "docqa": "layoutlm@2"}
+
+
+@pytest.fixture
+def served(monkeypatch):
+    batches = []
+    app = build_app(_fake_batchers(batches), versions=SERVER_VERSIONS)
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://ml-server")
+    monkeypatch.setenv("ML_SERVER_URL", "http://ml-server")
+    monkeypatch.setenv("ML_MODE", "real")
+    monkeypatch.setattr(remote, "_get_client", lambda: client)
+    monkeypatch.setattr(remote, "_versions", {})
+    return batches
+
+
+@pytest.mark.anyio
+async def test_requests_from_different_workers_share_a_batch(served):
+    assert remote.enabled()
+    results = await asyncio.gather(
+        remote.post_json("/v1/classify", {"texts": ["a", "b"]}),
+        remote.post_json("/v1/classify", {"texts": ["c"]}),
+    )
+
+    assert [len(r["results"]) for r in results] == [2, 1]
+    assert sorted(t for b in served for t in b) == ["a", "b", "c"]
+    assert len(served) == 1
+
+
+@pytest.mark.anyio
+async def test_binary_endpoints_take_raw_body_and_files(served, tmp_path):
+    photo = tmp_path / "photo.jpg"
+    photo.write_bytes(b"...crack...")
+
+    assert (await remote.post_bytes("/v1/is_damaged", photo))["damaged"] is True
+    assert (await remote.post_bytes("/v1/is_damaged", b"fine"))["damaged"] is False
+    transcript = await remote.post_bytes("/v1/transcribe", b"1234", mime="audio/ogg")
+    assert transcript == {"text": "audio/ogg", "confidence": 4}
+    summary = await remote.post_json("/v1/summarize", {"text": "abcdef", "max_chars": 3})
+    assert summary["text"] == "abc"
+
+
+@pytest.mark.anyio
+async def test_cache_key_follows_the_servers_backend_not_the_workers(served, monkeypatch):
+    from worker.jobs import celery_tasks
+
+    monkeypatch.setenv("ML_BACKEND_ASR", "torch")
+    assert await celery_tasks._model_version("asr", "whisper@1") == "whisper@1+onnx-int8"
+    assert await remote.model_version("docqa") == "layoutlm@2"
+
+
+def test_server_reports_its_own_backend_in_model_versions(monkeypatch):
+    from common.ml import asr, server
+
+    monkeypatch.setenv("ML_MODE", "real")
+    versions = server.model_versions()
+    assert set(versions) == {"vqa", "asr", "docqa"}
+    assert versions["asr"] == asr.MODEL_VERSION
+    monkeypatch.setenv("ML_MODE", "stub")
+    assert set(server.model_versions().values()) == {"stub"}
+
+
+def test_disabled_without_url_or_in_stub_mode(monkeypatch):
+    monkeypatch.delenv("ML_SERVER_URL", raising=False)
+    assert not remote.enabled()
+    monkeypatch.setenv("ML_SERVER_URL", "unix:///tmp/ml.sock")
+    monkeypatch.setenv("ML_MODE", "stub")
+    assert not remote.enabled()
+    monkeypatch.setenv("ML_MODE", "real")
+    assert remote.enabled()
+
+
+@pytest.mark.anyio
+async def test_client_reaches_server_over_unix_socket(monkeypatch, tmp_path):
+    uvicorn = pytest.importorskip("uvicorn")
+    socket_path = tmp_path / "ml.sock"
+    server = uvicorn.Server(
+        uvicorn.Config(build_app(_fake_batchers([])), uds=str(socket_path), log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    try:
+        for _ in range(100):
+            if server.started:
+                break
+            await asyncio.sleep(0.02)
+        monkeypatch.setenv("ML_SERVER_URL", f"unix://{socket_path}")
+        monkeypatch.setenv("ML_MODE", "real")
+        monkeypatch.setattr(remote, "_client", None)
+        data = await remote.post_json("/v1/classify", {"texts": ["hello"]})
+        assert data["results"][0]["label"] == "refund"
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+        monkeypatch.setattr(remote, "_client", None)
+
+
+@pytest.mark.anyio
+async def test_zeroshot_classify_goes_to_server(served):
+    pytest.importorskip("transformers")
+    from common.ml import zeroshot
+
+    result = await zeroshot.classify("where is my parcel")
+    assert result.label == "refund"
+    assert served == [["where is my parcel"]]
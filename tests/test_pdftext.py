@@ -0,0 +1,103 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from common.ml import docqa
+from common.ml.pdftext import fields_from_text_layer, read_text_layer
+
+
+def _make_pdf(lines: list[tuple[int, int, str]]) -> bytes:
+    content = " ".join(f"BT /F1 11 Tf {x} {y} Td ({text}) Tj ET" for x, y, text in lines).encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R"
+        b" /Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref,
+    )
+    return bytes(out)
+
+
+INVOICE = _make_pdf(
+    [
+        (72, 740, "ACME Store"),
+        (72, 700, "Order #WEB-4471"),
+        (400, 700, "Invoice date: 03/02/2025"),
+        (72, 660, "SKU: ABC-123"),
+        (72, 620, "Total"),
+        (400, 620, "$59.99"),
+    ]
+)
+
+
+def test_text_layer_groups_chunks_into_lines():
+    layer = read_text_layer(INVOICE, max_pages=1)
+
+    assert layer.lines() == [
+        "ACME Store",
+        "Order #WEB-4471 Invoice date: 03/02/2025",
+        "SKU: ABC-123",
+        "Total $59.99",
+    ]
+    assert layer.usable(20)
+
+
+def test_fields_from_text_layer_uses_labelled_lines():
+    fields = fields_from_text_layer(read_text_layer(INVOICE, max_pages=1))
+
+    assert fields.order_id == "WEB-4471"
+    assert fields.amount == Decimal("59.99")
+    assert fields.currency == "USD"
+    assert fields.order_date == date(2025, 2, 3)
+    assert fields.sku == "ABC-123"
+    assert fields.confidence["order_id"] == pytest.approx(0.9)
+
+
+def test_extract_document_skips_rasterization_for_text_pdfs(monkeypatch):
+    monkeypatch.setattr(docqa, "use_stub", lambda: False)
+
+    def no_raster(*_args, **_kwargs):
+        raise AssertionError("text-layer PDFs must not be rasterized")
+
+    monkeypatch.setattr(docqa, "_load_pages", no_raster)
+
+    result = docqa.extract_document_sync(INVOICE, "application/pdf")
+
+    assert result.path == "text_layer"
+    assert result.fields.order_id == "WEB-4471"
+
+
+def test_extract_document_falls_back_to_ocr_without_text(monkeypatch):
+    monkeypatch.setattr(docqa, "use_stub", lambda: False)
+    loaded = []
+
+    def fake_pages(doc_bytes, mime, max_pages=1):
+        loaded.append(max_pages)
+        return ["page-1"]
+
+    class _Engine:
+        def answer(self, page):
+            return {"order_id": {"answer": "SCAN-1", "score": 0.8}}
+
+    monkeypatch.setattr(docqa, "_load_pages", fake_pages)
+    monkeypatch.setattr(docqa, "_get_engine", lambda: _Engine())
+
+    result = docqa.extract_document_sync(_make_pdf([]), "application/pdf")
+
+    assert result.path == "ocr"
+    assert result.fields.order_id == "SCAN-1"
+    assert loaded == [1]
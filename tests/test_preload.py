@@ -0,0 +1,113 @@
+import gc
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+from benchmarks import model_preload
+from common.ml import preload
+
+_MODEL = None
+_LOADS = []
+
+
+class _Param:
+    def __init__(self):
+        self.requires_grad = True
+
+    def requires_grad_(self, flag):
+        self.requires_grad = flag
+
+
+class _Model:
+    def __init__(self):
+        self.training = True
+        self.params = [_Param(), _Param()]
+        # 64 MiB of weights, written once so the pages are really allocated
+        self.weights = np.random.default_rng(0).random(8 * 1024 * 1024)
+
+    def eval(self):
+        self.training = False
+
+    def parameters(self):
+        return iter(self.params)
+
+
+class _Pipeline:
+    def __init__(self):
+        time.sleep(0.3)  # stands in for reading weights from disk
+        self.model = _Model()
+
+
+def _get_fake():
+    global _MODEL
+    if _MODEL is None:
+        _LOADS.append(os.getpid())
+        _MODEL = _Pipeline()
+    # a task reads the weights; it never writes them
+    _MODEL.model.weights.sum()
+    return _MODEL
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    global _MODEL
+    monkeypatch.setitem(preload.LOADERS, "fake", (__name__, "_get_fake"))
+    _MODEL = None
+    _LOADS.clear()
+    yield
+    _MODEL = None
+    gc.unfreeze()
+
+
+def test_preload_names(monkeypatch):
+    monkeypatch.setenv("ML_PRELOAD", " zeroshot, vqa ")
+    assert preload.preload_names() == ["zeroshot", "vqa"]
+
+    monkeypatch.setenv("ML_PRELOAD", "all")
+    assert preload.preload_names() == list(preload.LOADERS)
+
+    monkeypatch.setenv("ML_PRELOAD", "bert")
+    with pytest.raises(ValueError):
+        preload.preload_names()
+
+
+def test_preload_skipped_in_stub_mode(monkeypatch, fake_model):
+    monkeypatch.setenv("ML_MODE", "stub")
+    monkeypatch.setenv("ML_PRELOAD", "fake")
+
+    assert preload.preload_from_env() == {}
+    assert _LOADS == []
+
+
+def test_preload_freezes_weights_and_gc(fake_model):
+    timings = preload.preload(["fake"])
+
+    assert set(timings) == {"fake"}
+    assert not _MODEL.model.training
+    assert not any(p.requires_grad for p in _MODEL.model.params)
+    assert gc.get_freeze_count() > 0
+
+
+@pytest.mark.skipif(
+    not sys.platform.startswith("linux") or not os.path.exists("/proc/self/smaps_rollup"),
+    reason="needs fork and /proc/self/smaps_rollup",
+)
+def test_forked_children_share_preloaded_model(fake_model):
+    global _MODEL
+    lazy = model_preload.measure(["fake"], children=2, preload=False)
+    assert _MODEL is None  # the parent never loaded it
+
+    shared = model_preload.measure(["fake"], children=2, preload=True)
+
+    print()
+    model_preload.report("lazy", lazy)
+    model_preload.report("preloaded", shared)
+    assert _LOADS == [os.getpid()]  # loaded once, in the parent
+    for cold, warm in zip(lazy, shared):
+        assert cold["first_task_s"] >= 0.3
+        assert warm["first_task_s"] < 0.15
+        # the 64 MiB of weights stay shared instead of being private to each child
+        assert cold["private_mb"] - warm["private_mb"] > 48
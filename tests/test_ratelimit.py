@@ -0,0 +1,95 @@
+import asyncio
+import uuid
+
+import pytest
+import redis.asyncio as aioredis
+
+from common.clients import ratelimit
+
+
+@pytest.fixture(autouse=True)
+def _fresh_limiter(monkeypatch):
+    monkeypatch.setattr(ratelimit, "_redis", None)
+    monkeypatch.setattr(ratelimit, "_redis_down_until", 0.0)
+
+
+def test_acquire_sleeps_for_reserved_wait(monkeypatch):
+    slept = []
+
+    async def reserve(api, credential, max_wait_s):
+        return 0.25
+
+    async def sleep(s):
+        slept.append(s)
+
+    monkeypatch.setattr(ratelimit, "_reserve", reserve)
+    monkeypatch.setattr(ratelimit.asyncio, "sleep", sleep)
+
+    asyncio.run(ratelimit.acquire("shopify", "shop.example"))
+
+    assert slept == [0.25]
+
+
+def test_acquire_raises_when_wait_exceeds_budget(monkeypatch):
+    async def reserve(api, credential, max_wait_s):
+        return -3.0
+
+    monkeypatch.setattr(ratelimit, "_reserve", reserve)
+
+    with pytest.raises(ratelimit.Throttled) as exc:
+        asyncio.run(ratelimit.acquire("zendesk", "acme", max_wait_s=1))
+
+    assert exc.value.retry_after == 3.0
+
+
+def test_redis_errors_fail_open(monkeypatch):
+    async def broken(**kwargs):
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(ratelimit, "_get_script", lambda: broken)
+
+    asyncio.run(ratelimit.acquire("stripe", "sk_test"))
+
+    assert ratelimit._redis_down_until > 0
+
+
+def test_bucket_key_hides_credential():
+    key = ratelimit._bucket_key("stripe", "sk_live_secret")
+
+    assert key.startswith("ratelimit:stripe:")
+    assert "sk_live_secret" not in key
+
+
+@pytest.fixture
+def live_redis(monkeypatch):
+    async def ping():
+        client = aioredis.from_url(ratelimit.settings.redis_url, socket_connect_timeout=0.5)
+        try:
+            await client.ping()
+        finally:
+            await client.aclose()
+
+    try:
+        asyncio.run(ping())
+    except Exception as exc:
+        pytest.skip(f"Redis is not reachable for rate limiter tests: {exc}")
+    monkeypatch.setattr(ratelimit.settings, "ratelimit_stripe_rps", 10.0)
+    monkeypatch.setattr(ratelimit.settings, "ratelimit_stripe_burst", 2.0)
+
+
+def test_token_bucket_script_against_redis(live_redis):
+    credential = uuid.uuid4().hex
+
+    async def run():
+        waits = [await ratelimit._reserve("stripe", credential, 1.0) for _ in range(4)]
+        rejected = await ratelimit._reserve("stripe", credential, 0.05)
+        other = await ratelimit._reserve("stripe", uuid.uuid4().hex, 1.0)
+        return waits, rejected, other
+
+    waits, rejected, other = asyncio.run(run())
+
+    assert waits[:2] == [0.0, 0.0]  # burst
+    assert 0.05 <= waits[2] <= 0.1
+    assert 0.15 <= waits[3] <= 0.2  # reservations queue behind each other
+    assert rejected < 0
+    assert other == 0.0  # buckets are per credential
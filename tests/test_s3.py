@@ -64,3 +64,135 @@ def test_same_bytes_same_key(s3_storage: AttachmentStorage):
         assert key1 == key2
 
     asyncio.run(_run())
+
+
+class _FakeClient:
+    def __init__(self, opened: list):
+        self.opened = opened
+        self.head_bucket_calls = 0
+
+    async def __aenter__(self):
+        self.opened.append(self)
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def head_bucket(self, Bucket):
+        self.head_bucket_calls += 1
+
+
+def test_shared_client_reused_and_bucket_checked_once(monkeypatch):
+    from common.storage import s3
+
+    opened: list = []
+    monkeypatch.setattr(s3, "_client", lambda: _FakeClient(opened))
+    monkeypatch.setattr(s3, "_known_buckets", set())
+
+    async def _run():
+        await s3.open_client()
+        try:
+            await s3.ensure_bucket("bench-bucket")
+            await s3.ensure_bucket("bench-bucket")
+            async with s3._s3() as client:
+                assert client is opened[0]
+        finally:
+            await s3.close_client()
+
+    asyncio.run(_run())
+
+    assert len(opened) == 1
+    assert opened[0].head_bucket_calls == 1
+
+
+def test_other_event_loop_gets_own_client(monkeypatch):
+    from common.storage import s3
+
+    opened: list = []
+    monkeypatch.setattr(s3, "_client", lambda: _FakeClient(opened))
+
+    async def _use():
+        async with s3._s3() as client:
+            return client
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(s3.open_client())
+        shared = opened[0]
+        assert asyncio.run(_use()) is not shared
+        assert loop.run_until_complete(_use()) is shared
+    finally:
+        loop.run_until_complete(s3.close_client())
+        loop.close()
+
+
+class _RecordingS3(_FakeClient):
+    def __init__(self, opened: list):
+        super().__init__(opened)
+        self.calls: list[tuple[str, dict]] = []
+
+    def __getattr__(self, name):
+        async def _call(**kwargs):
+            self.calls.append((name, kwargs))
+            if name == "create_multipart_upload":
+                return {"UploadId": "up-1"}
+            if name == "upload_part":
+                return {"ETag": f"etag-{kwargs['PartNumber']}"}
+            return {}
+
+        return _call
+
+
+def _reader(data: bytes, max_chunk: int = 3):
+    pos = 0
+
+    async def read(n: int) -> bytes:
+        # short reads, like a socket-backed stream
+        nonlocal pos
+        chunk = data[pos : pos + min(n, max_chunk)]
+        pos += len(chunk)
+        return chunk
+
+    return read
+
+
+def test_put_stream_small_body_single_put(monkeypatch):
+    import hashlib
+    from common.storage import s3
+
+    opened: list = []
+    monkeypatch.setattr(s3, "_client", lambda: _RecordingS3(opened))
+    monkeypatch.setattr(s3, "_known_buckets", {"b"})
+
+    stored = asyncio.run(
+        s3._put_stream(_reader(b"hello"), "text/plain", "a.txt", bucket="b", part_size=16)
+    )
+
+    digest = hashlib.sha256(b"hello").hexdigest()
+    assert stored == {"key": f"{digest[:8]}/a.txt", "sha256": digest, "size": 5}
+    assert [c[0] for c in opened[0].calls] == ["put_object"]
+
+
+def test_put_stream_multipart_hashes_while_streaming(monkeypatch):
+    import hashlib
+    from common.storage import s3
+
+    opened: list = []
+    monkeypatch.setattr(s3, "_client", lambda: _RecordingS3(opened))
+    monkeypatch.setattr(s3, "_known_buckets", {"b"})
+    data = b"0123456789abcdefghij"
+
+    stored = asyncio.run(
+        s3._put_stream(_reader(data), "audio/ogg", "note.ogg", bucket="b", part_size=8)
+    )
+
+    calls = opened[0].calls
+    parts = [kw["Body"] for name, kw in calls if name == "upload_part"]
+    assert parts == [data[:8], data[8:16], data[16:]]
+    assert stored["sha256"] == hashlib.sha256(data).hexdigest()
+    assert stored["size"] == len(data)
+    names = [name for name, _ in calls]
+    assert names[-2:] == ["copy_object", "delete_object"]
+    complete = dict(calls)["complete_multipart_upload"]
+    assert [p["PartNumber"] for p in complete["MultipartUpload"]["Parts"]] == [1, 2, 3]
+    assert dict(calls)["copy_object"]["Key"] == stored["key"]
@@ -0,0 +1,219 @@
+import asyncio
+
+import pytest
+
+from common.clients import shopify
+from worker.jobs import shopify_sync
+
+
+def _order(oid, updated_at, **extra):
+    return {
+        "id": oid,
+        "name": f"#{oid}",
+        "order_number": oid,
+        "email": "Jane@Example.com",
+        "total_price": "49.99",
+        "currency": "USD",
+        "financial_status": "paid",
+        "fulfillment_status": None,
+        "line_items": [
+            {"title": "Mug", "quantity": 1, "sku": "MUG-01"},
+            {"title": "Gift wrap", "quantity": 1, "sku": None},
+        ],
+        "fulfillments": [{"tracking_url": "https://track.example/1"}],
+        "created_at": "2026-10-01T09:00:00-04:00",
+        "updated_at": updated_at,
+        **extra,
+    }
+
+
+def test_order_row_normalizes_lookup_columns():
+    row = shopify.order_row(_order(1001, "2026-10-02T10:00:00-04:00"))
+
+    assert row["name"] == "1001"
+    assert row["email"] == "jane@example.com"
+    assert row["skus"] == ["MUG-01"]
+    assert row["fulfillment_status"] == "unfulfilled"
+    assert row["tracking_urls"] == ["https://track.example/1"]
+    assert row["updated_at"].utcoffset().total_seconds() == -4 * 3600
+
+
+class _SyncRepo:
+    def __init__(self, cursor=None):
+        self.cursor = cursor
+        self.rows = []
+        self.cursors = []
+
+    async def get_sync_cursor(self, name):
+        return self.cursor
+
+    async def set_sync_cursor(self, name, value):
+        self.cursor = value
+        self.cursors.append(value)
+
+    async def upsert_shopify_orders(self, rows):
+        self.rows.extend(rows)
+
+
+class _Session:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def commit(self):
+        pass
+
+
+def test_sync_moves_cursor_per_page(monkeypatch):
+    repo = _SyncRepo(cursor="2026-10-02T10:00:00+00:00")
+    starts = []
+
+    async def pages(updated_at_min):
+        starts.append(updated_at_min)
+        yield [_order(1, "2026-10-02T10:00:00+00:00"), _order(2, "2026-10-02T11:00:00+00:00")]
+        yield [_order(3, "2026-10-02T12:00:00+00:00")]
+
+    monkeypatch.setattr(shopify_sync, "SessionLocal", lambda: _Session())
+    monkeypatch.setattr(shopify_sync, "MessageRepository", lambda s: repo)
+    monkeypatch.setattr(shopify_sync.shopify, "list_orders", pages)
+    monkeypatch.setattr(shopify_sync.settings, "shopify_sync_overlap_s", 60)
+
+    synced = asyncio.run(shopify_sync._sync_shopify_orders())
+
+    assert synced == 3
+    assert starts == ["2026-10-02T09:59:00+00:00"]
+    assert repo.cursors == ["2026-10-02T11:00:00+00:00", "2026-10-02T12:00:00+00:00"]
+
+
+def _local_repo(found, calls):
+    class _Repo:
+        def __init__(self, session):
+            pass
+
+        async def find_shopify_order(self, **kwargs):
+            calls.append(("find", kwargs))
+            return found
+
+        async def upsert_shopify_orders(self, rows):
+            calls.append(("upsert", [r["name"] for r in rows]))
+
+    return _Repo
+
+
+@pytest.mark.anyio
+async def test_lookup_served_from_mirror(monkeypatch):
+    calls = []
+    row = shopify.order_row(_order(1001, "2026-10-02T10:00:00-04:00"))
+
+    async def no_api(order_id):
+        raise AssertionError("mirror hit must not call the API")
+
+    monkeypatch.setenv("SHOPIFY_SANDBOX", "0")
+    monkeypatch.setattr(shopify, "SessionLocal", lambda: _Session())
+    monkeypatch.setattr(shopify, "MessageRepository", _local_repo(row, calls))
+    monkeypatch.setattr(shopify, "_fetch_order", no_api)
+
+    result = await shopify._lookup(None, "Jane <Jane@Example.com>", "MUG-01")
+
+    assert calls == [("find", {"order_id": None, "email": "jane@example.com", "sku": "MUG-01"})]
+    assert result["order_number"] == 1001
+    assert result["total_price"] == "49.99"
+    assert result["line_items"][0]["sku"] == "MUG-01"
+
+
+@pytest.mark.anyio
+async def test_order_id_miss_falls_back_to_api_and_writes_through(monkeypatch):
+    calls = []
+
+    class _Response:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"orders": [_order(1001, "2026-10-02T10:00:00-04:00")]}
+
+    class _Client:
+        async def get(self, url, params=None, auth=None):
+            calls.append(("api", params["name"]))
+            return _Response()
+
+    class _ClientCM:
+        async def __aenter__(self):
+            return _Client()
+
+        async def __aexit__(self, *exc):
+            return False
+
+    monkeypatch.setenv("SHOPIFY_SANDBOX", "0")
+    monkeypatch.setenv("SHOPIFY_API_KEY", "k")
+    monkeypatch.setenv("SHOPIFY_PASSWORD", "p")
+    monkeypatch.setenv("SHOPIFY_DOMAIN", "shop.example")
+    monkeypatch.setattr(shopify, "SessionLocal", lambda: _Session())
+    monkeypatch.setattr(shopify, "MessageRepository", _local_repo(None, calls))
+    monkeypatch.setattr(shopify.http, "client", lambda name: _ClientCM())
+
+    result = await shopify._lookup("#1001", None, None)
+
+    assert [c[0] for c in calls] == ["find", "api", "upsert"]
+    assert calls[1] == ("api", "1001")
+    assert calls[2] == ("upsert", ["1001"])
+    assert result["id"] == 1001
+
+
+@pytest.mark.anyio
+async def test_api_fallback_waits_only_for_what_is_left_of_the_budget(monkeypatch):
+    waits = []
+
+    async def acquire(api, credential, max_wait_s=None):
+        waits.append(max_wait_s)
+        raise shopify.ratelimit.Throttled(api, 3.0)
+
+    monkeypatch.setenv("SHOPIFY_SANDBOX", "0")
+    monkeypatch.setenv("SHOPIFY_API_KEY", "k")
+    monkeypatch.setenv("SHOPIFY_PASSWORD", "p")
+    monkeypatch.setenv("SHOPIFY_DOMAIN", "shop.example")
+    monkeypatch.setattr(shopify, "SessionLocal", lambda: _Session())
+    monkeypatch.setattr(shopify, "MessageRepository", _local_repo(None, []))
+    monkeypatch.setattr(shopify.ratelimit, "acquire", acquire)
+
+    with pytest.raises(shopify.ratelimit.Throttled):
+        await shopify._lookup("#1001", None, None, max_wait_s=1.0)
+
+    assert 0.9 < waits[0] <= 1.0
+
+
+@pytest.mark.anyio
+async def test_api_errors_propagate_instead_of_reading_as_no_order(monkeypatch):
+    import httpx
+
+    statuses = [503, 200]
+
+    class _Client:
+        async def get(self, url, params=None, auth=None):
+            request = httpx.Request("GET", url)
+            return httpx.Response(statuses.pop(0), json={"orders": []}, request=request)
+
+    class _ClientCM:
+        async def __aenter__(self):
+            return _Client()
+
+        async def __aexit__(self, *exc):
+            return False
+
+    async def acquire(api, credential, max_wait_s=None):
+        pass
+
+    monkeypatch.setenv("SHOPIFY_SANDBOX", "0")
+    monkeypatch.setenv("SHOPIFY_API_KEY", "k")
+    monkeypatch.setenv("SHOPIFY_PASSWORD", "p")
+    monkeypatch.setenv("SHOPIFY_DOMAIN", "shop.example")
+    monkeypatch.setattr(shopify.ratelimit, "acquire", acquire)
+    monkeypatch.setattr(shopify.http, "client", lambda name: _ClientCM())
+
+    # an outage must not be cached as a negative result
+    with pytest.raises(httpx.HTTPStatusError):
+        await shopify._fetch_order("1001")
+    # only an empty answer means there is no such order
+    assert await shopify._fetch_order("1001") is None
@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from common.clients import stripe
+from worker.jobs import stripe_sync
+
+
+def _charge(cid, created, **extra):
+    return {
+        "id": cid,
+        "created": created,
+        "amount": 4999,
+        "currency": "eur",
+        "status": "succeeded",
+        "billing_details": {"email": "Jane@Example.com"},
+        "metadata": {"order_id": "#A10023"},
+        "payment_method_details": {"card": {"brand": "visa"}},
+        "outcome": {"risk_score": 12},
+        **extra,
+    }
+
+
+def test_charge_row_normalizes_lookup_columns():
+    row = stripe.charge_row(_charge("ch_1", 1_700_000_000))
+
+    assert row["email"] == "jane@example.com"
+    assert row["order_id"] == "A10023"
+    assert row["amount_cents"] == 4999
+    assert row["currency"] == "EUR"
+    assert row["card_brand"] == "visa"
+    assert row["created"].year == 2023
+
+
+class _SyncRepo:
+    def __init__(self, cursor=None):
+        self.cursor = cursor
+        self.rows = []
+
+    async def get_sync_cursor(self, name):
+        return self.cursor
+
+    async def set_sync_cursor(self, name, value):
+        self.cursor = value
+
+    async def upsert_stripe_charges(self, rows):
+        self.rows.extend(rows)
+
+
+class _Session:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def commit(self):
+        pass
+
+
+def test_sync_advances_cursor_to_newest_created(monkeypatch):
+    repo = _SyncRepo(cursor="1000")
+    starts = []
+
+    async def pages(created_gte):
+        starts.append(created_gte)
+        yield [_charge("ch_3", 1300), _charge("ch_2", 1200)]
+        yield [_charge("ch_1", 1100)]
+
+    monkeypatch.setattr(stripe_sync, "SessionLocal", lambda: _Session())
+    monkeypatch.setattr(stripe_sync, "MessageRepository", lambda s: repo)
+    monkeypatch.setattr(stripe_sync.stripe, "list_charges", pages)
+    monkeypatch.setattr(stripe_sync.settings, "stripe_sync_overlap_s", 100)
+
+    synced = asyncio.run(stripe_sync._sync_stripe_charges())
+
+    assert synced == 3
+    assert starts == [900]
+    assert [r["id"] for r in repo.rows] == ["ch_3", "ch_2", "ch_1"]
+    assert repo.cursor == "1300"
+
+
+@pytest.mark.anyio
+async def test_find_charge_queries_local_index(monkeypatch):
+    seen = {}
+
+    class _Repo:
+        def __init__(self, session):
+            pass
+
+        async def find_stripe_charge(self, **kwargs):
+            seen.update(kwargs)
+            return {
+                "id": "ch_9",
+                "amount_cents": 4999,
+                "currency": "EUR",
+                "status": "succeeded",
+                "receipt_url": None,
+                "card_brand": "visa",
+                "risk_score": 3,
+            }
+
+    monkeypatch.setenv("STRIPE_SANDBOX", "0")
+    monkeypatch.setattr(stripe, "SessionLocal", lambda: _Session())
+    monkeypatch.setattr(stripe, "MessageRepository", _Repo)
+
+    result = await stripe._lookup("#A10023", "Jane <Jane@Example.com>", 49.99)
+
+    assert seen == {"order_id": "A10023", "email": "jane@example.com", "amount_cents": 4999}
+    assert result["charge_id"] == "ch_9"
+    assert result["amount"] == 49.99
@@ -0,0 +1,67 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from common.ingest import upload_service
+from common.ingest.upload_service import IngestUploadService
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+class _SlowStorage:
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+
+    async def put_stream(self, read, mime, filename):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        return {"key": f"k/{filename}", "size": 3, "sha256": f"h-{filename}"}
+
+
+class _Session:
+    def __init__(self):
+        self.committed = False
+
+    async def commit(self):
+        self.committed = True
+
+    async def execute(self, *_args, **_kwargs):
+        return SimpleNamespace(scalar_one=lambda: "m1")
+
+
+class _Repo:
+    def __init__(self, session):
+        self.calls = []
+
+    async def insert_attachments(self, message_id, atts):
+        self.calls.append((message_id, atts))
+        return [f"att-{i}" for i in range(len(atts))]
+
+
+@pytest.mark.anyio
+async def test_uploads_run_concurrently_then_insert_once(monkeypatch):
+    repos = []
+    monkeypatch.setattr(
+        upload_service, "MessageRepository", lambda s: repos.append(_Repo(s)) or repos[-1]
+    )
+    storage = _SlowStorage()
+    service = IngestUploadService(storage=storage, upload_concurrency=3)
+    files = [
+        SimpleNamespace(read=None, content_type="image/png", filename=f"{i}.png") for i in range(7)
+    ]
+    session = _Session()
+
+    out = await service(body="hi", files=files, session=session)
+
+    assert storage.peak == 3
+    assert len(repos) == 1 and len(repos[0].calls) == 1
+    assert [a["id"] for a in out["attachments"]] == [f"att-{i}" for i in range(7)]
+    assert [a["filename"] for a in out["attachments"]] == [f"{i}.png" for i in range(7)]
+    assert session.committed
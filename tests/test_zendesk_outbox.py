@@ -0,0 +1,271 @@
+import asyncio
+
+from worker.jobs import zendesk_outbox
+
+
+class _Repo:
+    def __init__(self, rows=None, jobs=None):
+        self.rows = rows or []
+        self.jobs = jobs or {}
+        self.done = []
+        self.failed = []
+        self.retried = []
+        self.job_ids = {}
+
+    async def zendesk_outbox_jobs(self):
+        return self.jobs
+
+    async def claim_zendesk_outbox(self, limit, stale_after_s):
+        rows, self.rows = self.rows[:limit], self.rows[limit:]
+        return rows
+
+    async def set_zendesk_outbox_job(self, ids, job_id):
+        self.job_ids[job_id] = ids
+
+    async def complete_zendesk_outbox(self, done):
+        self.done.extend(done)
+
+    async def fail_zendesk_outbox(self, failed):
+        self.failed.extend(failed)
+
+    async def retry_zendesk_outbox(self, ids, *, delay_s, error, max_attempts, count_attempt=True):
+        self.retried.append((ids, delay_s, count_attempt))
+
+    async def zendesk_outbox_depth(self):
+        return {"pending": len(self.rows)}
+
+
+class _Session:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+
+def _row(i, attempts=1):
+    return {"id": i, "ticket_id": f"t{i}", "payload": {"subject": f"s{i}"}, "attempts": attempts}
+
+
+def _run(monkeypatch, repo):
+    monkeypatch.setattr(zendesk_outbox, "SessionLocal", lambda: _Session())
+    monkeypatch.setattr(zendesk_outbox, "MessageRepository", lambda s: repo)
+    return asyncio.run(zendesk_outbox._dispatch_zendesk_outbox())
+
+
+def test_batch_results_map_back_by_index(monkeypatch):
+    repo = _Repo(rows=[_row(3), _row(1), _row(2)])
+    sent = []
+
+    async def create_many(tickets):
+        sent.append([t["subject"] for t in tickets])
+        return {
+            "id": "job1",
+            "status": "completed",
+            "results": [
+                {"index": 0, "id": 101, "success": True},
+                {"index": 1, "error": "InvalidValue", "details": "subject"},
+            ],
+        }
+
+    monkeypatch.setattr(zendesk_outbox.zendesk, "create_many", create_many)
+
+    _run(monkeypatch, repo)
+
+    assert sent == [["s1", "s2", "s3"]]
+    assert repo.job_ids == {"job1": [1, 2, 3]}
+    assert repo.done == [{"id": 1, "external_id": "101"}]
+    assert repo.failed == [{"id": 2, "error": "InvalidValue: subject"}]
+    assert repo.retried == [([3], 30.0, True)]
+
+
+def test_rate_limit_defers_batch_without_spending_an_attempt(monkeypatch):
+    repo = _Repo(rows=[_row(1), _row(2)])
+
+    async def create_many(tickets):
+        raise zendesk_outbox.zendesk.RateLimited(42)
+
+    monkeypatch.setattr(zendesk_outbox.zendesk, "create_many", create_many)
+
+    depth = _run(monkeypatch, repo)
+
+    assert repo.retried == [([1, 2], 42, False)]
+    assert repo.done == []
+    assert depth == {"pending": 0}
+
+
+def test_retried_rows_found_by_external_id_are_not_resent(monkeypatch):
+    repo = _Repo(rows=[_row(1, attempts=2), _row(2)])
+    sent = []
+
+    async def find_by_external_id(external_id):
+        return "555" if external_id == "t1" else None
+
+    async def create_many(tickets):
+        sent.extend(t["subject"] for t in tickets)
+        return {"id": "job2", "status": "queued"}
+
+    monkeypatch.setattr(zendesk_outbox.zendesk, "find_by_external_id", find_by_external_id)
+    monkeypatch.setattr(zendesk_outbox.zendesk, "create_many", create_many)
+
+    _run(monkeypatch, repo)
+
+    assert sent == ["s2"]
+    assert repo.done == [{"id": 1, "external_id": "555"}]
+    assert repo.job_ids == {"job2": [2]}
+
+
+def test_polls_in_flight_jobs_before_claiming(monkeypatch):
+    repo = _Repo(jobs={"job1": [7, 8], "gone": [9]})
+
+    async def job_statuses(ids):
+        assert sorted(ids) == ["gone", "job1"]
+        return [
+            {
+                "id": "job1",
+                "status": "completed",
+                "results": [{"index": 0, "id": 1}, {"index": 1, "id": 2}],
+            }
+        ]
+
+    monkeypatch.setattr(zendesk_outbox.zendesk, "job_statuses", job_statuses)
+
+    _run(monkeypatch, repo)
+
+    assert repo.done == [{"id": 7, "external_id": "1"}, {"id": 8, "external_id": "2"}]
+    assert repo.retried == [([9], 0, True)]
+
+
+def test_attachment_links_are_presigned_at_send_time(monkeypatch):
+    row = _row(1)
+    row["payload"] = {
+        "subject": "s1",
+        "comment": {"body": "summary", "public": False},
+        "attachment_keys": ["k1", "k2"],
+    }
+    repo = _Repo(rows=[row])
+    sent, presigned = [], []
+
+    async def presign_all(keys, ttl_seconds):
+        presigned.append((keys, ttl_seconds))
+        return [f"https://s3/{k}" for k in keys]
+
+    async def create_many(tickets):
+        sent.extend(tickets)
+        return {"id": "job1", "status": "queued"}
+
+    monkeypatch.setattr(zendesk_outbox, "presign_all", presign_all)
+    monkeypatch.setattr(zendesk_outbox.zendesk, "create_many", create_many)
+
+    _run(monkeypatch, repo)
+
+    assert presigned == [(["k1", "k2"], zendesk_outbox.settings.zendesk_attachment_url_ttl_s)]
+    assert sent == [
+        {
+            "subject": "s1",
+            "comment": {
+                "body": "summary\n\nAttachments:\nhttps://s3/k1\nhttps://s3/k2",
+                "public": False,
+            },
+        }
+    ]
+    # the stored payload keeps the keys for the next attempt
+    assert row["payload"]["attachment_keys"] == ["k1", "k2"]
+
+
+def test_job_polling_errors_do_not_block_new_rows(monkeypatch):
+    repo = _Repo(rows=[_row(1)], jobs={"job1": [7]})
+    sent = []
+
+    async def job_statuses(ids):
+        raise RuntimeError("503 Service Unavailable")
+
+    async def create_many(tickets):
+        sent.extend(t["subject"] for t in tickets)
+        return {"id": "job2", "status": "queued"}
+
+    monkeypatch.setattr(zendesk_outbox.zendesk, "job_statuses", job_statuses)
+    monkeypatch.setattr(zendesk_outbox.zendesk, "create_many", create_many)
+
+    _run(monkeypatch, repo)
+
+    assert sent == ["s1"]
+    assert repo.job_ids == {"job2": [1]}
+
+
+class _Store(_Repo):
+    """Keeps status/attempts/job_id like the real table."""
+
+    def __init__(self, rows):
+        super().__init__()
+        self.table = {r["id"]: {**r, "status": "pending", "job_id": None} for r in rows}
+
+    async def zendesk_outbox_jobs(self):
+        jobs = {}
+        for r in self.table.values():
+            if r["status"] == "in_flight" and r["job_id"]:
+                jobs.setdefault(r["job_id"], []).append(r["id"])
+        return jobs
+
+    async def claim_zendesk_outbox(self, limit, stale_after_s):
+        claimed = []
+        for r in self.table.values():
+            if r["status"] == "pending" and len(claimed) < limit:
+                r["status"], r["attempts"] = "in_flight", r["attempts"] + 1
+                claimed.append({k: r[k] for k in ("id", "ticket_id", "payload", "attempts")})
+        return claimed
+
+    async def set_zendesk_outbox_job(self, ids, job_id):
+        for i in ids:
+            self.table[i]["job_id"] = job_id
+
+    async def complete_zendesk_outbox(self, done):
+        await super().complete_zendesk_outbox(done)
+        for d in done:
+            self.table[d["id"]]["status"] = "done"
+
+    async def retry_zendesk_outbox(self, ids, *, delay_s, error, max_attempts, count_attempt=True):
+        await super().retry_zendesk_outbox(
+            ids,
+            delay_s=delay_s,
+            error=error,
+            max_attempts=max_attempts,
+            count_attempt=count_attempt,
+        )
+        for i in ids:
+            r = self.table[i]
+            r["status"], r["job_id"] = "pending", None
+            r["attempts"] -= 0 if count_attempt else 1
+
+
+def test_expired_job_is_looked_up_before_resubmitting(monkeypatch):
+    repo = _Store([_row(1, attempts=0)])
+    sent = []
+
+    async def create_many(tickets):
+        sent.extend(t["subject"] for t in tickets)
+        return {"id": "job1", "status": "queued"}
+
+    async def job_statuses(ids):
+        return []  # Zendesk no longer knows job1
+
+    async def find_by_external_id(external_id):
+        return "900" if sent else None
+
+    monkeypatch.setattr(zendesk_outbox.zendesk, "create_many", create_many)
+    monkeypatch.setattr(zendesk_outbox.zendesk, "job_statuses", job_statuses)
+    monkeypatch.setattr(zendesk_outbox.zendesk, "find_by_external_id", find_by_external_id)
+
+    _run(monkeypatch, repo)
+    assert repo.table[1]["job_id"] == "job1"
+    _run(monkeypatch, repo)
+
+    assert sent == ["s1"]
+    assert repo.done == [{"id": 1, "external_id": "900"}]
+    assert repo.table[1]["attempts"] == 2
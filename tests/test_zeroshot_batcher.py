@@ -0,0 +1,167 @@
+import asyncio
+from collections import defaultdict
+
+import pytest
+
+from common.ml.types import Classification
+from worker.jobs.zeroshot_batcher import ZeroShotBatcher
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.lists = defaultdict(list)
+        self.kv = {}
+
+    async def rpush(self, key, value):
+        self.lists[key].append(value)
+
+    async def llen(self, key):
+        return len(self.lists[key])
+
+    async def lpop(self, key, count=None):
+        items, self.lists[key] = self.lists[key][:count], self.lists[key][count:]
+        return items or None
+
+    async def blpop(self, keys, timeout=0):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            for key in keys:
+                if self.lists[key]:
+                    return key, self.lists[key].pop(0)
+            if loop.time() >= deadline:
+                return None
+            await asyncio.sleep(0.001)
+
+    async def set(self, key, value, nx=False, px=None):
+        if nx and key in self.kv:
+            return None
+        self.kv[key] = value
+        return True
+
+    async def get(self, key):
+        return self.kv.get(key)
+
+    async def delete(self, key):
+        self.kv.pop(key, None)
+
+    async def expire(self, key, seconds):
+        return True
+
+    def register_script(self, script):
+        # the only script in use: compare-and-delete of the leader lease
+        async def release(keys, args):
+            if self.kv.get(keys[0]) == args[0]:
+                self.kv.pop(keys[0])
+                return 1
+            return 0
+
+        return release
+
+
+def _label_for(text: str) -> str:
+    return "refund" if "refund" in text else "warranty"
+
+
+@pytest.mark.anyio
+async def test_batcher_runs_concurrent_requests_as_one_batch():
+    batches: list[list[str]] = []
+
+    async def classify_batch(texts):
+        batches.append(list(texts))
+        return [Classification(label=_label_for(t), scores={_label_for(t): 1.0}) for t in texts]
+
+    batcher = ZeroShotBatcher(
+        _FakeRedis(), max_batch=3, max_wait_ms=200, classify_batch=classify_batch, timeout_s=5
+    )
+
+    results = await asyncio.gather(
+        batcher.classify("refund please"),
+        batcher.classify("broken after a week"),
+        batcher.classify("I want a refund"),
+    )
+
+    assert [r.label for r in results] == ["refund", "warranty", "refund"]
+    assert len(batches) == 1
+    assert sorted(batches[0]) == sorted(["refund please", "broken after a week", "I want a refund"])
+
+
+@pytest.mark.anyio
+async def test_batcher_flushes_partial_batch_after_wait():
+    batches: list[list[str]] = []
+
+    async def classify_batch(texts):
+        batches.append(list(texts))
+        return [Classification(label="other", scores={"other": 1.0}) for _ in texts]
+
+    batcher = ZeroShotBatcher(
+        _FakeRedis(), max_batch=32, max_wait_ms=10, classify_batch=classify_batch, timeout_s=5
+    )
+
+    result = await asyncio.wait_for(batcher.classify("hello"), timeout=2)
+
+    assert result.label == "other"
+    assert batches == [["hello"]]
+
+
+@pytest.mark.anyio
+async def test_failed_batch_answers_every_caller_without_waiting_for_timeout():
+    batches: list[list[str]] = []
+
+    async def classify_batch(texts):
+        batches.append(list(texts))
+        if "corrupt" in texts:
+            raise ValueError("bad input")
+        return [Classification(label=_label_for(t), scores={_label_for(t): 1.0}) for t in texts]
+
+    batcher = ZeroShotBatcher(
+        _FakeRedis(), max_batch=3, max_wait_ms=200, classify_batch=classify_batch, timeout_s=30
+    )
+
+    results = await asyncio.wait_for(
+        asyncio.gather(
+            batcher.classify("refund please"),
+            batcher.classify("corrupt"),
+            batcher.classify("broken after a week"),
+            return_exceptions=True,
+        ),
+        timeout=2,
+    )
+
+    assert results[0].label == "refund"
+    assert isinstance(results[1], ValueError)
+    assert results[2].label == "warranty"
+    # one failed batch, then each caller on its own
+    assert len(batches[0]) == 3
+    assert sorted(b[0] for b in batches[1:]) == ["broken after a week", "corrupt", "refund please"]
+
+
+@pytest.mark.anyio
+async def test_leader_does_not_release_a_lease_it_no_longer_holds():
+    redis = _FakeRedis()
+
+    async def classify_batch(texts):
+        # our lease expired and another worker became leader meanwhile
+        redis.kv["zeroshot:leader"] = "someone-else"
+        return [Classification(label="other", scores={"other": 1.0}) for _ in texts]
+
+    batcher = ZeroShotBatcher(
+        redis, max_batch=1, max_wait_ms=0, classify_batch=classify_batch, timeout_s=5
+    )
+
+    await batcher.classify("hello")
+
+    assert redis.kv["zeroshot:leader"] == "someone-else"
+
+
+def test_classify_batch_sync_stub(monkeypatch):
+    from common.ml import zeroshot
+
+    monkeypatch.setattr(zeroshot, "use_stub", lambda: True)
+    results = zeroshot.classify_batch_sync(["a", "b"])
+    assert [r.label for r in results] == ["refund", "refund"]
@@ -1,7 +1,9 @@
 import asyncio
+import logging
 import os
 
-from celery import Celery
+from celery import Celery, chain, chord
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown
 
 from worker.jobs.celery_tasks import (
     _asr_task,
@@ -12,13 +14,19 @@ from worker.jobs.celery_tasks import (
     _normalize_task,
     _fanout_ingested,
     _choose_best_docqa,
+    _enrich_task,
     _create_ticket,
 )
+from common.clients import http
+from common.ml.preload import preload_from_env
+from common.storage import s3
 try:
     from prometheus_client import Counter
 except Exception:
     Counter = None
 
+LOG = logging.getLogger(__name__)
+
 
 broker_url = os.environ.get("REDIS_URL", "redis://redis:6379/0")
 app = Celery(
@@ -28,6 +36,9 @@ app = Celery(
     include=[
         "worker.celery_app",
         "worker.jobs.gmail_poll",
+        "worker.jobs.stripe_sync",
+        "worker.jobs.shopify_sync",
+        "worker.jobs.zendesk_outbox",
     ],
 )
 
@@ -38,6 +49,25 @@ def run_coro(coro):
     return _loop.run_until_complete(coro)
 
 
+@worker_init.connect
+def _preload_models(**_kwargs):
+    # Main process, before the prefork pool forks: children share the
+    # ML_PRELOAD models copy-on-write instead of each loading its own.
+    preload_from_env()
+
+
+@worker_process_init.connect
+def _open_clients(**_kwargs):
+    run_coro(s3.open_client())
+    run_coro(http.open_clients())
+
+
+@worker_process_shutdown.connect
+def _close_clients(**_kwargs):
+    run_coro(http.close_clients())
+    run_coro(s3.close_client())
+
+
 _failure_counter = Counter("shopdesk_pipeline_failures_total", "Pipeline failures", ["step"]) if Counter else None
 
 def mark_failure(step: str) -> None:
@@ -48,6 +78,46 @@ def mark_failure(step: str) -> None:
     except Exception:
         pass
 
+
+def retry_or_skip(task, exc: Exception, step: str):
+    # Stages feeding a chord must eventually finish, otherwise the whole
+    # downstream DAG (and the ticket) is lost. Once retries are exhausted the
+    # stage resolves to None and downstream tasks run with what they have.
+    mark_failure(step)
+    if task.request.retries >= task.max_retries:
+        LOG.error("pipeline step %s gave up after %s retries: %s", step, task.request.retries, exc)
+        return None
+    raise task.retry(exc=exc)
+
+
+def _stage(name: str, arg: str, task_id: str):
+    return app.signature(name, args=[arg], immutable=True).set(task_id=task_id)
+
+
+# asr/docqa/summarize -> docqa_select -> classify | normalize -> enrich -> create_ticket
+def build_pipeline(message_id: str, dispatched: list[dict]):
+    extract = [
+        _stage(f"pipeline.{d['task']}", d["attachment_id"], d["task_id"]) for d in dispatched
+    ]
+    extract.append(_stage("pipeline.summarize", message_id, f"{message_id}:summarize"))
+    # Enrichment only needs the normalized fields, so its external lookups
+    # overlap with classification.
+    finish = chord(
+        [
+            _stage("pipeline.zeroshot", message_id, f"{message_id}:classify"),
+            chain(
+                _stage("pipeline.normalized", message_id, f"{message_id}:normalize"),
+                _stage("pipeline.enrich", message_id, f"{message_id}:enrich"),
+            ),
+        ],
+        _stage("pipeline.create_ticket", message_id, f"{message_id}:ticket"),
+    )
+    return chord(
+        extract,
+        chain(_stage("pipeline.docqa_select", message_id, f"{message_id}:docqa_select"), finish),
+    )
+
+
 @app.task(name="ping")
 def ping():
     return "pong"
@@ -58,8 +128,7 @@ def asr_task(self, attachment_id: str) -> str | None:
     try:
         return run_coro(_asr_task(attachment_id))
     except Exception as exc:
-        mark_failure("asr")
-        raise self.retry(exc=exc)
+        return retry_or_skip(self, exc, "asr")
 
 
 @app.task(name="pipeline.docqa", bind=True, max_retries=3, default_retry_delay=10)
@@ -67,8 +136,7 @@ def docqa_task(self, attachment_id: str) -> dict | None:
     try:
         return run_coro(_docqa_task(attachment_id))
     except Exception as exc:
-        mark_failure("docqa")
-        raise self.retry(exc=exc)
+        return retry_or_skip(self, exc, "docqa")
 
 
 @app.task(name="pipeline.zeroshot", bind=True, max_retries=3, default_retry_delay=10)
@@ -76,8 +144,7 @@ def classify_task(self, message_id: str) -> dict | None:
     try:
         return run_coro(_classify_task(message_id))
     except Exception as exc:
-        mark_failure("classify")
-        raise self.retry(exc=exc)
+        return retry_or_skip(self, exc, "classify")
 
 
 @app.task(name="pipeline.summarize", bind=True, max_retries=3, default_retry_delay=10)
@@ -85,8 +152,7 @@ def summarize_task(self, message_id: str) -> dict | None:
     try:
         return run_coro(_summarize_task(message_id))
     except Exception as exc:
-        mark_failure("summarize")
-        raise self.retry(exc=exc)
+        return retry_or_skip(self, exc, "summarize")
 
 
 @app.task(name="pipeline.vqa", bind=True, max_retries=3, default_retry_delay=10)
@@ -103,8 +169,7 @@ def normalized_task(self, message_id: str) -> dict | None:
     try:
         return run_coro(_normalize_task(message_id))
     except Exception as exc:
-        mark_failure("normalize")
-        raise self.retry(exc=exc)
+        return retry_or_skip(self, exc, "normalize")
 
 
 @app.task(name="pipeline.ingested", bind=True, max_retries=3, default_retry_delay=10)
@@ -121,8 +186,15 @@ def choose_docqa_task(self, message_id: str) -> dict | None:
     try:
         return run_coro(_choose_best_docqa(message_id))
     except Exception as exc:
-        mark_failure("docqa_select")
-        raise self.retry(exc=exc)
+        return retry_or_skip(self, exc, "docqa_select")
+
+
+@app.task(name="pipeline.enrich", bind=True, max_retries=1, default_retry_delay=5)
+def enrich_task(self, message_id: str) -> dict | None:
+    try:
+        return run_coro(_enrich_task(message_id))
+    except Exception as exc:
+        return retry_or_skip(self, exc, "enrich")
 
 
 @app.task(name="pipeline.create_ticket", bind=True, max_retries=3, default_retry_delay=10)
@@ -136,25 +208,38 @@ def create_ticket_task(self, message_id: str) -> dict | None:
 
 @app.task(name="pipeline.run", bind=True, max_retries=0)
 def run_pipeline(self, message_id: str) -> None:
+    # Fanout looks up the attachments and starts the rest of the DAG itself
+    # (see build_pipeline), so every stage starts as soon as its inputs exist.
     app.send_task("pipeline.ingested", args=[message_id], task_id=f"{message_id}:ingested")
-    app.send_task("pipeline.docqa_select", args=[message_id], task_id=f"{message_id}:docqa_select", countdown=15)
-    app.send_task("pipeline.zeroshot", args=[message_id], task_id=f"{message_id}:classify", countdown=5)
-    app.send_task("pipeline.summarize", args=[message_id], task_id=f"{message_id}:summarize", countdown=5)
-    app.send_task("pipeline.normalized", args=[message_id], task_id=f"{message_id}:normalize", countdown=20)
-    app.send_task("pipeline.create_ticket", args=[message_id], task_id=f"{message_id}:ticket", countdown=25)
     return None
 
 
 app.conf.beat_schedule = {
-    "gmail-poll-every-60s": {
+    # Dispatches due mailboxes; each mailbox has its own poll_interval_s.
+    "gmail-poll-tick": {
         "task": "worker.jobs.gmail_poll.poll_gmail",
-        "schedule": 60.0,
+        "schedule": float(os.environ.get("GMAIL_TICK_SECONDS", "10")),
         "args": (25,),
-    }
+    },
+    "stripe-charge-sync": {
+        "task": "sync.stripe_charges",
+        "schedule": float(os.environ.get("STRIPE_SYNC_SECONDS", "60")),
+    },
+    "shopify-order-sync": {
+        "task": "sync.shopify_orders",
+        "schedule": float(os.environ.get("SHOPIFY_SYNC_SECONDS", "60")),
+    },
+    "zendesk-outbox": {
+        "task": "outbox.zendesk",
+        "schedule": float(os.environ.get("ZENDESK_OUTBOX_SECONDS", "5")),
+    },
 }
 app.conf.timezone = "UTC"
 
 import worker.jobs.gmail_poll
+import worker.jobs.stripe_sync
+import worker.jobs.shopify_sync
+import worker.jobs.zendesk_outbox
 
 if __name__ == "__main__":
     res = ping.delay()
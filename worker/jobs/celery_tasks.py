@@ -5,18 +5,69 @@ from datetime import datetime
 from api.app.db import SessionLocal
 from api.app.config import settings
 from common.db.dao import MessageRepository
+from common.metrics import counter
+from common.ml import asr, docqa, model_version, remote, vqa
 from common.ml.asr import transcribe
-from common.ml.docqa import extract_fields
-from common.ml.zeroshot import classify
-from common.ml.types import Classification, DocFields
+from common.ml.docqa import extract_document
+from worker.jobs.zeroshot_batcher import classify
+from common.ml.types import Classification, DocExtraction, DocFields, Transcript
 from common.storage.s3 import AttachmentStorage
 from common.ml.vqa import is_damaged
 from common.norm.merger import merge_fields
-from common.clients import shopify, stripe, zendesk
+from common.enrich import enrich, parse_amount
 
 
-async def _get_existing(repo: MessageRepository, message_id: str, type_: str):
-    return await repo.get_last_event(message_id=str(message_id), type_=type_)
+ML_CACHE_LOOKUPS = counter(
+    "shopdesk_ml_cache_lookups_total",
+    "ML result cache lookups by stage and outcome",
+    ["stage", "result"],
+)
+
+
+async def _get_state(repo: MessageRepository, message_id: str) -> dict:
+    return await repo.get_pipeline_state(str(message_id))
+
+
+async def _model_version(stage: str, version: str) -> str:
+    # Behind a model server the server's models produce the result, so its
+    # version keys the cache, not the backend this worker was configured with.
+    if remote.enabled():
+        return await remote.model_version(stage)
+    return model_version(version)
+
+
+async def _cached_result(
+    repo: MessageRepository, content_hash: str | None, stage: str, version: str
+) -> dict | None:
+    # Attachments are content-addressed: the same bytes always produce the same
+    # model output, so a re-sent invoice or voice note skips download and inference.
+    if not content_hash:
+        return None
+    result = await repo.get_ml_result(
+        content_hash=content_hash,
+        stage=stage,
+        model_version=await _model_version(stage, version),
+    )
+    ML_CACHE_LOOKUPS.labels(stage=stage, result="miss" if result is None else "hit").inc()
+    return result
+
+
+async def _store_result(
+    repo: MessageRepository, content_hash: str, stage: str, version: str, result: dict
+) -> None:
+    await repo.put_ml_result(
+        content_hash=content_hash,
+        stage=stage,
+        model_version=await _model_version(stage, version),
+        result=result,
+    )
+
+
+def _docqa_score(payload: dict):
+    fields = payload.get("fields") or {}
+    conf = fields.get("confidence") or {}
+    has_order = 1 if fields.get("order_id") else 0
+    return (has_order, conf.get("order_id", 0.0), conf.get("amount", 0.0))
 
 
 async def _asr_task(attachment_id: str) -> str | None:
@@ -24,24 +75,34 @@ async def _asr_task(attachment_id: str) -> str | None:
         repo = MessageRepository(session)
         row = (
             await session.execute(
-                text("select message_id, s3_key, mime from attachments where id = :id"),
+                text(
+                    "select message_id, s3_key, mime, hash_sha256 from attachments where id = :id"
+                ),
                 {"id": attachment_id},
             )
         ).first()
         if not row:
             return None
 
-        existing = await _get_existing(repo, row.message_id, "ASR_DONE")
-        if existing:
-            return existing
-
-        storage = AttachmentStorage()
-        obj = await storage.get(row.s3_key)
-        mime = row.mime or obj.get("mime") or "application/octet-stream"
-        if not mime.startswith("audio/"):
-            return None
+        state = await _get_state(repo, row.message_id)
+        if state.get("asr_text") is not None:
+            return state["asr_text"]
 
-        transc = await transcribe(obj["data"], mime)
+        cached = await _cached_result(repo, row.hash_sha256, "asr", asr.MODEL_VERSION)
+        if cached is not None:
+            transc = Transcript(**cached)
+        else:
+            storage = AttachmentStorage()
+            obj = await storage.fetch(row.s3_key)
+            mime = row.mime or obj.get("mime") or "application/octet-stream"
+            if not mime.startswith("audio/"):
+                return None
+
+            transc = await transcribe(obj["path"], mime)
+            if row.hash_sha256:
+                await _store_result(
+                    repo, row.hash_sha256, "asr", asr.MODEL_VERSION, transc.model_dump()
+                )
 
         await repo.insert_event(
             ticket_id=None,
@@ -54,9 +115,14 @@ async def _asr_task(attachment_id: str) -> str | None:
                 "confidence": transc.confidence,
             },
         )
+        await repo.update_pipeline_state(
+            message_id=str(row.message_id),
+            asr_attachment_id=str(attachment_id),
+            asr_text=transc.text,
+            asr_confidence=transc.confidence,
+        )
         await session.commit()
         return transc.text
-    
 
 
 async def _docqa_task(attachment_id: str) -> dict | None:
@@ -64,28 +130,48 @@ async def _docqa_task(attachment_id: str) -> dict | None:
         repo = MessageRepository(session)
         row = (
             await session.execute(
-                text("select message_id, s3_key, mime from attachments where id = :id"),
+                text(
+                    "select message_id, s3_key, mime, hash_sha256 from attachments where id = :id"
+                ),
                 {"id": attachment_id},
             )
         ).first()
         if not row:
             return None
 
-        existing = await _get_existing(repo, row.message_id, "DOCQA_DONE")
-        if existing:
-            return existing
-
-        storage = AttachmentStorage()
-        obj = await storage.get(row.s3_key)
-        mime = row.mime or obj.get("mime") or "application/octet-stream"
-        if not (mime.startswith("application/pdf") or mime.startswith("image/")):
-            return None
+        state = await _get_state(repo, row.message_id)
+        done = (state.get("docqa") or {}).get(str(attachment_id))
+        if done is not None:
+            return {
+                "attachment_id": str(attachment_id),
+                "message_id": str(row.message_id),
+                "fields": done,
+            }
 
-        fields = await extract_fields(obj["data"], mime)
+        cached = await _cached_result(repo, row.hash_sha256, "docqa", docqa.MODEL_VERSION)
+        if cached is not None:
+            extraction = DocExtraction(**cached)
+        else:
+            storage = AttachmentStorage()
+            obj = await storage.fetch(row.s3_key)
+            mime = row.mime or obj.get("mime") or "application/octet-stream"
+            if not (mime.startswith("application/pdf") or mime.startswith("image/")):
+                return None
+
+            extraction = await extract_document(obj["path"], mime)
+            if row.hash_sha256 and extraction.path != "error":
+                await _store_result(
+                    repo,
+                    row.hash_sha256,
+                    "docqa",
+                    docqa.MODEL_VERSION,
+                    extraction.model_dump(mode="json"),
+                )
         payload = {
             "attachment_id": str(attachment_id),
             "message_id": str(row.message_id),
-            "fields": fields.model_dump(),
+            "fields": extraction.fields.model_dump(),
+            "path": extraction.path,
         }
 
         await repo.insert_event(
@@ -94,6 +180,12 @@ async def _docqa_task(attachment_id: str) -> dict | None:
             type_="DOCQA_DONE",
             payload=payload,
         )
+        await repo.merge_pipeline_state(
+            message_id=str(row.message_id),
+            column="docqa",
+            key=str(attachment_id),
+            value=payload["fields"],
+        )
         await session.commit()
         return payload
 
@@ -111,14 +203,17 @@ async def _classify_task(message_id: str) -> dict | None:
         if not row:
             return None
 
-        existing = await _get_existing(repo, row.id, "CLASSIFY_DONE")
-        if existing:
-            return existing
+        state = await _get_state(repo, row.id)
+        if state.get("classify_label") is not None:
+            return {
+                "message_id": str(row.id),
+                "label": state["classify_label"],
+                "scores": state.get("classify_scores") or {},
+            }
 
         text_body = row.body_text or ""
-        asr_event = await _get_existing(repo, row.id, "ASR_DONE")
-        if asr_event and isinstance(asr_event, dict):
-            text_body = f"{text_body}\n{asr_event.get('text','')}".strip()
+        if state.get("asr_text"):
+            text_body = f"{text_body}\n{state['asr_text']}".strip()
 
         classification: Classification = await classify(text_body)
         payload = {
@@ -133,9 +228,13 @@ async def _classify_task(message_id: str) -> dict | None:
             type_="CLASSIFY_DONE",
             payload=payload,
         )
+        await repo.update_pipeline_state(
+            message_id=str(row.id),
+            classify_label=classification.label,
+            classify_scores=classification.scores,
+        )
         await session.commit()
         return payload
-    
 
 
 async def _summarize_task(message_id: str) -> dict | None:
@@ -150,10 +249,10 @@ async def _summarize_task(message_id: str) -> dict | None:
         if not row:
             return None
 
-        existing = await _get_existing(repo, row.id, "SUMMARY_DONE")
-        if existing:
-            return existing
-        
+        state = await _get_state(repo, row.id)
+        if state.get("summary") is not None:
+            return {"message_id": str(row.id), "summary": state["summary"]}
+
         summary_text = (row.body_text or "")[:500]
         payload = {"message_id": str(row.id), "summary": summary_text}
         await repo.insert_event(
@@ -162,6 +261,7 @@ async def _summarize_task(message_id: str) -> dict | None:
             type_="SUMMARY_DONE",
             payload=payload,
         )
+        await repo.update_pipeline_state(message_id=str(row.id), summary=summary_text)
         await session.commit()
         return payload
 
@@ -172,45 +272,68 @@ async def _is_damaged_task(attachment_id: str) -> bool | None:
         repo = MessageRepository(session)
         row = (
             await session.execute(
-                text("select message_id, s3_key, mime from attachments where id = :id"),
+                text(
+                    "select message_id, s3_key, mime, hash_sha256 from attachments where id = :id"
+                ),
                 {"id": attachment_id},
             )
         ).first()
         if not row:
             return None
 
-        existing = await _get_existing(repo, row.message_id, "VQA_DONE")
-        if existing:
-            return existing
+        state = await _get_state(repo, row.message_id)
+        done = (state.get("vqa") or {}).get(str(attachment_id))
+        if done is not None:
+            return done.get("is_damaged")
 
-        storage = AttachmentStorage()
-        obj = await storage.get(row.s3_key)
-        mime = row.mime or obj.get("mime") or "application/octet-stream"
-
-        unsupported_reason = None
-        if not (mime.startswith("application/pdf") or mime.startswith("image/")):
-            unsupported_reason = "unsupported_mime"
-        elif mime.startswith("application/pdf"):
-            unsupported_reason = "pdf_not_supported"
-
-        if unsupported_reason:
-            payload = {
-                "attachment_id": str(attachment_id),
-                "message_id": str(row.message_id),
-                "is_damaged": None,
-                "reason": unsupported_reason,
-                "mime": mime,
-            }
-            await repo.insert_event(
-                ticket_id=None,
-                message_id=str(row.message_id),
-                type_="VQA_DONE",
-                payload=payload,
-            )
-            await session.commit()
-            return None
+        cached = await _cached_result(repo, row.hash_sha256, "vqa", vqa.MODEL_VERSION)
+        if cached is not None:
+            damaged = cached["is_damaged"]
+            mime = row.mime or cached.get("mime")
+        else:
+            storage = AttachmentStorage()
+            obj = await storage.fetch(row.s3_key)
+            mime = row.mime or obj.get("mime") or "application/octet-stream"
+
+            unsupported_reason = None
+            if not (mime.startswith("application/pdf") or mime.startswith("image/")):
+                unsupported_reason = "unsupported_mime"
+            elif mime.startswith("application/pdf"):
+                unsupported_reason = "pdf_not_supported"
+
+            if unsupported_reason:
+                payload = {
+                    "attachment_id": str(attachment_id),
+                    "message_id": str(row.message_id),
+                    "is_damaged": None,
+                    "reason": unsupported_reason,
+                    "mime": mime,
+                }
+                await repo.insert_event(
+                    ticket_id=None,
+                    message_id=str(row.message_id),
+                    type_="VQA_DONE",
+                    payload=payload,
+                )
+                await repo.merge_pipeline_state(
+                    message_id=str(row.message_id),
+                    column="vqa",
+                    key=str(attachment_id),
+                    value=payload,
+                )
+                await session.commit()
+                return None
+
+            damaged = await is_damaged(obj["path"])
+            if row.hash_sha256:
+                await _store_result(
+                    repo,
+                    row.hash_sha256,
+                    "vqa",
+                    vqa.MODEL_VERSION,
+                    {"is_damaged": damaged, "mime": mime},
+                )
 
-        damaged = await is_damaged(obj["data"])
         payload = {
             "attachment_id": str(attachment_id),
             "message_id": str(row.message_id),
@@ -224,6 +347,12 @@ async def _is_damaged_task(attachment_id: str) -> bool | None:
             type_="VQA_DONE",
             payload=payload,
         )
+        await repo.merge_pipeline_state(
+            message_id=str(row.message_id),
+            column="vqa",
+            key=str(attachment_id),
+            value=payload,
+        )
         await session.commit()
         return damaged
 
@@ -240,16 +369,17 @@ async def _normalize_task(message_id: str) -> dict | None:
         if not row:
             return None
 
-        existing = await _get_existing(repo, row.id, "NORMALIZE_DONE")
-        if existing:
-            return existing
+        state = await _get_state(repo, row.id)
+        if state.get("normalized") is not None:
+            return {"message_id": str(row.id), "normalized": state["normalized"]}
 
-        docqa_event = await _get_existing(repo, row.id, "DOCQA_DONE") or {}
-        asr_event = await _get_existing(repo, row.id, "ASR_DONE") or {}
+        selected = state.get("selected_fields")
+        if not selected and state.get("docqa"):
+            selected = max(
+                ({"fields": f} for f in state["docqa"].values()), key=_docqa_score
+            )["fields"]
 
-        doc_fields = DocFields(
-            **(docqa_event.get("fields") or {}),
-        ) if docqa_event.get("fields") else DocFields(
+        doc_fields = DocFields(**selected) if selected else DocFields(
             order_id=None,
             amount=None,
             currency=None,
@@ -259,9 +389,7 @@ async def _normalize_task(message_id: str) -> dict | None:
         )
 
         body_text = row.body_text or ""
-        transcript = ""
-        if isinstance(asr_event, dict):
-            transcript = asr_event.get("text") or ""
+        transcript = state.get("asr_text") or ""
 
         normalized = merge_fields(doc_fields, body_text, transcript)
         payload = {
@@ -274,6 +402,7 @@ async def _normalize_task(message_id: str) -> dict | None:
             type_="NORMALIZE_DONE",
             payload=payload,
         )
+        await repo.update_pipeline_state(message_id=str(row.id), normalized=payload["normalized"])
         await session.commit()
         return payload
 
@@ -292,13 +421,13 @@ async def _get_attachments_for_fanout(message_id: str) -> list[dict]:
 
 
 async def _fanout_ingested(message_id: str) -> dict:
-    from worker.celery_app import app
+    from worker.celery_app import build_pipeline
 
     async with SessionLocal() as session:
         repo = MessageRepository(session)
-        existing = await _get_existing(repo, message_id, "INGESTED_FANOUT")
-        if existing:
-            return existing
+        state = await _get_state(repo, message_id)
+        if state.get("fanout") is not None:
+            return {"message_id": str(message_id), "dispatched": state["fanout"]}
 
     attachments = await _get_attachments_for_fanout(message_id)
     dispatched: list[dict] = []
@@ -307,13 +436,13 @@ async def _fanout_ingested(message_id: str) -> dict:
         mime = att.get("mime") or ""
         if mime.startswith("audio/"):
             tid = f"{message_id}:asr:{att_id}"
-            app.send_task("pipeline.asr", args=[att_id], task_id=tid)
             dispatched.append({"task": "asr", "attachment_id": att_id, "task_id": tid})
         elif mime.startswith("application/pdf") or mime.startswith("image/"):
             tid = f"{message_id}:docqa:{att_id}"
-            app.send_task("pipeline.docqa", args=[att_id], task_id=tid)
             dispatched.append({"task": "docqa", "attachment_id": att_id, "task_id": tid})
 
+    build_pipeline(str(message_id), dispatched).apply_async()
+
     payload = {"message_id": str(message_id), "dispatched": dispatched}
     async with SessionLocal() as session:
         repo = MessageRepository(session)
@@ -323,6 +452,7 @@ async def _fanout_ingested(message_id: str) -> dict:
             type_="INGESTED_FANOUT",
             payload=payload,
         )
+        await repo.update_pipeline_state(message_id=str(message_id), fanout=dispatched)
         await session.commit()
     return payload
 
@@ -330,33 +460,22 @@ async def _fanout_ingested(message_id: str) -> dict:
 async def _choose_best_docqa(message_id: str) -> dict | None:
     async with SessionLocal() as session:
         repo = MessageRepository(session)
-        existing = await _get_existing(repo, message_id, "DOCQA_SELECTED")
-        if existing:
-            return existing
+        state = await _get_state(repo, message_id)
+        if state.get("selected_fields") is not None:
+            return {
+                "message_id": str(message_id),
+                "attachment_id": str(state.get("selected_attachment_id")),
+                "fields": state["selected_fields"],
+            }
 
-        result = await session.execute(
-            text(
-                """
-                select payload
-                from events
-                where type = 'DOCQA_DONE'
-                  and payload->>'message_id' = :mid
-                order by ts desc
-                """
-            ),
-            {"mid": message_id},
-        )
-        rows = result.mappings().all()
-        if not rows:
+        candidates = [
+            {"attachment_id": att_id, "fields": fields}
+            for att_id, fields in (state.get("docqa") or {}).items()
+        ]
+        if not candidates:
             return None
 
-        def score(payload: dict):
-            fields = payload.get("fields") or {}
-            conf = fields.get("confidence") or {}
-            has_order = 1 if fields.get("order_id") else 0
-            return (has_order, conf.get("order_id", 0.0), conf.get("amount", 0.0))
-
-        best_payload = max((r["payload"] for r in rows if r.get("payload")), key=score, default=None)
+        best_payload = max(candidates, key=_docqa_score, default=None)
         if not best_payload:
             return None
 
@@ -371,6 +490,72 @@ async def _choose_best_docqa(message_id: str) -> dict | None:
             type_="DOCQA_SELECTED",
             payload=payload,
         )
+        await repo.update_pipeline_state(
+            message_id=str(message_id),
+            selected_attachment_id=payload["attachment_id"],
+            selected_fields=payload["fields"],
+        )
+        await session.commit()
+        return payload
+
+
+def _order_hints(state: dict) -> tuple:
+    normalized = state.get("normalized")
+    doc_fields = state.get("selected_fields")
+    order_id = amount = sku = None
+    if isinstance(normalized, dict):
+        order_id = normalized.get("order_id")
+        amount = normalized.get("amount")
+        sku = normalized.get("sku")
+    if isinstance(doc_fields, dict):
+        order_id = order_id or doc_fields.get("order_id")
+        sku = sku or doc_fields.get("sku")
+    return order_id, amount, sku
+
+
+async def _attachment_keys(session, message_id: str) -> list[str]:
+    keys = (
+        await session.execute(
+            text("select s3_key from attachments where message_id = :mid"),
+            {"mid": message_id},
+        )
+    ).scalars().all()
+    return list(keys)
+
+
+async def _run_enrichment(session, message_id: str, state: dict) -> dict:
+    message_row = (
+        await session.execute(
+            text("select from_addr from messages where id = :mid"),
+            {"mid": message_id},
+        )
+    ).first()
+    s3_keys = await _attachment_keys(session, message_id)
+    order_id, amount, sku = _order_hints(state)
+    return await enrich(
+        order_id=order_id,
+        email=message_row.from_addr if message_row else None,
+        amount=amount,
+        sku=sku,
+        s3_keys=s3_keys,
+    )
+
+
+async def _enrich_task(message_id: str) -> dict:
+    async with SessionLocal() as session:
+        repo = MessageRepository(session)
+        state = await _get_state(repo, message_id)
+        if state.get("enrichment") is not None:
+            return state["enrichment"]
+
+        payload = await _run_enrichment(session, message_id, state)
+        await repo.insert_event(
+            ticket_id=None,
+            message_id=str(message_id),
+            type_="ENRICHED",
+            payload=payload,
+        )
+        await repo.update_pipeline_state(message_id=str(message_id), enrichment=payload)
         await session.commit()
         return payload
 
@@ -378,69 +563,21 @@ async def _choose_best_docqa(message_id: str) -> dict | None:
 async def _create_ticket(message_id: str) -> dict | None:
     async with SessionLocal() as session:
         repo = MessageRepository(session)
-        existing = await _get_existing(repo, message_id, "TICKET_CREATED")
+        state = await _get_state(repo, message_id)
+        existing = state.get("ticket")
         if existing and existing.get("summary_payload"):
             return existing
 
-        classify_event = await _get_existing(repo, message_id, "CLASSIFY_DONE") or {}
-        summary_event = await _get_existing(repo, message_id, "SUMMARY_DONE") or {}
-        normalize_event = await _get_existing(repo, message_id, "NORMALIZE_DONE") or {}
-        selected_docqa = await _get_existing(repo, message_id, "DOCQA_SELECTED") or {}
-        message_row = (
-            await session.execute(
-                text("select from_addr from messages where id = :mid"),
-                {"mid": message_id}
-            )
-        ).first()
-        from_addr = message_row.from_addr if message_row else None
-
-        summary_text = summary_event.get("summary") if isinstance(summary_event, dict) else ""
-        route = classify_event.get("label") if isinstance(classify_event, dict) else None
-        normalized = normalize_event.get("normalized") if isinstance(normalize_event, dict) else None
-        doc_fields = selected_docqa.get("fields") if isinstance(selected_docqa, dict) else None
-
-        order_id = None
-        amount = None
-        if isinstance(normalized, dict):
-            order_id = normalized.get("order_id") or order_id
-            amount = normalized.get("amount")
-        if isinstance(doc_fields, dict):
-            order_id = order_id or doc_fields.get("order_id")
-
-        shopify_data = None
-        stripe_data = None
-        shopify_error = None
-        stripe_error = None
-        try:
-            if order_id:
-                shopify_data = await shopify.get_order(order_id)
-        except Exception as exc:
-            shopify_error = str(exc)
-
-        try:
-            amount_val = None
-            if amount is not None:
-                try:
-                    amount_val = float(str(amount).replace("$", "").replace(",", ""))
-                except Exception:
-                    amount_val = None
-            stripe_data = await stripe.find_charge(order_id=order_id, email=from_addr, amount=amount_val)
-        except Exception as exc:
-            stripe_error = str(exc)
-
-        summary_payload = {
-            "order_id": order_id,
-            "shopify": shopify_data,
-            "stripe": stripe_data,
-            "source": {
-                "shopify": "hit" if shopify_data else "miss",
-                "stripe": "hit" if stripe_data else "miss",
-            },
-            "errors": {
-                "shopify": shopify_error,
-                "stripe": stripe_error,
-            },
-        }
+        summary_text = state.get("summary")
+        route = state.get("classify_label")
+        normalized = state.get("normalized")
+        doc_fields = state.get("selected_fields")
+        order_id, amount, _ = _order_hints(state)
+
+        # Normally filled by pipeline.enrich; run it here if that stage gave up.
+        summary_payload = state.get("enrichment") or await _run_enrichment(
+            session, message_id, state
+        )
 
         ticket_row = (
             await session.execute(
@@ -501,61 +638,38 @@ async def _create_ticket(message_id: str) -> dict | None:
             type_="TICKET_CREATED",
             payload=payload,
         )
-        await session.commit()
-
-        try:
-            custom_fields = []
-            if settings.zendesk_field_order_id and order_id:
-                custom_fields.append({"id": settings.zendesk_field_order_id, "value": order_id})
-            if settings.zendesk_field_amount and amount is not None:
-                try:
-                    amt_float = float(str(amount).replace("$", "").replace(",", ""))
-                except Exception:
-                    amt_float = None
-                if amt_float is not None:
-                    custom_fields.append({"id": settings.zendesk_field_amount, "value": amt_float})
-            if settings.zendesk_field_route and route:
-                custom_fields.append({"id": settings.zendesk_field_route, "value": route})
-            if settings.zendesk_field_priority:
-                priority_val = route if route in ("urgent", "high", "normal", "low") else "normal"
-                custom_fields.append({"id": settings.zendesk_field_priority, "value": priority_val})
-
-
-            attachments_url: list[str] = []
-            att_rows = (
-                await session.execute(
-                    text("select id, s3_key from attachments where message_id = :mid"),
-                    {"mid": message_id},
-                )
-            ).mappings().all()
+        await repo.update_pipeline_state(
+            message_id=str(message_id), ticket_id=ticket_id, ticket=payload
+        )
 
-            storage = AttachmentStorage()
-            for r in att_rows:
-                try:
-                    url = await storage.presign(r["s3_key"])
-                    attachments_url.append(url)
-                except Exception:
-                    continue
-
-            comment_body = summary_text or ""
-            if attachments_url:
-                comment_body = f"{comment_body}\n\nAttachments:\n" + "\n".join(attachments_url)
-
-            zd_ticket_payload = {
+        custom_fields = []
+        if settings.zendesk_field_order_id and order_id:
+            custom_fields.append({"id": settings.zendesk_field_order_id, "value": order_id})
+        if settings.zendesk_field_amount and amount is not None:
+            amt_float = parse_amount(amount)
+            if amt_float is not None:
+                custom_fields.append({"id": settings.zendesk_field_amount, "value": amt_float})
+        if settings.zendesk_field_route and route:
+            custom_fields.append({"id": settings.zendesk_field_route, "value": route})
+        if settings.zendesk_field_priority:
+            priority_val = route if route in ("urgent", "high", "normal", "low") else "normal"
+            custom_fields.append({"id": settings.zendesk_field_priority, "value": priority_val})
+
+        # Delivered by worker.jobs.zendesk_outbox; committed together with the
+        # ticket so it can neither be lost nor sent for a rolled-back ticket.
+        # Attachment links are presigned by the dispatcher at send time; a
+        # row can sit in the outbox far longer than a presigned URL lives.
+        await repo.enqueue_zendesk_ticket(
+            ticket_id=ticket_id,
+            payload={
                 "subject": f"{route or 'ticket'} for {order_id or ticket_id}",
-                "comment": {"body": comment_body, "public": False},
+                "comment": {"body": summary_text or "", "public": False},
+                "attachment_keys": await _attachment_keys(session, message_id),
                 "custom_fields": custom_fields,
                 "priority": "normal",
-            }
-            external_id = await zendesk.create_ticket(zd_ticket_payload)
-            if external_id:
-                await session.execute(
-                    text("update tickets set external_id = :ext where id = :tid"),
-                    {"ext": external_id, "tid": ticket_id},
-                )
-                await session.commit()
-
-        except Exception:
-            pass
+                "external_id": ticket_id,
+            },
+        )
+        await session.commit()
 
         return payload
@@ -5,61 +5,158 @@ import email.utils
 import logging
 from datetime import datetime, timezone
 
+import anyio
+import redis.asyncio as aioredis
 from google.oauth2.credentials import Credentials
+from googleapiclient.errors import HttpError
+from redis.exceptions import LockError
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from worker.celery_app import app
+from worker.celery_app import app, run_coro
 from common.clients.gmail_client import GmailClient
-from common.ingest.email_parser import parse_email
-from common.storage.s3 import AttachmentStorage
+from common.ingest.email_parser import parse_email, parse_headers
+from common.storage.s3 import AttachmentStorage, hash_bytes
 from api.app.config import settings
 from api.app.db import SessionLocal
 from common.db.dao import MessageRepository
 
 LOG = logging.getLogger(__name__)
 
+MAILBOX_LOCK_KEY = "gmail:mailbox:{}"
 
-def _load_gmail_creds() -> Credentials:
-    token_path = settings.gmail_service_account_file or settings.gmail_user
+
+def _load_gmail_creds(credentials_file: str | None = None) -> Credentials:
+    token_path = credentials_file or settings.gmail_service_account_file or settings.gmail_user
     return Credentials.from_authorized_user_file(
         token_path, ["https://www.googleapis.com/auth/gmail.readonly"]
     )
 
 
+@app.task(name="worker.jobs.gmail_poll.poll_gmail")
+def poll_gmail(newest_n: int = 25):
+    # Scheduler tick: hands each due mailbox to poll_mailbox, so any worker
+    # can pick it up and M mailboxes spread over N workers.
+    addresses = run_coro(_claim_due_mailboxes())
+    for address in addresses:
+        poll_mailbox.apply_async(args=[address, newest_n])
+    return addresses
+
+
 @app.task(
-    name="worker.jobs.gmail_poll.poll_gmail",
+    name="worker.jobs.gmail_poll.poll_mailbox",
     bind=True,
     max_retries=3,
     default_retry_delay=10,
 )
-
-def poll_gmail(self, newest_n: int = 25):
+def poll_mailbox(self, address: str, newest_n: int = 25):
     try:
-        asyncio.run(_poll_gmail_async(newest_n=newest_n))
+        return run_coro(_poll_mailbox_locked(address, newest_n=newest_n))
     except Exception as e:
-        LOG.exception("gmail poll failed")
+        LOG.exception("gmail poll failed for %s", address)
         raise self.retry(exc=e)
 
 
-async def _poll_gmail_async(newest_n: int = 25):
-    creds = _load_gmail_creds()
-    client = GmailClient(creds)
-    query = settings.gmail_query or "newer_than:1d"
-    message_ids = client.list_message_ids(query=query, max_results=newest_n)
-    LOG.info("Gmail poll: %s messages", len(message_ids))
-
+async def _claim_due_mailboxes() -> list[str]:
+    async with SessionLocal() as session:
+        repo = MessageRepository(session)
+        if settings.gmail_user:
+            # single-account deployments configured through settings only
+            await repo.ensure_mailbox(settings.gmail_user)
+        addresses = await repo.claim_due_mailboxes()
+        await session.commit()
+    return addresses
+
+
+async def _poll_mailbox_locked(address: str, newest_n: int = 25) -> bool:
+    redis = aioredis.from_url(settings.redis_url)
+    lock = redis.lock(
+        MAILBOX_LOCK_KEY.format(address), timeout=settings.gmail_mailbox_lock_seconds
+    )
+    try:
+        if not await lock.acquire(blocking=False):
+            LOG.info("Gmail mailbox %s is being polled elsewhere, skipping", address)
+            return False
+        try:
+            await _poll_gmail_async(address, newest_n=newest_n)
+        finally:
+            try:
+                await lock.release()
+            except LockError:
+                LOG.warning("Gmail mailbox lock for %s expired during the poll", address)
+        return True
+    finally:
+        await redis.aclose()
+
+
+def _list_new_ids(
+    client: GmailClient, mailbox: dict, history_id: str | None, newest_n: int
+) -> tuple[list[str], str]:
+    label_ids = mailbox.get("label_ids") or settings.gmail_label_ids
+    label_id = label_ids[0] if label_ids else None
+    if history_id:
+        try:
+            return client.list_history(history_id, label_id=label_id)
+        except HttpError as exc:
+            if exc.resp.status != 404:
+                raise
+            LOG.warning("Gmail history %s expired, falling back to a full list", history_id)
+    # Read the checkpoint before listing so nothing that arrives in between is skipped.
+    current = client.get_history_id()
+    query = mailbox.get("query") or settings.gmail_query or "newer_than:1d"
+    return client.list_message_ids(query=query, max_results=newest_n), current
+
+
+async def _poll_gmail_async(address: str, newest_n: int = 25):
     async with SessionLocal() as session:
         repo = MessageRepository(session)
-        for mid in message_ids:
-            await _process_message(mid, client, repo, session)
+        mailbox = await repo.get_mailbox(address) or {"address": address}
+        creds = _load_gmail_creds(mailbox.get("credentials_file"))
+        client = GmailClient(creds)
+
+        history_id = mailbox.get("history_id") or settings.gmail_history_start
+        # googleapiclient is blocking; keep it off the event loop.
+        message_ids, next_history_id = await anyio.to_thread.run_sync(
+            _list_new_ids, client, mailbox, history_id, newest_n
+        )
+        known = await repo.known_gmail_ids(message_ids)
+        new_ids = [mid for mid in message_ids if mid not in known]
+        LOG.info(
+            "Gmail poll %s: %s listed, %s new since history %s",
+            address,
+            len(message_ids),
+            len(new_ids),
+            history_id,
+        )
 
+        limit = asyncio.Semaphore(settings.gmail_process_concurrency)
 
-async def _process_message(mid: str, client: GmailClient, repo: MessageRepository, session: AsyncSession):
-    s3 = AttachmentStorage()
-    headers = client.get_headers(mid)
-    raw = client.get_raw_message(mid)
+        async def process(mid: str, raw: bytes) -> None:
+            async with limit:
+                await _process_message(mid, raw)
 
+        batch_size = settings.gmail_batch_size
+        for i in range(0, len(new_ids), batch_size):
+            raws = await anyio.to_thread.run_sync(
+                client.get_raw_messages, new_ids[i : i + batch_size], batch_size
+            )
+            await asyncio.gather(*(process(mid, raw) for mid, raw in raws.items()))
+
+        # Only advance once every new message is stored; a failed tick retries
+        # from the same checkpoint.
+        await repo.set_mailbox_history_id(address, next_history_id)
+        await repo.mark_mailbox_polled(address)
+        await session.commit()
+
+
+async def _process_message(mid: str, raw: bytes) -> None:
+    async with SessionLocal() as session:
+        await _store_message(mid, raw, MessageRepository(session), session)
+
+
+async def _store_message(mid: str, raw: bytes, repo: MessageRepository, session: AsyncSession):
+    s3 = AttachmentStorage()
+    headers = parse_headers(raw)
     body_text, atts = parse_email(raw)
 
     try:
@@ -86,36 +183,33 @@ async def _process_message(mid: str, client: GmailClient, repo: MessageRepositor
         return
 
     message_id = await repo.upsert_message(
-        session,
         source="gmail",
         external_id=external_id,
         subject=subject,
         from_addr=from_addr,
         ts=ts,
         body_text=body_text,
+        source_meta={"gmail_id": mid},
     )
 
-    uploaded = []
-    for a in atts:
-        s3_key = await s3.put(
-            data=a["bytes"],
-            mime=a["mime"],
-            filename=a["filename"],
-            bucket=settings.s3_bucket,
-        )
-        uploaded.append(
-            {
-                "filename": a["filename"],
-                "mime": a["mime"],
-                "size_bytes": len(a["bytes"]),
-                "s3_key": s3_key,
-            }
-        )
+    limit = asyncio.Semaphore(settings.ingest_upload_concurrency)
+
+    async def upload(a: dict) -> dict:
+        async with limit:
+            s3_key = await s3.put(data=a["bytes"], mime=a["mime"], filename=a["filename"])
+        return {
+            "filename": a["filename"],
+            "mime": a["mime"],
+            "size_bytes": len(a["bytes"]),
+            "s3_key": s3_key,
+            "hash_sha256": hash_bytes(a["bytes"]),
+        }
+
+    uploaded = await asyncio.gather(*(upload(a) for a in atts))
     if uploaded:
-        await repo.insert_attachments(session, message_id, uploaded)
+        await repo.insert_attachments(message_id, uploaded)
 
     await repo.insert_event(
-        session,
         ticket_id=None,
         message_id=message_id,
         type_="INGESTED",
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import logging
+import time
+
+from api.app.config import settings
+from api.app.db import SessionLocal
+from common.clients import stripe
+from common.db.dao import MessageRepository
+from worker.celery_app import app, run_coro
+
+LOG = logging.getLogger(__name__)
+
+
+@app.task(name="sync.stripe_charges", bind=True, max_retries=3, default_retry_delay=30)
+def sync_stripe_charges(self):
+    try:
+        return run_coro(_sync_stripe_charges())
+    except Exception as e:
+        LOG.exception("stripe charge sync failed")
+        raise self.retry(exc=e)
+
+
+async def _sync_stripe_charges() -> int:
+    async with SessionLocal() as session:
+        repo = MessageRepository(session)
+        cursor = await repo.get_sync_cursor(stripe.SYNC_CURSOR)
+        if cursor:
+            # Re-read a window behind the cursor so status changes (refunds,
+            # disputes) on recent charges reach the index too.
+            start = int(cursor) - settings.stripe_sync_overlap_s
+        else:
+            start = int(time.time()) - settings.stripe_sync_backfill_days * 86400
+        newest = int(cursor) if cursor else start
+
+        synced = 0
+        async for page in stripe.list_charges(start):
+            await repo.upsert_stripe_charges([stripe.charge_row(c) for c in page])
+            await session.commit()
+            newest = max(newest, *(c["created"] for c in page))
+            synced += len(page)
+
+        # Stripe lists newest first, so the cursor only moves once the whole
+        # window has been read.
+        await repo.set_sync_cursor(stripe.SYNC_CURSOR, str(newest))
+        await session.commit()
+    LOG.info("stripe sync: %s charges since %s", synced, start)
+    return synced
@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, List
+
+from api.app.config import settings
+from api.app.db import SessionLocal
+from common.clients import ratelimit, zendesk
+from common.db.dao import MessageRepository
+from common.enrich import presign_all
+from common.metrics import counter, gauge
+from worker.celery_app import app, run_coro
+
+LOG = logging.getLogger(__name__)
+
+OUTBOX_DEPTH = gauge(
+    "shopdesk_zendesk_outbox_depth",
+    "Zendesk outbox rows not yet delivered, by status",
+    ["status"],
+)
+OUTBOX_DISPATCHED = counter(
+    "shopdesk_zendesk_outbox_dispatched_total",
+    "Zendesk outbox rows by dispatch result (created, failed, retried, rate_limited)",
+    ["result"],
+)
+
+_MAX_BACKOFF_S = 3600.0
+
+
+@app.task(name="outbox.zendesk", bind=True, max_retries=0)
+def dispatch_zendesk_outbox(self):
+    return run_coro(_dispatch_zendesk_outbox())
+
+
+def _backoff(attempts: int) -> float:
+    return min(settings.zendesk_outbox_backoff_s * 2 ** max(attempts - 1, 0), _MAX_BACKOFF_S)
+
+
+async def _retry(repo: MessageRepository, ids: List[int], attempts: int, error: str) -> None:
+    await repo.retry_zendesk_outbox(
+        ids,
+        delay_s=_backoff(attempts),
+        error=error,
+        max_attempts=settings.zendesk_outbox_max_attempts,
+    )
+    OUTBOX_DISPATCHED.labels(result="retried").inc(len(ids))
+
+
+async def _apply_job(repo: MessageRepository, ids: List[int], job: Dict[str, Any]) -> None:
+    status = job.get("status")
+    if status in ("queued", "working"):
+        return
+    if status != "completed":
+        await _retry(repo, ids, 1, f"job {job.get('id')} {status}: {job.get('message')}")
+        return
+
+    results = {r.get("index"): r for r in job.get("results") or []}
+    done, failed, missing = [], [], []
+    # ids are in submission order (see _submit), which is what index refers to
+    for index, row_id in enumerate(ids):
+        result = results.get(index)
+        if result is None:
+            missing.append(row_id)
+        elif result.get("error") or not result.get("id"):
+            error = f"{result.get('error')}: {result.get('details')}"
+            failed.append({"id": row_id, "error": error})
+        else:
+            done.append({"id": row_id, "external_id": str(result["id"])})
+    await repo.complete_zendesk_outbox(done)
+    await repo.fail_zendesk_outbox(failed)
+    if missing:
+        await _retry(repo, missing, 1, f"job {job.get('id')} returned no result")
+    OUTBOX_DISPATCHED.labels(result="created").inc(len(done))
+    OUTBOX_DISPATCHED.labels(result="failed").inc(len(failed))
+
+
+async def _poll_jobs(repo: MessageRepository) -> None:
+    jobs = await repo.zendesk_outbox_jobs()
+    if not jobs:
+        return
+    found = {str(job.get("id")): job for job in await zendesk.job_statuses(list(jobs))}
+    for job_id, ids in jobs.items():
+        job = found.get(job_id)
+        if job is None:
+            # Zendesk expires job statuses, so the tickets may well exist. The
+            # attempt is kept on purpose: it makes the next claim see
+            # attempts > 1 and look the ticket up by external_id before
+            # resubmitting it.
+            await repo.retry_zendesk_outbox(
+                ids,
+                delay_s=0,
+                error=f"job {job_id} not found",
+                max_attempts=settings.zendesk_outbox_max_attempts,
+            )
+            continue
+        await _apply_job(repo, ids, job)
+
+
+async def _render(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """The Zendesk ticket for an outbox payload, with freshly presigned links."""
+    ticket = dict(payload)
+    keys = ticket.pop("attachment_keys", None)
+    urls = []
+    if keys:
+        urls = await presign_all(keys, ttl_seconds=settings.zendesk_attachment_url_ttl_s)
+    if urls:
+        comment = dict(ticket.get("comment") or {})
+        comment["body"] = f"{comment.get('body') or ''}\n\nAttachments:\n" + "\n".join(urls)
+        ticket["comment"] = comment
+    return ticket
+
+
+async def _submit(repo: MessageRepository, rows: List[Dict[str, Any]]) -> bool:
+    """Send one claimed batch; returns False when dispatch should stop for now."""
+    ids = [r["id"] for r in rows]
+    attempts = max(r["attempts"] for r in rows)
+    try:
+        done, pending = [], []
+        for row in rows:
+            # A retried row may have reached Zendesk before its dispatcher
+            # lost track of it; external_id is our idempotency key. Only
+            # paths that never got as far as create_many refund an attempt,
+            # so attempts > 1 covers every row that may have been sent.
+            existing = None
+            if row["attempts"] > 1:
+                existing = await zendesk.find_by_external_id(row["ticket_id"])
+            if existing:
+                done.append({"id": row["id"], "external_id": existing})
+            else:
+                pending.append(row)
+        job = None
+        if pending:
+            job = await zendesk.create_many([await _render(r["payload"]) for r in pending])
+    except (zendesk.RateLimited, ratelimit.Throttled) as exc:
+        LOG.warning("zendesk outbox: %s", exc)
+        await repo.retry_zendesk_outbox(
+            ids,
+            delay_s=exc.retry_after,
+            error=str(exc),
+            max_attempts=settings.zendesk_outbox_max_attempts,
+            count_attempt=False,
+        )
+        OUTBOX_DISPATCHED.labels(result="rate_limited").inc(len(ids))
+        return False
+    except Exception as exc:
+        LOG.warning("zendesk outbox: batch of %s failed: %s", len(ids), exc)
+        await _retry(repo, ids, attempts, str(exc) or type(exc).__name__)
+        return True
+
+    await repo.complete_zendesk_outbox(done)
+    OUTBOX_DISPATCHED.labels(result="created").inc(len(done))
+    if not pending:
+        return True
+    if job is None:
+        await repo.retry_zendesk_outbox(
+            [r["id"] for r in pending],
+            delay_s=_backoff(attempts),
+            error="zendesk is not configured",
+            max_attempts=settings.zendesk_outbox_max_attempts,
+            count_attempt=False,
+        )
+        return False
+    pending_ids = [r["id"] for r in pending]
+    await repo.set_zendesk_outbox_job(pending_ids, str(job["id"]))
+    await _apply_job(repo, pending_ids, job)
+    return True
+
+
+async def _dispatch_zendesk_outbox() -> Dict[str, int]:
+    async with SessionLocal() as session:
+        repo = MessageRepository(session)
+        try:
+            await _poll_jobs(repo)
+            await session.commit()
+        except (zendesk.RateLimited, ratelimit.Throttled) as exc:
+            await session.rollback()
+            LOG.warning("zendesk outbox: job polling %s", exc)
+            return await _record_depth(repo)
+        except Exception as exc:
+            # a broken job_statuses endpoint must not stop new rows going out
+            await session.rollback()
+            LOG.warning("zendesk outbox: job polling failed: %s", exc)
+
+        for _ in range(settings.zendesk_outbox_max_batches):
+            rows = await repo.claim_zendesk_outbox(
+                limit=settings.zendesk_outbox_batch_size,
+                stale_after_s=settings.zendesk_outbox_stale_s,
+            )
+            # the claim is committed before calling Zendesk so a crash mid-call
+            # leaves the rows in_flight (and later stale) rather than pending
+            await session.commit()
+            if not rows:
+                break
+            rows.sort(key=lambda r: r["id"])
+            keep_going = await _submit(repo, rows)
+            await session.commit()
+            if not keep_going or len(rows) < settings.zendesk_outbox_batch_size:
+                break
+        return await _record_depth(repo)
+
+
+async def _record_depth(repo: MessageRepository) -> Dict[str, int]:
+    depth = await repo.zendesk_outbox_depth()
+    for status in ("pending", "in_flight", "failed"):
+        OUTBOX_DEPTH.labels(status=status).set(depth.get(status, 0))
+    return depth
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+
+import redis.asyncio as aioredis
+
+from api.app.config import settings
+from common.ml import remote, use_stub
+from common.ml import zeroshot
+from common.ml.types import Classification
+
+LOG = logging.getLogger(__name__)
+
+PENDING_KEY = "zeroshot:pending"
+LEADER_KEY = "zeroshot:leader"
+RESULT_KEY = "zeroshot:result:{}"
+RESULT_TTL_SECONDS = 60
+
+# Only the holder may release the lease: a leader whose lease expired mid
+# batch must not delete the one a new leader has since taken.
+_RELEASE_LEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class ZeroShotBatcher:
+    """Micro-batches pipeline.zeroshot inputs across worker processes.
+
+    Prefork children each run one task at a time, so batching goes through
+    Redis: every caller pushes its text onto a shared list, whoever holds the
+    leader lease drains up to ``max_batch`` items (waiting at most
+    ``max_wait_ms`` for the batch to fill), runs them as one padded batch and
+    pushes each result back to the caller's reply key. If the batch fails,
+    every caller gets an error reply and classifies its own text inline, so
+    one bad input costs a retry rather than a ``timeout_s`` wait for all.
+    """
+
+    def __init__(
+        self,
+        redis: aioredis.Redis,
+        *,
+        max_batch: int,
+        max_wait_ms: int,
+        classify_batch: Callable[[list[str]], Awaitable[list[Classification]]],
+        timeout_s: float = 60.0,
+    ) -> None:
+        self.redis = redis
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.classify_batch = classify_batch
+        self.timeout_s = timeout_s
+        self.lease_ms = int((self.max_wait + timeout_s) * 1000)
+        self._release_lease = redis.register_script(_RELEASE_LEASE)
+
+    async def classify(self, text: str) -> Classification:
+        request_id = uuid.uuid4().hex
+        reply_key = RESULT_KEY.format(request_id)
+        await self.redis.rpush(PENDING_KEY, json.dumps({"id": request_id, "text": text}))
+
+        deadline = time.monotonic() + self.timeout_s
+        while time.monotonic() < deadline:
+            token = uuid.uuid4().hex
+            if await self.redis.set(LEADER_KEY, token, nx=True, px=self.lease_ms):
+                try:
+                    await self._lead()
+                finally:
+                    await self._release_lease(keys=[LEADER_KEY], args=[token])
+            reply = await self.redis.blpop([reply_key], timeout=0.1)
+            if reply:
+                data = json.loads(reply[1])
+                if "error" not in data:
+                    return Classification.model_validate(data)
+                LOG.warning(
+                    "zeroshot batch failed (%s), classifying %s inline", data["error"], request_id
+                )
+                return (await self.classify_batch([text]))[0]
+
+        LOG.warning("zeroshot batch timed out, classifying %s inline", request_id)
+        return (await self.classify_batch([text]))[0]
+
+    async def _lead(self) -> None:
+        started = time.monotonic()
+        while time.monotonic() - started < self.max_wait:
+            if await self.redis.llen(PENDING_KEY) >= self.max_batch:
+                break
+            await asyncio.sleep(0.002)
+
+        raw = await self.redis.lpop(PENDING_KEY, self.max_batch)
+        if not raw:
+            return
+        items = [json.loads(r) for r in raw]
+        try:
+            results = await self.classify_batch([i["text"] for i in items])
+            if len(results) != len(items):
+                raise RuntimeError(f"{len(results)} results for {len(items)} texts")
+            replies = [r.model_dump_json() for r in results]
+        except Exception as exc:
+            # the items are already off the queue; every caller must hear back
+            LOG.exception("zeroshot batch of %s failed", len(items))
+            replies = [json.dumps({"error": str(exc) or type(exc).__name__})] * len(items)
+        for item, reply in zip(items, replies):
+            reply_key = RESULT_KEY.format(item["id"])
+            await self.redis.rpush(reply_key, reply)
+            await self.redis.expire(reply_key, RESULT_TTL_SECONDS)
+        LOG.debug("zeroshot batch of %s in %.3fs", len(items), time.monotonic() - started)
+
+
+_batcher: ZeroShotBatcher | None = None
+_batcher_loop: asyncio.AbstractEventLoop | None = None
+
+
+def _get_batcher() -> ZeroShotBatcher:
+    global _batcher, _batcher_loop
+    loop = asyncio.get_running_loop()
+    if _batcher is None or _batcher_loop is not loop:
+        _batcher = ZeroShotBatcher(
+            aioredis.from_url(settings.redis_url),
+            max_batch=settings.zeroshot_batch_size,
+            max_wait_ms=settings.zeroshot_batch_wait_ms,
+            classify_batch=zeroshot.classify_batch,
+        )
+        _batcher_loop = loop
+    return _batcher
+
+
+async def classify(text: str) -> Classification:
+    # the model server batches across workers itself
+    if use_stub() or remote.enabled() or settings.zeroshot_batch_size <= 1:
+        return await zeroshot.classify(text)
+    return await _get_batcher().classify(text)